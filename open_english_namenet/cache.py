@@ -0,0 +1,198 @@
+"""Cache of the intermediate results of the scripts, keyed by a fingerprint of their inputs.
+
+Each artifact is stored as a pickle whose file name includes a hash of its name and
+inputs, such as the identity of the Wikidata database, the hashes of the OEWN source
+files and the parameters of the function that computed it. So a new Wikidata dump or
+OEWN checkout is simply a cache miss, and the stale artifacts are eventually evicted.
+
+The cache directory is `cache` in the working directory, or the OENN_CACHE_DIR
+environment variable. If OENN_CACHE_MAX_GB is set, the least recently used artifacts
+and OEWN snapshots (see oewn_snapshot) are removed when the cache grows larger than
+that.
+"""
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import Counter
+from glob import glob
+
+CACHE_DIR = os.environ.get("OENN_CACHE_DIR", "cache")
+CACHE_MAX_GB = os.environ.get("OENN_CACHE_MAX_GB")
+
+# The hashes of the files already hashed by this process, by path, size and mtime
+file_hashes = {}
+
+
+def file_hash(path):
+    """
+    The SHA-256 hash of the contents of a file.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in file_hashes:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        file_hashes[key] = h.hexdigest()
+    return file_hashes[key]
+
+
+def files_fingerprint(pattern):
+    """
+    A fingerprint of the contents of all files that match a glob pattern.
+    """
+    h = hashlib.sha256()
+    for path in sorted(glob(pattern)):
+        h.update(os.path.basename(path).encode("utf-8"))
+        h.update(file_hash(path).encode("ascii"))
+    return h.hexdigest()
+
+
+def oewn_fingerprint(source, pattern="[nva]*.yaml"):
+    """
+    A fingerprint of the OEWN YAML source files in a checkout.
+    """
+    return files_fingerprint(f"{source}/src/yaml/{pattern}")
+
+
+def oewn_files_stat(source, pattern="[nva]*.yaml"):
+    """
+    The paths, sizes and modification times of the OEWN YAML source files in a
+    checkout, which identify their version without reading them.
+    """
+    stats = []
+    for path in sorted(glob(f"{source}/src/yaml/{pattern}")):
+        stat = os.stat(path)
+        stats.append([os.path.realpath(path), stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+def database_fingerprint(path):
+    """
+    A fingerprint of a database file by its identity, size and modification time.
+    Hashing the contents of a database of hundreds of gigabytes would take too long.
+    """
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return [os.path.realpath(path), stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+class Cache:
+    """
+    A directory of pickled artifacts, keyed by their name and a fingerprint of their
+    inputs, with optional eviction of the least recently used artifacts.
+    """
+    def __init__(self, directory=CACHE_DIR, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = 0
+
+    def path(self, name, inputs):
+        """
+        The file of an artifact. The inputs must be serializable as JSON.
+        """
+        key = hashlib.sha256(json.dumps([name, inputs], sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}-{key[:20]}.pickle")
+
+    def load(self, name, inputs):
+        """
+        Return a pair of whether the artifact is cached and its value.
+        """
+        path = self.path(name, inputs)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError, TypeError, ValueError):
+            # A pickle of a class that has since been renamed, moved or changed is
+            # computed again like a missing one
+            self.misses[name] += 1
+            return False, None
+        # The modification time of the file records when it was last used
+        os.utime(path)
+        self.hits[name] += 1
+        return True, value
+
+    def store(self, name, inputs, value):
+        """
+        Save an artifact, replacing the file atomically so that an interrupted run
+        never leaves a partial pickle behind.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name, inputs)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def get(self, name, inputs, compute):
+        """
+        Return a cached artifact, or compute and cache it.
+        """
+        found, value = self.load(name, inputs)
+        if not found:
+            value = compute()
+            self.store(name, inputs, value)
+        return value
+
+    def evict(self, keep=()):
+        """
+        Remove the least recently used artifacts and snapshots until the cache fits its
+        size limit, except for the files in `keep`.
+        """
+        if self.max_bytes is None:
+            return
+        files = []
+        for pattern in ("*.pickle", "*.snapshot"):
+            for path in glob(os.path.join(self.directory, pattern)):
+                stat = os.stat(path)
+                files.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            os.remove(path)
+            total -= size
+            self.evictions += 1
+
+    def report(self):
+        """
+        A summary of the hits and misses of the cache.
+        """
+        names = sorted(set(self.hits) | set(self.misses))
+        details = ", ".join(f"{name} {self.hits[name]}/{self.hits[name] + self.misses[name]}" for name in names)
+        return (f"Cache {self.directory}: {sum(self.hits.values())} hits, {sum(self.misses.values())} misses, "
+                f"{self.evictions} evicted ({details})")
+
+
+cache = Cache(CACHE_DIR, int(float(CACHE_MAX_GB) * 2 ** 30) if CACHE_MAX_GB else None)
+
+
+def configure(directory=None, max_gb=None):
+    """
+    Change the directory or size limit of the cache used by the scripts.
+    """
+    if directory is not None:
+        cache.directory = directory
+    if max_gb is not None:
+        cache.max_bytes = int(max_gb * 2 ** 30)
+
+
+@atexit.register
+def report_cache():
+    if cache.hits or cache.misses:
+        print(cache.report())
@@ -0,0 +1,211 @@
+"""Checkpoints of generate.py, so that an interrupted run can be resumed.
+
+Each output file is first written to a partial file in the checkpoint directory, one
+chunk (a batch of jobs) at a time. A chunk is committed by flushing the partial file to
+disk and recording its length, the number of jobs done and the QID of the last job in
+the journal, which is replaced atomically. The entries for existing OEWN synsets, which
+update the addendums rather than the output, are appended to a delta file of the output
+and the fingerprints of the new synsets (see fingerprints) to a sidecar, both committed
+in the same way. When all the jobs of an output are done, its partial file and sidecar
+are moved into the output folder.
+
+When a run is resumed, the deltas of the committed chunks are replayed onto the
+addendums, the outputs that were done are skipped and the output that was interrupted
+is truncated to its last committed chunk and continued from the job after it. The jobs
+before that are still generated, as the phases keep state between jobs (such as the
+entities already seen), but they are not rendered or written again. The updated
+addendums are all written to temporary files and the journal records this before any
+of them replaces an old addendum, after which a resumed run finishes replacing them
+and does not replay the deltas.
+"""
+import json
+import os
+import shutil
+from itertools import islice
+from fingerprints import SUFFIX
+
+JOURNAL_VERSION = 2
+
+
+def write_atomic(path, text):
+    """
+    Write a text file by writing a temporary file and renaming it.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def open_truncated(path, size):
+    """
+    Open a file for appending after its first `size` bytes, which are the part of it
+    that was committed.
+    """
+    f = open(path, "ab")
+    f.truncate(size)
+    return f
+
+
+class Checkpoint:
+    """
+    The journal of a run of generate.py. The outputs must be opened in the same order
+    on every run, and `inputs` identifies the inputs of the run, so that a checkpoint
+    is only resumed with the same inputs.
+    """
+    def __init__(self, directory, inputs, resume=False):
+        self.directory = directory
+        self.journal_path = os.path.join(directory, "journal.json")
+        self.position = 0
+        self.journal = {"version": JOURNAL_VERSION, "inputs": inputs, "outputs": []}
+        if resume and os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                journal = json.load(f)
+            if journal.get("version") != JOURNAL_VERSION or journal.get("inputs") != inputs:
+                raise ValueError(f"The checkpoint in {directory} is for other inputs, run again without --resume")
+            self.journal = journal
+            done = sum(1 for output in journal["outputs"] if output["done"])
+            print(f"Resuming from checkpoint: {done} outputs done, {len(journal['outputs']) - done} in progress")
+        else:
+            if resume:
+                print(f"No checkpoint in {directory}, starting from the beginning")
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self):
+        write_atomic(self.journal_path, json.dumps(self.journal))
+
+    def file_name(self, position, path):
+        return os.path.join(self.directory, f"{position:04d}-{os.path.basename(path)}")
+
+    def deltas(self):
+        """
+        Iterate over the committed addendum deltas in the order they were made, each
+        the list of entries for existing synsets of one chunk. There are none once the
+        addendums have been written, as they already contain the deltas.
+        """
+        if self.addendums_written:
+            return
+        for position, output in enumerate(self.journal["outputs"]):
+            if not output["delta_size"]:
+                continue
+            with open(self.file_name(position, output["file"]) + ".delta", "rb") as f:
+                data = f.read(output["delta_size"])
+            for line in data.splitlines():
+                yield json.loads(line)
+
+    @property
+    def addendums_written(self):
+        return self.journal.get("addendums_written", False)
+
+    def mark_addendums_written(self):
+        """
+        Record that the updated addendums are written in full, before they replace the
+        old ones, so that a resumed run does not replay the deltas onto them again.
+        """
+        self.journal["addendums_written"] = True
+        self.save()
+
+    def output(self, path):
+        """
+        Open the next output of the run, to be written to `path`.
+        """
+        output = CheckpointOutput(self, self.position, path)
+        self.position += 1
+        return output
+
+    def clear(self):
+        """
+        Remove the checkpoint once the run is complete.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CheckpointOutput:
+    """
+    An output file of a run, written in committed chunks. Use it as a context manager:
+    the output is only moved into place if all of its jobs were processed.
+    """
+    def __init__(self, checkpoint, position, path):
+        self.checkpoint = checkpoint
+        self.path = path
+        outputs = checkpoint.journal["outputs"]
+        if position < len(outputs):
+            self.state = outputs[position]
+            if self.state["file"] != path:
+                raise ValueError(f"Output {position} of the checkpoint is {self.state['file']}, not {path}")
+        else:
+            self.state = {"file": path, "jobs": 0, "last_qid": None, "size": 0, "delta_size": 0,
+                          "fingerprints_size": 0, "done": False}
+            outputs.append(self.state)
+        self.partial_path = checkpoint.file_name(position, path) + ".partial"
+        self.delta_path = checkpoint.file_name(position, path) + ".delta"
+        self.fingerprints_path = checkpoint.file_name(position, path) + SUFFIX
+        self.to_skip = self.state["jobs"]
+        self.f = self.deltas = self.fingerprints = None
+
+    def __enter__(self):
+        if not self.state["done"]:
+            self.f = open_truncated(self.partial_path, self.state["size"])
+            self.deltas = open_truncated(self.delta_path, self.state["delta_size"])
+            self.fingerprints = open_truncated(self.fingerprints_path, self.state["fingerprints_size"])
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.f is not None:
+            self.f.close()
+            self.deltas.close()
+            self.fingerprints.close()
+        if exc_type is None and not self.state["done"]:
+            if self.to_skip:
+                raise ValueError(f"{self.path} has fewer jobs than were committed to the checkpoint")
+            os.replace(self.fingerprints_path, self.path + SUFFIX)
+            os.replace(self.partial_path, self.path)
+            self.state["done"] = True
+            self.checkpoint.save()
+
+    def skip_committed(self, jobs):
+        """
+        Skip the jobs that were already committed, checking that the last of them is
+        the last job in the journal. If the output is done, all the jobs are skipped.
+        """
+        jobs = iter(jobs)
+        if self.state["done"]:
+            for _ in jobs:
+                pass
+            return jobs
+        for qid, _, _ in islice(jobs, self.to_skip):
+            self.to_skip -= 1
+            if self.to_skip == 0 and qid != self.state["last_qid"]:
+                raise ValueError(f"The jobs of {self.path} do not match the checkpoint at {qid}")
+        return jobs
+
+    @property
+    def size(self):
+        """
+        The size of the committed part of the output, where the next chunk starts.
+        """
+        return self.state["size"]
+
+    def commit(self, text, existing, jobs, last_qid, fingerprints=b""):
+        """
+        Write and commit a chunk: the text of its new synsets, its entries for existing
+        synsets, the number of jobs in it, the QID of its last job and the sidecar
+        records of its new synsets.
+        """
+        data = text.encode("utf-8")
+        delta = (json.dumps(existing) + "\n").encode("utf-8")
+        self.f.write(data)
+        self.deltas.write(delta)
+        self.fingerprints.write(fingerprints)
+        for f in (self.f, self.deltas, self.fingerprints):
+            f.flush()
+            os.fsync(f.fileno())
+        self.state["size"] += len(data)
+        self.state["delta_size"] += len(delta)
+        self.state["fingerprints_size"] += len(fingerprints)
+        self.state["jobs"] += jobs
+        self.state["last_qid"] = last_qid
+        self.checkpoint.save()
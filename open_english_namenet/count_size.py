@@ -1,33 +1,207 @@
-### Helper script to show the size of the generated resource
+### Helper script to show the size and statistics of the generated resource
+#
+# The files are mapped with mmap and split into ranges of whole synsets, which are
+# counted by a pool of worker processes. Each worker returns its counts as NumPy
+# bincounts, which are summed and summarised at the end.
+import argparse
+import json
+from collections import Counter
 from glob import glob
+from multiprocessing import Pool
+import numpy as np
+from tqdm import tqdm
+from namenet import LEXFILES, SYNSET_ID
+from yaml_reader import file_ranges, read_range
+
+# The size of the byte ranges of the files that are counted by one worker at a time
+CHUNK_SIZE = 64 << 20
+# The width of the bins of the histogram of definition lengths, in characters
+DEFINITION_BIN = 25
+# The number of bins of the histogram, the last of which holds all longer definitions
+DEFINITION_BINS = 20
+# The number of hypernyms with the most hyponyms that are reported
+TOP_HYPERNYMS = 10
+
+
+def as_list(value):
+    return [value] if isinstance(value, str) else value
+
+
+def count_range(task):
+    """
+    Count the synsets in a byte range of a file, skipping blocks that are not keyed by
+    a synset ID.
+    """
+    path, start, end = task
+    members, hypernyms, definition_lengths = [], [], []
+    targets = Counter()
+    new_entry = 0
+    with_qid = 0
+    for ssid, entry in read_range(path, start, end):
+        if not isinstance(ssid, str) or not SYNSET_ID.fullmatch(ssid):
+            continue
+        if not ssid.startswith("Q"):
+            new_entry += 1
+        if entry.get("wikidata"):
+            with_qid += 1
+        members.append(len(entry.get("members", [])))
+        synset_hypernyms = entry.get("hypernym", []) + entry.get("instance_hypernym", [])
+        hypernyms.append(len(synset_hypernyms))
+        targets.update(synset_hypernyms)
+        definition_lengths.extend(len(definition) for definition in as_list(entry.get("definition", [])))
+    return {
+        "file": path,
+        "synsets": len(members),
+        "new": new_entry,
+        "with_qid": with_qid,
+        "members": np.bincount(np.array(members, dtype=np.int64), minlength=1),
+        "hypernyms": np.bincount(np.array(hypernyms, dtype=np.int64), minlength=1),
+        "definition_lengths": np.bincount(np.array(definition_lengths, dtype=np.int64), minlength=1),
+        "targets": targets,
+    }
+
+
+def add_counts(a, b):
+    """
+    Add two bincounts of different lengths.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    a = a.copy()
+    a[:len(b)] += b
+    return a
+
+
+def distribution(bincount):
+    """
+    Summarise a bincount, where the count at i is the number of items of value i.
+    """
+    total = int(bincount.sum())
+    if not total:
+        return {"count": 0}
+    values = np.arange(len(bincount))
+    cumulative = np.cumsum(bincount)
+    return {
+        "count": total,
+        "mean": float((values * bincount).sum() / total),
+        "p50": int(np.searchsorted(cumulative, 0.5 * total)),
+        "p90": int(np.searchsorted(cumulative, 0.9 * total)),
+        "p99": int(np.searchsorted(cumulative, 0.99 * total)),
+        "max": int(np.flatnonzero(bincount)[-1]),
+        "counts": {int(i): int(bincount[i]) for i in np.flatnonzero(bincount)},
+    }
+
+
+def value_distribution(values):
+    """
+    Summarise an array of values with a wide range, without a bincount of them.
+    """
+    if not len(values):
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99], method="inverted_cdf")
+    return {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "p50": int(p50),
+        "p90": int(p90),
+        "p99": int(p99),
+        "max": int(values.max()),
+    }
+
+
+def definition_histogram(bincount):
+    """
+    The histogram of definition lengths in bins of DEFINITION_BIN characters.
+    """
+    bins = np.zeros(DEFINITION_BINS, dtype=np.int64)
+    lengths = np.arange(len(bincount))
+    np.add.at(bins, np.minimum(lengths // DEFINITION_BIN, DEFINITION_BINS - 1), bincount)
+    labels = [f"{i * DEFINITION_BIN}-{(i + 1) * DEFINITION_BIN - 1}" for i in range(DEFINITION_BINS - 1)]
+    labels.append(f"{(DEFINITION_BINS - 1) * DEFINITION_BIN}+")
+    return dict(zip(labels, bins.tolist()))
+
+
+def statistics(results):
+    """
+    Combine the counts of the ranges into the statistics of each file and in total.
+    """
+    files = {}
+    members = hypernyms = definition_lengths = np.zeros(1, dtype=np.int64)
+    targets = Counter()
+    for result in results:
+        file = files.setdefault(result["file"], {"synsets": 0, "lemmas": 0, "new": 0, "with_qid": 0})
+        file["synsets"] += result["synsets"]
+        file["lemmas"] += int((np.arange(len(result["members"])) * result["members"]).sum())
+        file["new"] += result["new"]
+        file["with_qid"] += result["with_qid"]
+        members = add_counts(members, result["members"])
+        hypernyms = add_counts(hypernyms, result["hypernyms"])
+        definition_lengths = add_counts(definition_lengths, result["definition_lengths"])
+        targets.update(result["targets"])
+    total = {key: sum(file[key] for file in files.values()) for key in ("synsets", "lemmas", "new", "with_qid")}
+    # The number of hyponyms of a hypernym ranges up to millions, so these are not counted in a bincount
+    fan_out = np.fromiter(targets.values(), dtype=np.int64, count=len(targets))
+    return {
+        "files": files,
+        "total": total,
+        "qid_coverage": total["with_qid"] / total["synsets"] if total["synsets"] else 0.0,
+        "members_per_synset": distribution(members),
+        "hypernyms_per_synset": distribution(hypernyms),
+        "hypernym_fan_out": value_distribution(fan_out),
+        "top_hypernyms": dict(targets.most_common(TOP_HYPERNYMS)),
+        "definition_length": distribution(definition_lengths),
+        "definition_length_histogram": definition_histogram(definition_lengths),
+    }
+
+
+def markdown(stats):
+    """
+    Write the statistics as Markdown tables.
+    """
+    lines = ["|File                                         | Synsets     | Lemmas      | New         |",
+             "|---------------------------------------------|-------------|-------------|-------------|"]
+    for file, counts in stats["files"].items():
+        lines.append(f"|{file:<45}| {counts['synsets']:11} | {counts['lemmas']:11} | {counts['new']:11} |")
+    total = stats["total"]
+    lines.append("|---------------------------------------------|-------------|-------------|-------------|")
+    lines.append(f"|Total                                        | {total['synsets']:11} | {total['lemmas']:11} | {total['new']:11} |")
+    lines += ["", "|Statistic                  | Mean        | p50         | p90         | p99         | Max         |",
+              "|---------------------------|-------------|-------------|-------------|-------------|-------------|"]
+    for key, name in (("members_per_synset", "Members per synset"), ("hypernyms_per_synset", "Hypernyms per synset"),
+                      ("hypernym_fan_out", "Hypernym fan-out"), ("definition_length", "Definition length")):
+        summary = stats[key]
+        if summary["count"]:
+            lines.append(f"|{name:<27}| {summary['mean']:11.2f} | {summary['p50']:11} | {summary['p90']:11} "
+                         f"| {summary['p99']:11} | {summary['max']:11} |")
+    lines += ["", f"QID coverage: {total['with_qid']} of {total['synsets']} synsets ({stats['qid_coverage']:.2%})",
+              "", "|Definition length          | Definitions |",
+              "|---------------------------|-------------|"]
+    for label, count in stats["definition_length_histogram"].items():
+        lines.append(f"|{label:<27}| {count:11} |")
+    lines += ["", "|Hypernym                   | Hyponyms    |",
+              "|---------------------------|-------------|"]
+    for hypernym, count in stats["top_hypernyms"].items():
+        lines.append(f"|{hypernym:<27}| {count:11} |")
+    return "\n".join(lines)
 
 
 if __name__ == "__main__":
-    print("|File                                         | Synsets     | Lemmas      | New         |")
-    print("|---------------------------------------------|-------------|-------------|-------------|")
-
-    total_synsets = 0
-    total_entries = 0
-    total_new = 0
-    for file in sorted(glob("oenn/*.yaml")):
-        with open(file, "r") as f:
-            in_members = False
-            synsets = 0
-            entries = 0
-            new_entry = 0
-            for line in f:
-                if not line[0].isspace():
-                    if not line.startswith("Q"):
-                        new_entry += 1
-                    synsets += 1
-                if line.strip().startswith("members:"):
-                    in_members = True
-                if in_members and line.strip().startswith("- "):
-                    entries += 1
-            print(f"|{file:<45}| {synsets:11} | {entries:11} | {new_entry:11} |")
-            total_synsets += synsets
-            total_entries += entries
-            total_new += new_entry
-    print("|---------------------------------------------|-------------|-------------|-------------|")
-    print(f"|Total                                        | {total_synsets:11} | {total_entries:11} | {total_new:11} |")
+    parser = argparse.ArgumentParser(description="Show the size and statistics of the generated resource.")
+    parser.add_argument("folder", type=str, help="Folder of the YAML files", nargs="?", default="oenn")
+    parser.add_argument("--json", type=str, help="Path to also write the statistics to as JSON", default=None)
+    parser.add_argument("--workers", type=int, help="Number of processes to count with", default=1)
+    parser.add_argument("--chunk_mb", type=int, help="Size of the byte ranges of the files that are counted at a time", default=CHUNK_SIZE >> 20)
+    args = parser.parse_args()
+
+    tasks = [task for file in sorted(glob(f"{args.folder}/{LEXFILES}")) for task in file_ranges(file, args.chunk_mb << 20)]
+    if args.workers > 1:
+        with Pool(args.workers) as pool:
+            results = list(tqdm(pool.imap(count_range, tasks), desc="Counting", total=len(tasks)))
+    else:
+        results = [count_range(task) for task in tqdm(tasks, desc="Counting")]
 
+    stats = statistics(results)
+    print(markdown(stats))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
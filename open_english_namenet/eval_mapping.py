@@ -3,7 +3,7 @@ import sqlite3
 from collections import Counter
 import json
 from tqdm import tqdm
-from open_english_namenet import WIKIDATA_DB, load_wordnet_data, fetch_in_chunks
+from open_english_namenet import WIKIDATA_DB, load_wordnet_data, read_wikidata_with_prop_vals
 import csv
 
 WD_URL_LEN = len("https://www.wikidata.org/wiki/Q")
@@ -31,19 +31,21 @@ if __name__ == "__main__":
 
     cursor = db.cursor()
 
-    cursor.execute("SELECT COUNT(*) FROM properties")
-    total_count = cursor.fetchone()[0]    
+    # All entities with an instance of (P31) value that is mapped, read lazily from the
+    # compact result of each value. An entity with several mapped values is in the
+    # result of each of them, so it is only taken from that of the first.
+    def mapped_instances(results):
+        for value, entities in results.items():
+            for qid, broaders in entities.items():
+                if next(broader for broader in broaders if broader in wd2wn) == value:
+                    yield qid, broaders
 
-    cursor.execute("SELECT qid, properties FROM properties")
-
-    for row in tqdm(fetch_in_chunks(cursor), desc="Processing properties", total=total_count):
-        qid = row[0]
-        data = json.loads(row[1])
+    results = read_wikidata_with_prop_vals(cursor, "P31", wd2wn.keys())
+    for qid, broaders in tqdm(mapped_instances(results), desc="Processing properties"):
         x = set()
-        if "P31" in data:
-            for broader in data["P31"]:
-                if broader in wd2wn:
-                    x.add(wd2wn[broader][0])
+        for broader in broaders:
+            if broader in wd2wn:
+                x.add(wd2wn[broader][0])
         x = list(x)
         if len(x) > 0:
             # Discard broader terms
@@ -0,0 +1,256 @@
+"""Script to export Open English Namenet directly to a SQLite database with the schema of
+wn, so that it can be used with wn without importing the GWC XML.
+
+The database is built for speed rather than safety: journaling and syncing are turned
+off, the rows are inserted in batches with their rowids assigned here, and the indexes
+are only built once all the rows have been loaded. The database is built under a
+temporary name and only renamed to the output path when it is complete, so an
+interrupted build never leaves a partial database in its place.
+"""
+
+import argparse
+from importlib import resources
+from itertools import groupby
+from unicodedata import combining, normalize
+import os
+import re
+import sqlite3
+from tqdm import tqdm
+from export_xml import lemma2entryid
+from external_sort import ExternalSorter
+from namenet import output_files
+from yaml_reader import read_synsets
+
+# The number of rows that are inserted with one call to executemany
+BATCH_SIZE = 10000
+# The relations in the synset files, in the order they are written to the XML
+RELATION_TYPES = ["instance_hypernym", "hypernym", "mero_member"]
+CREATE_INDEX = re.compile(r"^\s*CREATE\s+INDEX", re.I | re.M)
+
+
+def schema_statements():
+    """
+    The statements of the schema of wn, split into those that create the tables and
+    those that create the indexes.
+    """
+    schema = (resources.files("wn") / "schema.sql").read_text()
+    tables, indexes = [], []
+    statement = ""
+    for line in schema.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            (indexes if CREATE_INDEX.search(statement) else tables).append(statement)
+            statement = ""
+    return schema, tables, indexes
+
+
+def normalize_form(form):
+    """
+    The normalized form that wn stores for a lemma, or None if it is the same as the
+    lemma.
+    """
+    normalized = "".join(c for c in normalize("NFKD", form.lower()) if not combining(c))
+    return normalized if normalized != form else None
+
+
+class BatchInserter:
+    """
+    Collects rows for an INSERT statement and inserts them with executemany.
+    """
+    def __init__(self, cursor, query):
+        self.cursor = cursor
+        self.query = query
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.cursor.executemany(self.query, self.rows)
+            self.rows = []
+
+
+def load_synsets(cursor, files, lexicon_rowid, entries):
+    """
+    Insert the synsets, their proposed ILIs and definitions, and stage their relations
+    in a temporary table by the ID of the target. The pairs of each member with its
+    synset are added to the sorter of the entries. The files of the different folders
+    of the output share a lexicographer file if they have the same name.
+    """
+    cursor.execute("""CREATE TEMP TABLE staged_relations (
+        source_rowid INTEGER NOT NULL, target_id TEXT NOT NULL, type_rowid INTEGER NOT NULL)""")
+    relation_types = {}
+    for relation_type in RELATION_TYPES:
+        cursor.execute("INSERT INTO relation_types VALUES (null, ?)", (relation_type,))
+        relation_types[relation_type] = cursor.lastrowid
+    synsets = BatchInserter(cursor, "INSERT INTO synsets VALUES (?, ?, ?, null, 'n', 1, ?, null)")
+    proposed_ilis = BatchInserter(cursor, "INSERT INTO proposed_ilis VALUES (null, ?, null, null)")
+    definitions = BatchInserter(cursor, "INSERT INTO definitions VALUES (null, ?, ?, ?, null, null, null)")
+    relations = BatchInserter(cursor, "INSERT INTO temp.staged_relations VALUES (?, ?, ?)")
+    lexfiles = {}
+    synset_rowid = 0
+    for file in tqdm(files, desc="Loading synsets"):
+        lex_file = file.split("/")[-1].replace(".yaml", "")
+        if lex_file not in lexfiles:
+            cursor.execute("INSERT INTO lexfiles VALUES (null, ?)", (lex_file,))
+            lexfiles[lex_file] = cursor.lastrowid
+        lexfile_rowid = lexfiles[lex_file]
+        for ssid, entry in read_synsets(file):
+            synset_rowid += 1
+            synsets.add((synset_rowid, f"oenn-{ssid}", lexicon_rowid, lexfile_rowid))
+            # The synsets are all new concepts, written with ili="in" in the XML
+            proposed_ilis.add((synset_rowid,))
+            for definition in entry.get("definition", []):
+                definitions.add((lexicon_rowid, synset_rowid, definition))
+            for relation_type in RELATION_TYPES:
+                for target in entry.get(relation_type, []):
+                    relations.add((synset_rowid, f"oenn-{target}", relation_types[relation_type]))
+            for rank, member in enumerate(entry.get("members", [])):
+                entries.add((lemma2entryid(member), member, ssid, synset_rowid, rank))
+    for inserter in (synsets, proposed_ilis, definitions, relations):
+        inserter.flush()
+    return synset_rowid
+
+
+def resolve_relations(cursor, lexicon_rowid):
+    """
+    Insert the staged relations whose targets are synsets of the lexicon, and return
+    the number of relations whose targets are not, such as the synsets of OEWN.
+    """
+    cursor.execute("SELECT COUNT(*) FROM temp.staged_relations")
+    staged, = cursor.fetchone()
+    cursor.execute("""INSERT INTO synset_relations
+        SELECT null, ?, staged.source_rowid, synsets.rowid, staged.type_rowid, null
+        FROM temp.staged_relations AS staged
+        JOIN synsets ON synsets.id = staged.target_id
+        ORDER BY staged.rowid""", (lexicon_rowid,))
+    resolved = cursor.rowcount
+    cursor.execute("DROP TABLE temp.staged_relations")
+    return staged - resolved
+
+
+def load_entries(cursor, entries, lexicon_rowid):
+    """
+    Insert the entries, their forms and their senses from the sorted members of the
+    synsets. Lemmas that are escaped to the same entry ID are added as further forms
+    of one entry.
+    """
+    entry_rows = BatchInserter(cursor, "INSERT INTO entries VALUES (?, ?, ?, 'n', null)")
+    forms = BatchInserter(cursor, "INSERT INTO forms VALUES (null, null, ?, ?, ?, ?, null, ?)")
+    senses = BatchInserter(cursor, "INSERT INTO senses VALUES (null, ?, ?, ?, ?, ?, ?, 1, null)")
+    entry_rowid = 0
+    for entry_id, members in tqdm(groupby(entries, key=lambda member: member[0]), desc="Loading entries"):
+        entry_rowid += 1
+        entry_rows.add((entry_rowid, entry_id, lexicon_rowid))
+        lemmas = set()
+        synsets = set()
+        for _, lemma, ssid, synset_rowid, synset_rank in members:
+            if lemma not in lemmas:
+                forms.add((lexicon_rowid, entry_rowid, lemma, normalize_form(lemma), 0 if not lemmas else 1))
+                lemmas.add(lemma)
+            if ssid not in synsets:
+                senses.add((f"{entry_id[:-2]}-{ssid}", lexicon_rowid, entry_rowid, len(synsets),
+                            synset_rowid, synset_rank))
+                synsets.add(ssid)
+    for inserter in (entry_rows, forms, senses):
+        inserter.flush()
+    return entry_rowid
+
+
+def restore_schema_order(connection, schema):
+    """
+    Rewrite the schema table in the order in which wn creates it. wn checks that a
+    database is compatible by a hash of the statements of the schema in the order of
+    the schema table, and the indexes that are built after the load come after all the
+    tables.
+    """
+    reference = sqlite3.connect(":memory:")
+    reference.executescript(schema)
+    order = [name for name, in reference.execute("SELECT name FROM sqlite_master")]
+    expected = [sql for sql, in reference.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL")]
+    reference.close()
+    rows = {row[1]: row for row in
+            connection.execute("SELECT type, name, tbl_name, rootpage, sql FROM sqlite_master")}
+    connection.execute("PRAGMA writable_schema = ON")
+    connection.execute("DELETE FROM sqlite_master")
+    connection.executemany("INSERT INTO sqlite_master VALUES (?, ?, ?, ?, ?)",
+                           (rows[name] for name in order))
+    connection.commit()
+    connection.execute("PRAGMA writable_schema = OFF")
+    actual = [sql for sql, in connection.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL")]
+    if actual != expected:
+        raise ValueError("The schema of the database differs from the schema of wn")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export Open English Namenet to a SQLite database with the schema of wn."
+    )
+    parser.add_argument(
+        "input_folder",
+        type=str,
+        help="Path to the output folder of generate.py, with the curated, addendum and automatic folders.",
+        default="data",
+    )
+    parser.add_argument(
+        "output_file",
+        type=str,
+        help="Path to the output SQLite database.",
+        default="wn.db",
+    )
+    parser.add_argument(
+        "--year",
+        type=str,
+        help="Year of the OEWN version.",
+        default="2025")
+    parser.add_argument(
+        "--memory_mb",
+        type=int,
+        help="Memory for sorting the lexical entries and for the page cache while building the indexes.",
+        default=512)
+    args = parser.parse_args()
+
+    temp_file = args.output_file + ".tmp"
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+    connection = sqlite3.connect(temp_file)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("PRAGMA locking_mode = EXCLUSIVE")
+    connection.execute(f"PRAGMA cache_size = -{args.memory_mb << 10}")
+    cursor = connection.cursor()
+
+    schema, tables, indexes = schema_statements()
+    for statement in tables:
+        cursor.execute(statement)
+    cursor.executemany("INSERT INTO ili_statuses VALUES (null, ?)", [("presupposed",), ("proposed",)])
+    cursor.execute("INSERT INTO lexicons VALUES (null, ?, ?, ?, ?, ?, ?, ?, null, null, null, 0)",
+                   ("oenn", "Open English Namenet", "en", "john@mccr.ae",
+                    "https://creativecommons.org/licenses/by/4.0", args.year,
+                    "https://github.com/globalwordnet/english-namenet"))
+    lexicon_rowid = cursor.lastrowid
+
+    with ExternalSorter(args.memory_mb << 20, os.path.dirname(os.path.abspath(temp_file))) as entries:
+        files = [os.path.join(args.input_folder, file) for file in output_files(args.input_folder)]
+        n_synsets = load_synsets(cursor, files, lexicon_rowid, entries)
+        # The relations are resolved to their targets with the index of the synset IDs,
+        # so it is built before the other indexes
+        synset_id_index = next(statement for statement in indexes if "synset_id_index" in statement)
+        cursor.execute(synset_id_index)
+        unresolved = resolve_relations(cursor, lexicon_rowid)
+        n_entries = load_entries(cursor, entries, lexicon_rowid)
+
+    for statement in tqdm(indexes, desc="Building indexes"):
+        if statement is not synset_id_index:
+            cursor.execute(statement)
+    connection.commit()
+    restore_schema_order(connection, schema)
+    connection.close()
+    os.replace(temp_file, args.output_file)
+
+    print(f"Exported {n_synsets} synsets and {n_entries} entries")
+    if unresolved:
+        print(f"Skipped {unresolved} relations to synsets that are not in Open English Namenet")
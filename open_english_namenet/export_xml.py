@@ -1,15 +1,25 @@
 """Script to export Open English Namenet to the GWC XML format."""
 
 import argparse
-import yaml
 from glob import glob
 from collections import defaultdict
 import tempfile
 from xml.sax.saxutils import escape as xml_escape
 import os
 from tqdm import tqdm
-import shelve
+from itertools import groupby
+from collections import deque
+from multiprocessing import Pool
 import gzip
+import shutil
+from external_sort import ExternalSorter
+from yaml_reader import file_ranges, read_range
+
+# The size of the chunks of text that are compressed as separate gzip members
+CHUNK_SIZE = 16 << 20
+# The size of the byte ranges of the YAML files that are converted by one worker at a
+# time, so that a large file such as noun.human.yaml is shared between the workers
+RANGE_SIZE = 32 << 20
 
 def escape(s : str) -> str:
     """
@@ -54,14 +64,109 @@ def convert_entry(entry_id, entry_data, output_file, lex_file):
 
     return temp_lines
 
-def process_block(block, temp_file, lex_file, entries):
-    data = yaml.load(block, Loader=yaml.CLoader)
-    for entry_id, entry_data in data.items():
-        for member in entry_data.get("members", []):
-            if member not in entries:
-                entries[member] = []
-            entries[member].append(entry_id)
-        return convert_entry(entry_id, entry_data, temp_file, lex_file)
+def process_synset(entry_id, entry_data, temp_file, lex_file, entries):
+    """
+    Convert a synset and add the pairs of its members and its ID to the sorter of the
+    lexical entries.
+    """
+    for member in entry_data.get("members", []):
+        entries.add((member, entry_id))
+    return convert_entry(entry_id, entry_data, temp_file, lex_file)
+
+
+def convert_range(task):
+    """
+    Convert the synsets of a byte range of a YAML file to XML in a worker process. The
+    XML is written to a file in the temporary folder, and the pairs of lemma and synset
+    to a sorted run of the lexical entries next to it. Returns the paths of both and
+    the number of lines of XML.
+    """
+    index, (file, start, end), temp_folder, memory_bytes = task
+    lex_file = file.split("/")[-1].replace(".yaml", "")
+    xml_path = f"{temp_folder}/{index}.xml"
+    run_path = f"{temp_folder}/{index}.entries"
+    lines = 0
+    with ExternalSorter(memory_bytes, temp_folder) as entries:
+        with open(xml_path, "w", encoding="utf-8") as temp_file:
+            for entry_id, entry_data in read_range(file, start, end):
+                lines += process_synset(entry_id, entry_data, temp_file, lex_file, entries)
+        entries.save(run_path)
+    return xml_path, run_path, lines
+
+
+def compress_chunk(data):
+    """
+    Compress a chunk of the output as a complete gzip member.
+    """
+    return gzip.compress(data, mtime=0)
+
+
+def ordered_results(pool, func, tasks, workers):
+    """
+    Apply a function to tasks with a pool of workers and yield the results in the order
+    of the tasks, with a few tasks per worker in flight at a time.
+    """
+    if pool is None:
+        for task in tasks:
+            yield func(task)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        while len(pending) > 2 * workers:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class GzipMemberWriter:
+    """
+    A text file written as a gzip file of independent members, each a chunk of the
+    text that is compressed by the pool of workers. The members are written in order,
+    and a sequence of gzip members is read as one stream by any gzip reader.
+    """
+    def __init__(self, path, pool=None, workers=1, chunk_size=CHUNK_SIZE):
+        self.f = open(path, "wb")
+        self.pool = pool
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.size = 0
+        self.pending = deque()
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size:
+            self.flush_chunk()
+
+    def flush_chunk(self):
+        if not self.buffer:
+            return
+        data = "".join(self.buffer).encode("utf-8")
+        self.buffer = []
+        self.size = 0
+        if self.pool is None:
+            self.f.write(compress_chunk(data))
+            return
+        self.pending.append(self.pool.apply_async(compress_chunk, (data,)))
+        while len(self.pending) > 2 * self.workers:
+            self.f.write(self.pending.popleft().get())
+
+    def close(self):
+        self.flush_chunk()
+        while self.pending:
+            self.f.write(self.pending.popleft().get())
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
 
 
 if __name__ == "__main__":
@@ -85,34 +190,40 @@ if __name__ == "__main__":
         type=str,
         help="Year of the OEWN version.",
         default="2025")
+    parser.add_argument(
+        "--memory_mb",
+        type=int,
+        help="Memory for sorting the lexical entries, beyond which they are sorted on disk.",
+        default=512)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes to convert and compress with.",
+        default=1)
     args = parser.parse_args()
 
     input_folder = args.input_folder
     if not input_folder.endswith("/"):
         input_folder += "/"
 
-    with shelve.open("entries.db", flag='n', writeback=True) as entries:
-        # Create a temp file to write the entries into
-        temp_file_path = tempfile.mkstemp()[1]
-        
-        temp_lines = 0
-
-        with open(temp_file_path, "w", encoding="utf-8") as temp_file:
-            for file in tqdm(glob(input_folder + "*.yaml"), desc="Reading YAML files"):
-                lex_file = file.split("/")[-1].replace(".yaml", "")
-                block = ""
-                with open(file, "r", encoding="utf-8") as f:
-                    for line in f:
-                        if line.startswith((" ", "\t")):
-                            block += line
-                        else:
-                            if block:
-                                process_block(block, temp_file, lex_file, entries)
-                            block = line
-                    if block:
-                        process_block(block, temp_file, lex_file, entries)
-
-    with gzip.open(args.output_file, "wt", encoding="utf-8") as output_file:
+    # The YAML files are split into ranges of whole synsets, and each range is
+    # converted by a worker to a file of XML and a sorted run of its lexical entries in
+    # a temporary folder. The runs are then merged, so that the lexical entries are
+    # written in sorted order without holding all of them in memory
+    temp_folder = tempfile.mkdtemp()
+    pool = Pool(args.workers) if args.workers > 1 else None
+    ranges = [task for file in sorted(glob(input_folder + "*.yaml")) for task in file_ranges(file, RANGE_SIZE)]
+    tasks = [(index, task, temp_folder, (args.memory_mb << 20) // args.workers)
+             for index, task in enumerate(ranges)]
+    converted = list(tqdm(ordered_results(pool, convert_range, tasks, args.workers),
+                          desc="Reading YAML files", total=len(tasks)))
+
+    entries = ExternalSorter(args.memory_mb << 20, temp_folder)
+    for _, run_path, _ in converted:
+        entries.add_run(run_path)
+    temp_lines = sum(lines for _, _, lines in converted)
+
+    with GzipMemberWriter(args.output_file, pool, args.workers) as output_file:
         output_file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         output_file.write('<!DOCTYPE LexicalResource SYSTEM "http://globalwordnet.github.io/schemas/WN-LMF-1.3.dtd">\n')
         output_file.write('<LexicalResource xmlns:dc="https://globalwordnet.github.io/schemas/dc/">\n')
@@ -123,31 +234,29 @@ if __name__ == "__main__":
         output_file.write('           license="https://creativecommons.org/licenses/by/4.0"\n')
         output_file.write(f'           version="{args.year}"\n')
         output_file.write('           url="https://github.com/globalwordnet/english-namenet">\n')
-        with shelve.open("entries.db", flag='r') as entries:
-            lemma = entries.dict.firstkey().decode('utf-8')
-            while lemma is not None:
-                synsets = entries[lemma]
+        with entries:
+            for lemma, pairs in groupby(entries, key=lambda pair: pair[0]):
                 entry_id = lemma2entryid(lemma)
                 output_file.write(f'    <LexicalEntry id="{entry_id}">\n')
                 output_file.write(f'      <Lemma writtenForm="{xml_escape(lemma)}" partOfSpeech="n"/>\n')
-                for synset in synsets:
+                for _, synset in pairs:
                     synset_str = f"{synset}"
                     output_file.write(f'      <Sense id="{entry_id[:-2]}-{synset}" synset="{synset_str}"/>\n')
                 output_file.write('    </LexicalEntry>\n')
-                lemma = entries.dict.nextkey(lemma)
-                if lemma:
-                    lemma = lemma.decode('utf-8')
 
-        with open(temp_file_path, "r", encoding="utf-8") as temp_file:
-            for line in tqdm(temp_file, desc="Writing Synsets", total=temp_lines):
-                output_file.write(line)
+        with tqdm(desc="Writing Synsets", total=temp_lines) as pbar:
+            for xml_path, _, lines in converted:
+                with open(xml_path, "r", encoding="utf-8") as temp_file:
+                    for block in iter(lambda: temp_file.read(1 << 20), ""):
+                        output_file.write(block)
+                pbar.update(lines)
 
         output_file.write('  </Lexicon>\n')
         output_file.write('</LexicalResource>\n')
 
-        # Remove the temp file
-        os.remove(temp_file_path)
-        os.remove("entries.db")
-
-
+    if pool is not None:
+        pool.close()
+        pool.join()
 
+    # Remove the temp files
+    shutil.rmtree(temp_folder)
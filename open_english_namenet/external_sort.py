@@ -0,0 +1,123 @@
+"""External merge sort of records that may not fit in memory.
+
+Records are collected in memory until their estimated size reaches the memory limit,
+and are then sorted and written to a temporary file as a sorted run. Iterating over the
+sorter merges the runs and the records still in memory with a k-way merge, which only
+holds one block of each run in memory at a time. If there are more runs than can be
+merged at once, they are first merged in groups into longer runs.
+"""
+import heapq
+import pickle
+import sys
+import tempfile
+
+# The number of records that are written to and read from a run at a time
+BLOCK_SIZE = 1000
+# The most runs that are merged at once
+MAX_MERGE = 64
+
+
+def record_size(record):
+    """
+    An estimate of the memory taken by a record, which is a tuple of strings.
+    """
+    return sys.getsizeof(record) + sum(sys.getsizeof(field) for field in record)
+
+
+def write_blocks(records, f):
+    """
+    Write sorted records to a file, in blocks of BLOCK_SIZE records.
+    """
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) == BLOCK_SIZE:
+            pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+            block = []
+    if block:
+        pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_run(records, directory=None):
+    """
+    Write sorted records to a temporary file as a run.
+    """
+    f = tempfile.TemporaryFile(dir=directory)
+    write_blocks(records, f)
+    f.seek(0)
+    return f
+
+
+def read_run(f):
+    """
+    Iterate over the records of a run.
+    """
+    while True:
+        try:
+            block = pickle.load(f)
+        except EOFError:
+            return
+        yield from block
+
+
+class ExternalSorter:
+    """
+    Sorts records in at most about `memory_bytes` of memory. Add the records with
+    `add` and then iterate over the sorter to read them back in sorted order.
+    """
+    def __init__(self, memory_bytes=512 << 20, directory=None):
+        self.memory_bytes = memory_bytes
+        self.directory = directory
+        self.records = []
+        self.size = 0
+        self.runs = []
+
+    def add(self, record):
+        self.records.append(record)
+        self.size += record_size(record)
+        if self.size >= self.memory_bytes:
+            self.spill()
+
+    def spill(self):
+        """
+        Write the records in memory to disk as a sorted run.
+        """
+        self.records.sort()
+        self.runs.append(write_run(self.records, self.directory))
+        self.records = []
+        self.size = 0
+
+    def add_run(self, path):
+        """
+        Add a sorted run that was written to a file by `save`, for example by another
+        process.
+        """
+        self.runs.append(open(path, "rb"))
+
+    def save(self, path):
+        """
+        Write all the records to a file as one sorted run.
+        """
+        with open(path, "wb") as f:
+            write_blocks(self, f)
+
+    def __iter__(self):
+        self.records.sort()
+        while len(self.runs) > MAX_MERGE:
+            group, self.runs = self.runs[:MAX_MERGE], self.runs[MAX_MERGE:]
+            self.runs.append(write_run(heapq.merge(*(read_run(f) for f in group)), self.directory))
+            for f in group:
+                f.close()
+        return heapq.merge(*(read_run(f) for f in self.runs), iter(self.records))
+
+    def close(self):
+        for f in self.runs:
+            f.close()
+        self.runs = []
+        self.records = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -5,7 +5,7 @@ import json
 from collections import Counter
 import csv
 from tqdm import tqdm
-from open_english_namenet import load_wordnet_data, WIKIDATA_DB
+from open_english_namenet import load_wordnet_data, WIKIDATA_DB, decode_properties
 
 HYP_IGNORE = set([ "00001740-n", "00001930-n", "00002452-n", 
                "00002684-n", "00007347-n", "00021007-n",
@@ -27,7 +27,7 @@ if __name__ == "__main__":
             )
             result = cursor.fetchone()
             if result:
-                links = json.loads(result[1])
+                links = decode_properties(result[1])
                 if "P31" in links:
                     for qid2 in links["P31"]:
                         for h in hyps[ssid]:
@@ -0,0 +1,123 @@
+"""Fingerprints of the new synsets written by generate.py, so that a run for a new
+Wikidata dump can reuse the text of the synsets of the entities that did not change.
+
+The text of a new synset depends only on its job, which is the QID, the hypernyms and
+the keyword arguments of process_entry, and on the English label and description of
+the entity. The job is computed from the properties that generate.py reads (P31, P21,
+P106, P171, P105 and P225) of the entity and of the entities it is related to, such as
+the parent and child taxa of a taxon, so a hash of the job, the label and the
+description changes whenever the text of the synset would. FINGERPRINT_VERSION is
+hashed as well, and must be changed when the format of the synsets changes.
+
+Each output file has a sidecar, which is written through the checkpoint together with
+the output, of one record per synset: the interned QID, the fingerprint and the byte
+offsets of the block of the synset in the file. A run with --incremental reads the
+sidecars of the previous output before it replaces any file, and copies the block of a
+synset whose fingerprint is unchanged instead of rendering it again. The labels and
+descriptions are still read, in the same batched query, to compute the fingerprints.
+So the synsets of unchanged entities keep their text, including the order of their
+lists, and only the synsets of added, removed or changed entities differ from the
+previous output.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from glob import glob
+import numpy as np
+from qid_map import qid_to_int
+
+FINGERPRINT_VERSION = 1
+# The suffix of the sidecar of an output file
+SUFFIX = ".fingerprints"
+# A record of a sidecar: the interned QID, the fingerprint and the start and end of the block
+RECORD = struct.Struct("<qqQQ")
+RECORD_DTYPE = np.dtype([("qid", "<i8"), ("fingerprint", "<i8"), ("start", "<u8"), ("end", "<u8")])
+
+
+def entry_fingerprint(qid, hyps, kwargs, label, definition):
+    """
+    The fingerprint of the synset of a job, as a signed 64-bit integer.
+    """
+    # The meronyms are written as a set, so their order does not matter
+    kwargs = {key: sorted(value) if key == "mero" else value for key, value in kwargs.items()}
+    data = json.dumps([FINGERPRINT_VERSION, qid, hyps, kwargs, label, definition], sort_keys=True)
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def pack_fingerprints(fingerprints, offset):
+    """
+    The sidecar records of a chunk, from tuples of the QID, the fingerprint and the
+    start and end of the block of each synset in the text of the chunk, which starts
+    at `offset` in the output file.
+    """
+    return b"".join(RECORD.pack(qid_to_int(qid), fingerprint, offset + start, offset + end)
+                    for qid, fingerprint, start, end in fingerprints)
+
+
+class PreviousOutput:
+    """
+    The synsets of the previous output in a folder, looked up by QID through the
+    sidecars of its files. The files are mapped into memory when this is created, so
+    the synsets are read from the previous files even after they are replaced.
+    """
+    def __init__(self, folder):
+        self.paths = [sidecar[:-len(SUFFIX)] for sidecar in sorted(glob(os.path.join(folder, "*" + SUFFIX)))
+                      if os.path.exists(sidecar[:-len(SUFFIX)])]
+        records = [np.fromfile(path + SUFFIX, dtype=RECORD_DTYPE) for path in self.paths]
+        files = [np.full(len(file_records), i, dtype=np.int32) for i, file_records in enumerate(records)]
+        records = np.concatenate(records) if records else np.zeros(0, dtype=RECORD_DTYPE)
+        order = np.argsort(records["qid"], kind="stable")
+        self.qids = records["qid"][order]
+        self.fingerprints = records["fingerprint"][order]
+        self.starts = records["start"][order]
+        self.ends = records["end"][order]
+        self.files = np.concatenate(files)[order] if files else np.zeros(0, dtype=np.int32)
+        self.open()
+
+    def open(self):
+        self.data = []
+        for path in self.paths:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                self.data.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b"")
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["data"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+    def __len__(self):
+        return len(self.qids)
+
+    def text(self, qid, fingerprint):
+        """
+        The text of the synset of an entity in the previous output, or None if it has
+        no synset there or its fingerprint has changed.
+        """
+        entity = qid_to_int(qid)
+        i = int(np.searchsorted(self.qids, entity))
+        if i == len(self.qids) or self.qids[i] != entity or self.fingerprints[i] != fingerprint:
+            return None
+        data = self.data[self.files[i]]
+        start, end = int(self.starts[i]), int(self.ends[i])
+        # A file that was changed after its sidecar was written is not trusted
+        if end > len(data) or not data[start:end].startswith(f"{qid}-n:".encode("utf-8")):
+            return None
+        return data[start:end].decode("utf-8")
+
+    def close(self):
+        for data in self.data:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
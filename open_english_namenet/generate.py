@@ -1,19 +1,29 @@
 """The main script to generate Open English Termnet from Wikidata and OEWN"""
 import yaml
 from tqdm import tqdm
-from collections import defaultdict
+import io
+from collections import defaultdict, deque
+from multiprocessing import Pool
+from urllib.parse import quote
 import sqlite3
 import json
 import csv
 import os
-import pickle
 import argparse
-from open_english_namenet import WIKIDATA_DB, WORDNET_SOURCE, load_wordnet_data, fetch_in_chunks, read_wikidata_with_prop_vals, get_labels_and_defn, oewn_extract, wikidata_extract
+from open_english_namenet import WIKIDATA_DB, WORDNET_SOURCE, load_wordnet_data, read_wikidata_with_prop_vals_many, get_labels_and_defn_many, chunked, oewn_extract, wikidata_extract
 from glob import glob
-
-
-def process_entry(qid, cursor, hyps, wd2entry, f, lexfiles, addendum, lemmas=[], inst=True, mero=[]):
-    label, definition = get_labels_and_defn(qid, cursor)
+from oewn_snapshot import open_snapshot
+from taxon_tree import TaxonTree, TaxonTreeConsumer, MappedAncestors
+from cache import CACHE_DIR, configure as cache_config, database_fingerprint, file_hash, oewn_fingerprint
+from checkpoint import Checkpoint
+from fingerprints import PreviousOutput, entry_fingerprint, pack_fingerprints
+from namenet import build_index
+from yaml_emitter import synset_yaml, WRITE_BUFFER
+from property_scan import database_path
+from qid_map import ProjectedQidListMap
+
+
+def process_entry(qid, label, definition, hyps, wd2entry, f, lexfiles, addendum, lemmas=[], inst=True, mero=[]):
     if label == [] or definition == "":
         return (None, None)
     if qid in wd2entry:
@@ -70,40 +80,162 @@ def process_entry(qid, cursor, hyps, wd2entry, f, lexfiles, addendum, lemmas=[],
             }
         if mero:
             entry["mero_member"] = list(set(mero))
-        yaml.dump({new_id: entry}, f, sort_keys=False)
+        f.write(synset_yaml(new_id, entry))
         return new_id, entry
 
-def is_hyp(ssid1, ssid2, hyps):
-    if ssid1 not in hyps:
-        return False
-    if ssid2 in hyps.get(ssid1, []):
-        return True
-    return any(is_hyp(hyp, ssid2, hyps) for hyp in hyps.get(ssid1, []))
-
-def dedupe_hyps(wn_hyps, hyps):
-    wn_hyps = sorted(list(set(wn_hyps)))
-    wn_hyps = [wh for wh in wn_hyps
-               if not any(is_hyp(wh2, wh, hyps) for wh2 in wn_hyps if wh2 != wh)]
-    return wn_hyps
-
-def find_taxon_hyps(qid, cursor, wd2hypernym, rank, seen=set()):
-    if qid in seen:
-        return []
-    seen.add(qid)
-    if qid in wd2hypernym:
-        if rank == "":
-            return [wd2hypernym[qid]]
+def render_entries(batch, cursor, wd2entry, lexfiles, previous=None):
+    """
+    Write the new synsets of a batch of jobs as YAML. Returns the text, the entries
+    for existing OEWN synsets, which update the addendums and so are processed by the
+    coordinator in order, and the fingerprints of the new synsets with the offsets of
+    their blocks in the text. The text of a synset whose fingerprint is the same in the
+    previous output is copied from it.
+    """
+    blocks = []
+    existing = []
+    fingerprints = []
+    size = 0
+    labels = get_labels_and_defn_many([qid for qid, _, _ in batch], cursor, len(batch))
+    for (qid, hyps, kwargs), (_, label, definition) in zip(batch, labels):
+        if qid in wd2entry:
+            existing.append((qid, label, definition, hyps, kwargs))
+            continue
+        fingerprint = entry_fingerprint(qid, hyps, kwargs, label, definition)
+        block = previous.text(qid, fingerprint) if previous is not None else None
+        if block is None:
+            out = io.StringIO()
+            process_entry(qid, label, definition, hyps, wd2entry, out, lexfiles, None, **kwargs)
+            block = out.getvalue()
+        if block:
+            length = len(block.encode("utf-8"))
+            blocks.append(block)
+            fingerprints.append((qid, fingerprint, size, size + length))
+            size += length
+    return "".join(blocks), existing, fingerprints
+
+# The state of a worker process of the entry pool
+worker = {}
+
+def init_worker(db_path, wd2entry, lexfiles, previous):
+    """
+    Open a read-only connection to the database in a worker process.
+    """
+    db = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+    worker["cursor"] = db.cursor()
+    worker["wd2entry"] = wd2entry
+    worker["lexfiles"] = lexfiles
+    worker["previous"] = previous
+
+def render_batch(batch):
+    return render_entries(batch, worker["cursor"], worker["wd2entry"], worker["lexfiles"], worker["previous"])
+
+def apply_existing(existing, wd2entry, lexfiles, addendum):
+    """
+    Add the entries for existing OEWN synsets of a batch to the addendums.
+    """
+    for qid, label, definition, hyps, kwargs in existing:
+        process_entry(qid, label, definition, hyps, wd2entry, None, lexfiles, addendum, **kwargs)
+
+def process_entries(jobs, cursor, wd2entry, output, lexfiles, addendum, batch_size=10000, pool=None, workers=1,
+                    previous=None):
+    """
+    Process entries in batches, so that the labels and definitions are fetched with
+    one query per batch. Each job is a tuple of the QID, its hypernyms and the keyword
+    arguments to process_entry. Each batch is committed to the checkpoint output as a
+    chunk, and the jobs that were committed by an earlier run are skipped.
+    With a pool of workers, the batches are rendered by the workers and their output
+    is written in order, so the files are the same as from a serial run. The jobs are
+    still generated in this process, which keeps the state shared between jobs, such as
+    the entities already seen, serial. The synsets of the `previous` output whose
+    fingerprints are unchanged are copied from it (see fingerprints).
+    """
+    jobs = output.skip_committed(jobs)
+
+    def commit(batch_jobs, last_qid, rendered):
+        text, existing, fingerprints = rendered
+        apply_existing(existing, wd2entry, lexfiles, addendum)
+        output.commit(text, existing, batch_jobs, last_qid, pack_fingerprints(fingerprints, output.size))
+
+    if pool is None:
+        for batch in chunked(jobs, batch_size):
+            commit(len(batch), batch[-1][0], render_entries(batch, cursor, wd2entry, lexfiles, previous))
+        return
+
+    pending = deque()
+    for batch in chunked(jobs, batch_size):
+        pending.append((len(batch), batch[-1][0], pool.apply_async(render_batch, (batch,))))
+        # Keep a few batches per worker in flight, so that memory stays bounded
+        while len(pending) > 2 * workers:
+            batch_jobs, last_qid, result = pending.popleft()
+            commit(batch_jobs, last_qid, result.get())
+    while pending:
+        batch_jobs, last_qid, result = pending.popleft()
+        commit(batch_jobs, last_qid, result.get())
+
+def dedupe_hyps(wn_hyps, closure):
+    """
+    Remove duplicates and any hypernyms implied by another of the hypernyms.
+    """
+    return closure.most_specific(wn_hyps)
+
+def overlap_jobs(entities, overlaps_by_wikidata, closure, seen, desc):
+    """
+    Yield the jobs for the instances of an overlapping Wikidata class, skipping
+    entities that were already generated from another class.
+    """
+    for entity, superclazzes in tqdm(entities, desc=desc, position=1, leave=False):
+        if entity in seen:
+            continue
+        seen.add(entity)
+        if "Q5" in superclazzes or "Q16521" in superclazzes:
+            continue
+        wn_hyps = [wh for superclazz in superclazzes for wh in overlaps_by_wikidata.get(superclazz, [])]
+        wn_hyps = dedupe_hyps(wn_hyps, closure)
+        yield entity, wn_hyps, {}
+
+def human_jobs(humans, occupation_by_qid, closure):
+    """
+    Yield the jobs for humans, with hypernyms from their gender and occupations, which
+    are projected when the humans are read.
+    """
+    for entity, data in tqdm(humans.projected_items(), desc="Processing humans", total=len(humans)):
+        wn_hyps = ["02474924-n"]
+        if "P21" in data and "Q6581097" in data["P21"]:
+            wn_hyps.append("09647338-n")
+        elif "P21" in data and "Q6581072" in data["P21"]:
+            wn_hyps.append("09642198-n")
+
+        if "P106" in data:
+            wn_hyps.extend([wh
+                         for occ in data["P106"]
+                         for wh in occupation_by_qid.get(occ, [])])
+
+        wn_hyps = dedupe_hyps(wn_hyps, closure)
+
+        yield entity, wn_hyps, {}
+
+def taxon_jobs(rows, children, wd2entry, total):
+    """
+    Yield the jobs for taxa from the rows of the working CSV file.
+    """
+    for row in tqdm(rows, desc="Writing taxons", total=total):
+        entity = row[0]
+        sci_name = row[1]
+        rank = row[2]
+        wn_hyps = json.loads(row[3])
+        if " " in sci_name:
+            yield entity, wn_hyps, {"inst": False}
         else:
-            return [h[0] for h in wd2hypernym[qid] if rank in h[1]]
-    cursor.execute("SELECT properties FROM properties WHERE qid = ?", (qid,))
-    result = cursor.fetchone()
-    if not result:
-        print(f"No properties for {qid}")
-        return []
-    data = json.loads(result[0])
-    if "P171" not in data:
-        return []
-    return [t for parent in data["P171"] for t in find_taxon_hyps(parent, cursor, wd2hypernym, rank, seen)]
+            childs = []
+            for c in children.get(entity, []):
+                if c in wd2entry:
+                    childs.append(wd2entry[c][0])
+                else:
+                    childs.append(c + "-n")
+
+            yield entity, wn_hyps, {"lemmas": [f"{rank} {sci_name}", f"{sci_name}"],
+                                    "inst": False,
+                                    "mero": childs}
 
 
 if __name__ == "__main__":
@@ -119,13 +251,21 @@ if __name__ == "__main__":
     parser.add_argument("--skip_humans", action="store_true", help="Skip processing humans")
     parser.add_argument("--skip_taxons", action="store_true", help="Skip processing taxons")
     parser.add_argument("--update_addendums", action="store_true", help="Update addendums")
+    parser.add_argument("--workers", type=int, help="Number of processes to scan Wikidata and write entries with", default=1)
+    parser.add_argument("--cache_dir", type=str, help="Directory of the cached intermediate results", default=CACHE_DIR)
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted run from its last checkpoint")
+    parser.add_argument("--incremental", action="store_true", help="Reuse the synsets of the previous output whose entities have not changed")
     args = parser.parse_args()
 
+    cache_config(args.cache_dir)
+
     # Load WordNet data
     wikidata_links, hyps, wn_lemmas, wd2entry, lexfiles = load_wordnet_data(with_wd2data=True, with_lexfiles=True)
 
     wn_lemmas['09596003-n'] = "Titaness"
 
+    hyp_closure = open_snapshot(WORDNET_SOURCE).closure()
+
     # Invert wd2entry to entry2wd
     entry2wd = {}
     for wd, (ssid, data) in wd2entry.items():
@@ -137,6 +277,34 @@ if __name__ == "__main__":
     output_folder = f"{args.output_folder}/automatic"
     addendum_folder = f"{args.output_folder}/addendum"
 
+    # The fingerprints of the previous output, which is read before any file is replaced
+    if args.incremental:
+        previous = PreviousOutput(output_folder)
+        print(f"{len(previous)} synsets in the previous output")
+    else:
+        previous = None
+
+    # The workers are started now, so that they inherit the WordNet data
+    if args.workers > 1:
+        pool = Pool(args.workers, initializer=init_worker, initargs=(database_path(cursor), wd2entry, lexfiles, previous))
+    else:
+        pool = None
+
+    # The outputs are committed in chunks, so that an interrupted run can be resumed
+    # from the last chunk. The checkpoint is only resumed if the inputs are the same.
+    checkpoint_inputs = {
+        "wikidata": database_fingerprint(args.wd),
+        "oewn": oewn_fingerprint(WORDNET_SOURCE),
+        "annotations": [file_hash(path) for path in (args.overlaps, args.linked_occupations,
+                                                     args.taxon_ssids, args.taxon2common)],
+        "phases": [not args.skip_overlaps, not args.skip_humans, not args.skip_taxons],
+    }
+    checkpoint = Checkpoint(f"{args.output_folder}/.checkpoint", checkpoint_inputs, args.resume)
+    if checkpoint.addendums_written:
+        # The run was interrupted while replacing the addendums, which finishes now
+        for file in glob(f"{addendum_folder}/*.yaml.tmp"):
+            os.replace(file, file[:-len(".tmp")])
+
     # Load addendums
     addendums = {}
     for file in tqdm(glob(f"{addendum_folder}/*.yaml"), desc="Loading addendums"):
@@ -145,10 +313,13 @@ if __name__ == "__main__":
             data = yaml.load(f, Loader=yaml.CLoader)
             addendums[filename] = data
 
-    if not args.skip_overlaps:
-        overlaps_by_wikidata = defaultdict(list)
-        overlaps_by_oewn = defaultdict(list)
+    for existing in checkpoint.deltas():
+        apply_existing(existing, wd2entry, lexfiles, addendums)
+
+    overlaps_by_wikidata = defaultdict(list)
+    overlaps_by_oewn = defaultdict(list)
 
+    if not args.skip_overlaps:
         # Read overlaps which states which Wikidata parents map to which OEWN synsets
         with open(args.overlaps, "r") as f:
             reader = csv.DictReader(f)
@@ -162,8 +333,22 @@ if __name__ == "__main__":
 
         print(len(overlaps_by_wikidata), "Wikidata items with overlaps")
 
-        # Read Wikidata P31 (instance of) property values for all Wikidata items which have overlaps
-        wikidata_props = read_wikidata_with_prop_vals(cursor, "P31", overlaps_by_wikidata.keys(), "overlap_instances")
+    # Read Wikidata P31 (instance of) property values for all the phases at once, so
+    # that the properties table is scanned at most once
+    queries = []
+    if not args.skip_overlaps:
+        queries.append(("P31", overlaps_by_wikidata.keys(), "overlap_instances"))
+    if not args.skip_humans:
+        queries.append(("P31", ["Q5"], "human_instances", ["P21", "P106"], []))
+    if not args.skip_taxons:
+        queries.append(("P31", ["Q16521"], "taxon_instances", [], ["P225"]))
+    # The taxon tree is read in the same scan of Wikidata, if there is one
+    consumers = {"taxon_tree": TaxonTreeConsumer()} if not args.skip_taxons else {}
+    instances = dict(zip([query[2] for query in queries],
+                         read_wikidata_with_prop_vals_many(cursor, queries, args.workers, consumers)))
+
+    if not args.skip_overlaps:
+        wikidata_props = instances.pop("overlap_instances")
 
         seen = set()
 
@@ -174,19 +359,12 @@ if __name__ == "__main__":
             lemma = wn_lemmas[wn_hyp].replace(' ', '_').lower()
             if "," in lemma:
                 lemma = lemma.split(",")[0]
-            with open(f"{output_folder}/noun.{lemma}.yaml", "w") as f1:
+            with checkpoint.output(f"{output_folder}/noun.{lemma}.yaml") as f1:
                 for wd in wds:
-                    for entity, superclazzes in tqdm(wikidata_props.get(wd, {}).items(), desc=f"Processing {lemma} -> {wd}", position=1, leave=False):
-                        if entity in seen:
-                            continue
-                        seen.add(entity)
-                        if "Q5" in superclazzes or "Q16521" in superclazzes:
-                            continue
-                        wn_hyps = [wh for superclazz in superclazzes for wh in overlaps_by_wikidata.get(superclazz, [])]
-                        wn_hyps = dedupe_hyps(wn_hyps, hyps)
-                        process_entry(entity, cursor, wn_hyps, wd2entry, f1, lexfiles, addendums)
-                        #new_id, entry = make_entry(entity, cursor, wn_hyps, wd2entry)
-                        #write_entry(f1, new_id, entry, args.curated)
+                    jobs = overlap_jobs(wikidata_props.get(wd, {}).items(), overlaps_by_wikidata, hyp_closure, seen,
+                                        f"Processing {lemma} -> {wd}")
+                    process_entries(jobs, cursor, wd2entry, f1, lexfiles, addendums, pool=pool, workers=args.workers,
+                                    previous=previous)
 
 
     if not args.skip_humans:
@@ -199,34 +377,15 @@ if __name__ == "__main__":
                 oewn = oewn_extract(row["Linked"])
                 occupation_by_qid[qid].append(oewn)
 
-        wikidata_props = read_wikidata_with_prop_vals(cursor, "P31", ["Q5"], "human_instances")
+        wikidata_props = instances.pop("human_instances")
 
-        with open(f"{output_folder}/noun.human.yaml", "w") as f:
-            for entity, superclazzes in tqdm(wikidata_props.get("Q5", {}).items(), desc="Processing humans"):
-                cursor.execute("SELECT properties FROM properties WHERE qid = ?", (entity,))
-                result = cursor.fetchone()
-                if not result:
-                    continue
-
-                data = json.loads(result[0])
-                
-                wn_hyps = ["02474924-n"]
-                if "P21" in data and "Q6581097" in data["P21"]:
-                    wn_hyps.append("09647338-n")
-                elif "P21" in data and "Q6581072" in data["P21"]:
-                    wn_hyps.append("09642198-n")
-            
-                if "P106" in data:
-                    wn_hyps.extend([wh 
-                                 for occ in data["P106"]
-                                 for wh in occupation_by_qid.get(occ, [])])
-
-                wn_hyps = dedupe_hyps(wn_hyps, hyps)
-
-                process_entry(entity, cursor, wn_hyps, wd2entry, f, lexfiles, addendums)
+        with checkpoint.output(f"{output_folder}/noun.human.yaml") as f:
+            jobs = human_jobs(wikidata_props.get("Q5", ProjectedQidListMap()), occupation_by_qid, hyp_closure)
+            process_entries(jobs, cursor, wd2entry, f, lexfiles, addendums, pool=pool, workers=args.workers,
+                            previous=previous)
 
     if not args.skip_taxons:
-        wikidata_props = read_wikidata_with_prop_vals(cursor, "P31", ["Q16521"], "taxon_instances")
+        wikidata_props = instances.pop("taxon_instances")
 
         wd2hypernym = defaultdict(list)
 
@@ -253,111 +412,89 @@ if __name__ == "__main__":
                     taxon2common[entry2wd[taxon_ssid]] = common_ssid
 
 
+        taxon_tree = TaxonTree.load(cursor, args.workers)
+        taxa = wikidata_props.get("Q16521", ProjectedQidListMap(data_project=["P225"]))
+        rank_labels = taxon_tree.rank_labels(cursor)
+        common_ancestors = MappedAncestors(taxon_tree, taxon2common, lambda ssid, rank: [ssid])
+        hypernym_ancestors = MappedAncestors(taxon_tree, wd2hypernym,
+                                             lambda hs, rank: [h[0] for h in hs if rank in h[1]])
+
         children = defaultdict(list)
 
         with open(f"{output_folder}/noun.taxon_working.csv", "w") as f:
             writer = csv.writer(f)
-            for entity_superclazzes in tqdm(wikidata_props.get("Q16521", {}).items(), desc="Processing taxons"):
-                entity, superclazzes = entity_superclazzes
-                cursor.execute("SELECT properties FROM properties WHERE qid = ?", (entity,))
-                result = cursor.fetchone()
-                if not result:
-                    print(f"No properties for {entity}")
-                    continue
+            for entity, data in tqdm(taxa.projected_items(), desc="Processing taxons", total=len(taxa)):
+                for superclazz in taxon_tree.parents(entity):
+                    children[superclazz].append(entity)
 
-                data = json.loads(result[0])
+                rank_qid = taxon_tree.rank(entity)
 
-                if "P171" in data:
-                    for superclazz in data["P171"]:
-                        children[superclazz].append(entity)
-
-                if "P105" not in data:
+                if rank_qid is None:
                     #print(f"No taxon rank for {entity}")
                     continue
 
-                rank_qid = data["P105"][0]
-
-                cursor.execute("SELECT label FROM labels_en WHERE qid = ?", (rank_qid,))
-                result = cursor.fetchone()
-
-                if not result:
+                if rank_qid not in rank_labels:
                     print(f"No label for rank {rank_qid} of {entity}")
                     continue
 
-                rank = json.loads(result[0])[0]
-
-                cursor.execute("SELECT data_properties FROM data_properties WHERE qid = ?", (entity,))
-                result = cursor.fetchone()
-
-                if not result:
-                    #print(f"No data properties for {entity}")
-                    continue
-
-                data_props = json.loads(result[0])
+                rank = rank_labels[rank_qid]
 
-                if "P225" not in data_props:
+                if "P225" not in data:
                     #print(f"No scientific name for {entity}")
                     continue
 
-                sci_name = data_props["P225"][0][0]
+                sci_name = data["P225"][0][0]
 
                 if " " in sci_name:
                     words = sci_name.split(" ")
                     if (len(words) == 2 and words[0][0].isupper() and words[1][0].islower()) or \
                             (len(words) == 3 and words[0][0].isupper() and words[1][0].islower() and words[2][0].islower()):
-                        wn_hyps = find_taxon_hyps(entity, cursor, taxon2common, "")
-                        wn_hyps = dedupe_hyps(wn_hyps, hyps)
+                        wn_hyps = common_ancestors.find(entity)
+                        wn_hyps = dedupe_hyps(wn_hyps, hyp_closure)
                     writer.writerow([entity, sci_name, rank, json.dumps(wn_hyps)])
                 else:
-                    wn_hyps = find_taxon_hyps(entity, cursor, wd2hypernym, rank)
-                    wn_hyps = dedupe_hyps(wn_hyps, hyps)
+                    wn_hyps = hypernym_ancestors.find(entity, rank)
+                    wn_hyps = dedupe_hyps(wn_hyps, hyp_closure)
                     if not wn_hyps:
                         wn_hyps = ["08008892-n"]
                 
                     writer.writerow([entity, sci_name, rank, json.dumps(wn_hyps)])
 
-        with open(f"{output_folder}/noun.taxon.yaml", "w") as f:
-            with open(f"{output_folder}/noun.species.yaml", "w") as f_species:
+        with checkpoint.output(f"{output_folder}/noun.taxon.yaml") as f:
+            with open(f"{output_folder}/noun.species.yaml", "w", buffering=WRITE_BUFFER) as f_species:
                 csv_line_count = sum(1 for line in open(f"{output_folder}/noun.taxon_working.csv"))
                 with open(f"{output_folder}/noun.taxon_working.csv", "r") as f_csv:
                     reader = csv.reader(f_csv)
-
-                    for row in tqdm(reader, desc="Writing taxons", total=csv_line_count):
-                        entity = row[0]
-                        sci_name = row[1]
-                        rank = row[2]
-                        wn_hyps = json.loads(row[3])
-                        if " " in sci_name:
-                            process_entry(entity, cursor, wn_hyps, wd2entry, f, lexfiles, addendums,
-                                          inst=False)
-                            #new_id, entry = make_entry(entity, cursor, wn_hyps, wd2entry,
-                            #                           inst=False)
-                            #write_entry(f_species, new_id, entry, args.curated)
-
-                        else:
-                            childs = []
-                            for c in children.get(entity, []):
-                                if c in wd2entry:
-                                    childs.append(wd2entry[c][0])
-                                else:
-                                    childs.append(c + "-n")
-
-                            process_entry(entity, cursor, wn_hyps, wd2entry, f, lexfiles, addendums,
-                                          lemmas=[f"{rank} {sci_name}", f"{sci_name}"],
-                                          inst=False,
-                                          mero=childs)
-                            #new_id, entry = make_entry(entity, cursor, wn_hyps, wd2entry,
-                            #                           lemmas=[f"{rank} {sci_name}", f"{sci_name}"],
-                            #                           inst=False,
-                            #                           mero=childs)
-                            #write_entry(f, new_id, entry, args.curated)
+                    jobs = taxon_jobs(reader, children, wd2entry, csv_line_count)
+                    process_entries(jobs, cursor, wd2entry, f, lexfiles, addendums, pool=pool, workers=args.workers,
+                                    previous=previous)
 
         os.remove(f"{output_folder}/noun.taxon_working.csv")
 
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if previous is not None:
+        previous.close()
+
     if args.update_addendums:
+        # Write all the addendums before replacing any, so that an interrupted update
+        # either leaves them as they were or is finished by a resumed run, which then
+        # must not replay the deltas onto them again
         for filename, data in addendums.items():
-            with open(f"{addendum_folder}/{filename}", "w", encoding="utf-8") as f:
+            with open(f"{addendum_folder}/{filename}.tmp", "w", encoding="utf-8") as f:
                 yaml.dump(data, f, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+        checkpoint.mark_addendums_written()
+        for filename in addendums:
+            os.replace(f"{addendum_folder}/{filename}.tmp", f"{addendum_folder}/{filename}")
+
+    # The index of the synsets for namenet.Namenet, which is built before the
+    # checkpoint is cleared so that a resumed run builds it again
+    build_index(args.output_folder)
+
+    checkpoint.clear()
                     
 
 
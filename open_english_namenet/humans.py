@@ -2,8 +2,9 @@ import sqlite3
 from tqdm import tqdm
 from collections import Counter, defaultdict
 import json
-from open_english_namenet import WIKIDATA_DB, fetch_in_chunks, load_wordnet_data
+from open_english_namenet import WIKIDATA_DB, find_wikidata_with_prop_val, load_wordnet_data, decode_properties
 import csv
+import argparse
 
 manual_review_sections = [ "manual_review_babel.csv",
                           #"manual_review_conflict.csv",
@@ -27,10 +28,14 @@ def wikidata_superclasses(qid, cursor) -> list[str]:
     result = cursor.fetchone()
     if not result:
         return []
-    data = json.loads(result[0])
+    data = decode_properties(result[0])
     return data.get("P279", [])  # P279 is the property for 'subclass of'
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the occupations of humans in Wikidata and link them to OEWN.")
+    parser.add_argument("--workers", type=int, help="Number of processes to scan Wikidata with", default=1)
+    args = parser.parse_args()
+
     manual_reviews = defaultdict(list)
 
     wikidata_links, hyps, wn_lemmas = load_wordnet_data()
@@ -50,20 +55,11 @@ if __name__ == "__main__":
     db = sqlite3.connect(WIKIDATA_DB)
     cursor = db.cursor()
 
-    cursor.execute("SELECT COUNT(*) FROM properties")
-    total_count = cursor.fetchone()[0]
-
-    cursor.execute("SELECT qid, properties FROM properties")
-
     occupations = Counter()
 
-    for row in tqdm(fetch_in_chunks(cursor), desc="Processing properties", total=total_count):
-        qid = row[0]
-        data = json.loads(row[1])
-        if "P31" in data and "Q5" in data["P31"]:
-            if "P106" in data:
-                for occupation in data["P106"]:
-                    occupations[occupation] += 1
+    for qid, occs in tqdm(find_wikidata_with_prop_val(cursor, "P31", "Q5", "P106", args.workers), desc="Processing humans"):
+        for occupation in occs:
+            occupations[occupation] += 1
 
     linked_occupations = 0
 
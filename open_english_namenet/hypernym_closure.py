@@ -0,0 +1,183 @@
+"""Transitive closure of the OEWN hypernym graph.
+
+The synsets are interned as integers and the direct hypernyms are held as a CSR
+adjacency (offsets into one array of parents). The ancestors of every synset are then
+computed in a single pass in topological order, parents before children, so each
+synset's ancestors are just the union of its parents and their ancestors.
+"""
+from array import array
+from collections import deque
+
+# The most number of hypernym combinations to remember in most_specific
+MEMO_SIZE = 1000000
+
+
+class HypernymClosure:
+    """
+    The transitive closure of a hypernym graph, given as a mapping from synset IDs to
+    their direct hypernyms.
+    """
+    def __init__(self, hyps):
+        self.ssids = []
+        self.index = {}
+        for ssid, parents in hyps.items():
+            self.intern(ssid)
+            for parent in parents:
+                self.intern(parent)
+        self.keys = [self.index[ssid] for ssid in hyps]
+
+        n = len(self.ssids)
+        self.offsets = array("L", [0] * (n + 1))
+        for ssid, parents in hyps.items():
+            i = self.index[ssid]
+            self.offsets[i + 1] = len(parents)
+        for i in range(n):
+            self.offsets[i + 1] += self.offsets[i]
+        self.parents = array("L", [0] * self.offsets[n])
+        for ssid, parents in hyps.items():
+            start = self.offsets[self.index[ssid]]
+            for j, parent in enumerate(parents):
+                self.parents[start + j] = self.index[parent]
+
+        self.ancestor_lists = [None] * n
+        self.ancestor_sets = [None] * n
+        self.calculate()
+        self.memo = {}
+
+    @classmethod
+    def from_ancestors(cls, ssids, ancestor_lists, keys):
+        """
+        Create the closure from the ancestors of every synset that were already
+        calculated, such as those in the OEWN snapshot. The synsets and their ancestors
+        are given as integer IDs, and `keys` are the IDs of the synsets of the input.
+        """
+        closure = cls.__new__(cls)
+        closure.ssids = list(ssids)
+        closure.index = {ssid: i for i, ssid in enumerate(closure.ssids)}
+        closure.keys = list(keys)
+        closure.offsets = None
+        closure.parents = None
+        closure.ancestor_lists = [None] * len(closure.ssids)
+        closure.ancestor_sets = [None] * len(closure.ssids)
+        for i, ancestors in enumerate(ancestor_lists):
+            closure.set_ancestors(i, ancestors)
+        closure.memo = {}
+        return closure
+
+    def intern(self, ssid):
+        """
+        Return the integer ID of a synset, adding it if it is new.
+        """
+        i = self.index.get(ssid)
+        if i is None:
+            i = len(self.ssids)
+            self.index[ssid] = i
+            self.ssids.append(ssid)
+        return i
+
+    def direct(self, i):
+        """
+        The direct hypernyms of a synset by integer ID.
+        """
+        return self.parents[self.offsets[i]:self.offsets[i + 1]]
+
+    def calculate(self):
+        """
+        Calculate the ancestors of every synset in one topological pass.
+        """
+        n = len(self.ssids)
+        pending = [self.offsets[i + 1] - self.offsets[i] for i in range(n)]
+        children = [[] for _ in range(n)]
+        for i in range(n):
+            for p in self.direct(i):
+                children[p].append(i)
+
+        queue = deque(i for i in range(n) if pending[i] == 0)
+        while queue:
+            i = queue.popleft()
+            self.set_ancestors(i, self.merge_parents(i))
+            for c in children[i]:
+                pending[c] -= 1
+                if pending[c] == 0:
+                    queue.append(c)
+
+        # Synsets on or below a cycle are never released by the topological pass, so
+        # their ancestors are found by a breadth-first search instead
+        for i in range(n):
+            if self.ancestor_lists[i] is None:
+                self.set_ancestors(i, self.search(i))
+
+    def merge_parents(self, i):
+        """
+        The ancestors of a synset whose parents are all done: its parents first and then
+        the ancestors of each parent in order.
+        """
+        ancestors = dict.fromkeys(self.direct(i))
+        for p in self.direct(i):
+            ancestors.update(dict.fromkeys(self.ancestor_lists[p]))
+        return ancestors
+
+    def search(self, i):
+        """
+        The ancestors of a synset by breadth-first search over the hypernyms.
+        """
+        ancestors = dict.fromkeys(self.direct(i))
+        queue = deque(ancestors)
+        while queue:
+            p = queue.popleft()
+            if self.ancestor_lists[p] is not None:
+                ancestors.update(dict.fromkeys(self.ancestor_lists[p]))
+                continue
+            for q in self.direct(p):
+                if q not in ancestors:
+                    ancestors[q] = None
+                    queue.append(q)
+        return ancestors
+
+    def set_ancestors(self, i, ancestors):
+        """
+        Store the ancestors of a synset, in order and as a set for membership tests.
+        """
+        self.ancestor_lists[i] = tuple(ancestors)
+        self.ancestor_sets[i] = frozenset(ancestors)
+
+    def ancestors(self, ssid):
+        """
+        All the hypernyms of a synset, direct hypernyms first.
+        """
+        i = self.index.get(ssid)
+        if i is None:
+            return []
+        return [self.ssids[a] for a in self.ancestor_lists[i]]
+
+    def is_ancestor(self, ancestor, ssid):
+        """
+        Check if the first synset is a (transitive) hypernym of the second.
+        """
+        i = self.index.get(ssid)
+        a = self.index.get(ancestor)
+        return i is not None and a is not None and a in self.ancestor_sets[i]
+
+    def as_dict(self):
+        """
+        The closure as a mapping from each synset of the input to the list of all its
+        hypernyms, as returned by calculate_transitive_hyps.
+        """
+        return {self.ssids[i]: [self.ssids[a] for a in self.ancestor_lists[i]] for i in self.keys}
+
+    def most_specific(self, ssids):
+        """
+        Remove the synsets that are a hypernym of another synset in the list, and return
+        the rest in sorted order. Most lists repeat a handful of combinations, so the
+        results are memoized on the set of synsets.
+        """
+        key = frozenset(ssids)
+        result = self.memo.get(key)
+        if result is None:
+            candidates = sorted(key)
+            result = tuple(ssid for ssid in candidates
+                           if not any(self.is_ancestor(ssid, other) for other in candidates if other != ssid))
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo.clear()
+            self.memo[key] = result
+        return list(result)
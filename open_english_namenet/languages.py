@@ -1,14 +1,12 @@
-from open_english_namenet import WIKIDATA_DB, fetch_in_chunks, load_wordnet_data, WORDNET_SOURCE
-from glob import glob
-import yaml
+from open_english_namenet import WIKIDATA_DB, WORDNET_SOURCE, decode_properties
 from tqdm import tqdm
 from collections import defaultdict
 import sqlite3
 import json
 import csv
 import argparse
-import os
-import pickle
+from cache import cache, database_fingerprint
+from oewn_snapshot import open_snapshot
 
 WORDNET_PREFIX = "https://en-word.net/id/oewn-"
 WIKIDATA_PREFIX = "https://www.wikidata.org/entity/"
@@ -33,7 +31,7 @@ def is_wikidata_language(qid, cursor):
     result = cursor.fetchone()
     if not result:
         return False
-    data = json.loads(result[0])
+    data = decode_properties(result[0])
     return "P31" in data and ("Q34770" in data["P31"]  # P31 is 'instance of', Q34770 is 'language'
             or "Q33742" in data["P31"]  # Q34771 is 'natural language'
             or "Q20162172" in data["P31"]  # Q20162172 is 'human language'
@@ -44,6 +42,44 @@ def is_wikidata_language(qid, cursor):
             or "Q941501" in data["P31"]  # Q941501 is 'language group'
             or "Q25295" in data["P31"])  # Q25295 is 'language family'
 
+def read_oewn_hypos():
+    """
+    Read the direct hypernyms, labels and definitions of all OEWN synsets.
+    """
+    hyps = {}
+    labels = {}
+    defns = {}
+
+    snapshot = open_snapshot(WORDNET_SOURCE)
+    for _, ssid, entry in snapshot.synsets(["members", "definition", "hypernym", "instance_hypernym"]):
+        hyps[ssid] = []
+        if "hypernym" in entry:
+            hyps[ssid].extend(entry["hypernym"])
+        if "instance_hypernym" in entry:
+            hyps[ssid].extend(entry["instance_hypernym"])
+        labels[ssid] = entry["members"]
+        defns[ssid] = entry.get("definition", [""])[0]
+
+    return hyps, labels, defns
+
+def find_labels_in_wikidata(cursor, all_labels):
+    """
+    Find the Wikidata entities with any of the labels (in lower case).
+    """
+    cursor.execute("SELECT label, qid FROM labels_en")
+
+    labels2qid = defaultdict(list)
+
+    for row in tqdm(cursor.fetchall(), desc="Processing Wikidata labels"):
+        label, qid = row
+        wd_labels = json.loads(label)
+        for l in wd_labels:
+            l = l.lower()
+            if l in all_labels:
+                labels2qid[l].append(qid)
+
+    return labels2qid
+
 def get_wd_definition(qid, cursor):
     """
     Get the definition of a Wikidata QID.
@@ -63,28 +99,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process manual taxon reviews.")
     args = parser.parse_args()
 
-    if os.path.exists("oewn_hypos.pickle"):
-        with open("oewn_hypos.pickle", "rb") as f:
-            hyps, labels, defns = pickle.load(f)
-    else:
-        hyps = {}
-        labels = {}
-        defns = {}
-
-        for file in tqdm(glob(f"{WORDNET_SOURCE}/src/yaml/[nva]*.yaml"), desc="Loading WordNet data"):
-            data = yaml.safe_load(open(file, "r"))
-            for ssid, entry in data.items():
-                hyps[ssid] = []
-                if "hypernym" in entry:
-                    hyps[ssid].extend(entry["hypernym"])
-                if "instance_hypernym" in entry:
-                    hyps[ssid].extend(entry["instance_hypernym"])
-                labels[ssid] = entry["members"]
-                defns[ssid] = entry.get("definition", [""])[0]
-
-        with open("oewn_hypos.pickle", "wb") as f:
-            pickle.dump((hyps, labels, defns), f)
-            
+    hyps, labels, defns = read_oewn_hypos()
 
     hypos = defaultdict(list)
     for ssid, hypos_list in tqdm(hyps.items(), desc="Finding hyponyms"):
@@ -104,25 +119,8 @@ if __name__ == "__main__":
             if any(c.isupper() for c in label):
                 all_labels[label.lower()].append(language)
 
-    cursor.execute("SELECT label, qid FROM labels_en")
-
-    labels2qid = defaultdict(list)
-
-    if os.path.exists("labels2qid.pickle"):
-        with open("labels2qid.pickle", "rb") as f:
-            labels2qid = pickle.load(f)
-    else:
-        for row in tqdm(cursor.fetchall(), desc="Processing Wikidata labels"):
-            label, qid = row
-            wd_labels = json.loads(label)
-            for l in wd_labels:
-                l = l.lower()
-                if l in all_labels:
-                    labels2qid[l].append(qid)
-
-        with open("labels2qid.pickle", "wb") as f:
-            pickle.dump(labels2qid, f)
-
+    labels2qid = cache.get("labels2qid", {"wikidata": database_fingerprint(WIKIDATA_DB), "labels": sorted(all_labels)},
+                           lambda: find_labels_in_wikidata(cursor, all_labels))
 
     with open("languages.csv", "w") as f:
         writer = csv.writer(f)
@@ -0,0 +1,104 @@
+"""A load generator for the lookup service of server.py.
+
+Keys are sampled from the index of the output folder, and requests are sent over a
+number of concurrent keep-alive connections. The throughput and the median and 99th
+percentile of the latency of the requests are reported at the end.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import quote
+from namenet import Namenet
+from qid_map import int_to_qid
+
+
+def sample_keys(namenet, kind, n, rng):
+    """
+    Sample keys of a kind from the index.
+    """
+    if kind == "qid":
+        return [int_to_qid(namenet.qids[rng.randrange(len(namenet.qids))]) for _ in range(n)]
+    if kind == "lemma":
+        return [namenet.lemmas[rng.randrange(len(namenet.lemmas))] for _ in range(n)]
+    return [namenet.ssid(rng.randrange(len(namenet))) for _ in range(n)]
+
+
+def percentile(values, q):
+    """
+    The nearest-rank percentile of sorted values.
+    """
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def build_request(host, kind, keys):
+    if len(keys) == 1:
+        return f"GET /{kind}/{quote(keys[0], safe='')} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1")
+    body = json.dumps(keys).encode("utf-8")
+    return (f"POST /batch/{kind} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+
+
+async def run_connection(host, port, requests, latencies, errors):
+    """
+    Send requests one after the other over one connection and record their latencies.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while requests:
+            request = requests.pop()
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            length = 0
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if lines[0].split(" ")[1] != "200":
+                errors.append(lines[0])
+    finally:
+        writer.close()
+
+
+async def run(args, requests):
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(args.host, args.port, requests, latencies, errors)
+                           for _ in range(args.connections)))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the throughput and latency of the lookup service.")
+    parser.add_argument("folder", type=str, help="Output folder of generate.py, to sample keys from", nargs="?", default="data")
+    parser.add_argument("--host", type=str, help="Host of the service", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Port of the service", default=8080)
+    parser.add_argument("--kind", type=str, help="Kind of lookup", choices=["synset", "qid", "lemma", "hypernyms"], default="synset")
+    parser.add_argument("--requests", type=int, help="Number of requests to send", default=10000)
+    parser.add_argument("--batch_size", type=int, help="Number of keys per request, which are sent as a batch if more than one", default=1)
+    parser.add_argument("--connections", type=int, help="Number of concurrent connections", default=16)
+    parser.add_argument("--seed", type=int, help="Seed for sampling the keys", default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with Namenet(args.folder) as namenet:
+        keys = sample_keys(namenet, args.kind, args.requests * args.batch_size, rng)
+    requests = [build_request(args.host, args.kind, keys[i:i + args.batch_size])
+                for i in range(0, len(keys), args.batch_size)]
+
+    elapsed, latencies, errors = asyncio.run(run(args, requests))
+
+    print(f"Requests:    {len(latencies)} ({len(errors)} errors)")
+    print(f"Lookups:     {len(latencies) * args.batch_size}")
+    print(f"Elapsed:     {elapsed:.2f} s")
+    print(f"Throughput:  {len(latencies) / elapsed:.0f} requests/s, {len(latencies) * args.batch_size / elapsed:.0f} lookups/s")
+    if latencies:
+        print(f"Latency p50: {percentile(latencies, 50) * 1000:.2f} ms")
+        print(f"Latency p99: {percentile(latencies, 99) * 1000:.2f} ms")
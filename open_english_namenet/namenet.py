@@ -0,0 +1,313 @@
+"""Random access to the generated synsets through a sidecar index of their offsets.
+
+The index is written by generate.py next to the `curated`, `addendum` and `automatic`
+folders of the output, and maps the synset IDs, the Wikidata IDs and the member lemmas of the
+synsets to the positions of their blocks of YAML in the files. It uses the file format
+of the OEWN snapshot (see oewn_snapshot) and holds:
+
+* the relative paths of the files that were indexed,
+* the file and the byte offsets of the start and end of the block of each synset,
+  which are the records of the index, in the order of the files,
+* the synset IDs in sorted order with their records,
+* the Wikidata IDs as sorted integers (see qid_map) with their records,
+* the distinct member lemmas in sorted order with the CSR lists of their records,
+* the case-folded lemmas in sorted order with the lemmas they were folded from, for
+  case-insensitive prefix queries, which are a binary search for the first key with
+  the prefix followed by a scan of the keys that have it.
+
+Opening the index only maps it into memory, and a lookup is a binary search over the
+mmap followed by decoding the blocks of the synsets that are found. Only the
+lexicographer files of synsets are indexed, not the files of entries keyed by lemma.
+The fingerprint of the index is a hash of the paths, sizes and modification times of
+the files, which are listed again when the index is opened, so an index that is out of
+date with the files, including files that were added or removed, is refused rather
+than read at wrong offsets.
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import re
+from bisect import bisect_left
+from glob import glob
+from tqdm import tqdm
+from oewn_snapshot import int_array, int_bytes, list_offsets, read_sections, string_table, write_sections, StringTable
+from qid_map import qid_to_int
+from yaml_reader import parse_synset_blocks
+
+MAGIC = b"OENNINDX"
+VERSION = 3
+# The name of the index in the output folder
+INDEX_FILE = "namenet.index"
+# The folders of the output folder that are indexed
+FOLDERS = ("curated", "addendum", "automatic")
+# The lexicographer files of synsets in the folders, which leaves out the files of
+# entries by lemma (entries-*.yaml) and of sense orders
+LEXFILES = "[nva]*.yaml"
+SYNSET_ID = re.compile(r"Q?[0-9]+-[nvasr]")
+
+
+def output_files(folder):
+    """
+    The paths of the lexicographer files of an output folder, relative to the folder.
+    """
+    return [os.path.relpath(path, folder)
+            for subfolder in FOLDERS
+            for path in sorted(glob(os.path.join(folder, subfolder, LEXFILES)))]
+
+
+def files_fingerprint(folder, files):
+    """
+    A hash of the paths, sizes and modification times of the files of the index, or
+    None if one of them no longer exists.
+    """
+    digest = hashlib.sha256()
+    for file in files:
+        try:
+            stat = os.stat(os.path.join(folder, file))
+        except FileNotFoundError:
+            return None
+        digest.update(f"{file}\t{stat.st_size}\t{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def entry_qids(entry):
+    """
+    The Wikidata IDs of an entry as interned integers.
+    """
+    wikidata = entry.get("wikidata", [])
+    for qid in [wikidata] if isinstance(wikidata, str) else wikidata:
+        if isinstance(qid, str) and qid[:1] == "Q" and qid[1:].isdigit():
+            yield qid_to_int(qid)
+
+
+def build_index(folder):
+    """
+    Index the YAML files of an output folder and write the index to INDEX_FILE in it.
+    """
+    files = output_files(folder)
+    record_files, starts, ends = [], [], []
+    ssids, qids, lemmas = [], [], {}
+    for file_index, file in enumerate(tqdm(files, desc="Indexing output")):
+        with open(os.path.join(folder, file), "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                continue
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for start, end, ssid, entry in parse_synset_blocks(data):
+                    if not isinstance(ssid, str) or not SYNSET_ID.fullmatch(ssid):
+                        continue
+                    record = len(starts)
+                    record_files.append(file_index)
+                    starts.append(start)
+                    ends.append(end)
+                    ssids.append((ssid, record))
+                    qids.extend((qid, record) for qid in entry_qids(entry))
+                    for member in entry.get("members", []):
+                        records = lemmas.setdefault(member, [])
+                        if not records or records[-1] != record:
+                            records.append(record)
+    ssids.sort()
+    qids.sort()
+    sorted_lemmas = sorted(lemmas)
+    record_ssids = [0] * len(starts)
+    for i, (_, record) in enumerate(ssids):
+        record_ssids[record] = i
+    prefix_keys = sorted((lemma.casefold(), i) for i, lemma in enumerate(sorted_lemmas))
+
+    sections = {}
+    sections["file.offsets"], sections["file.data"] = string_table(files)
+    sections["record.file"] = int_bytes("I", record_files)
+    sections["record.start"] = int_bytes("Q", starts)
+    sections["record.end"] = int_bytes("Q", ends)
+    sections["record.ssid"] = int_bytes("I", record_ssids)
+    sections["ssid.offsets"], sections["ssid.data"] = string_table(ssid for ssid, _ in ssids)
+    sections["ssid.records"] = int_bytes("I", [record for _, record in ssids])
+    sections["qid.entities"] = int_bytes("q", [qid for qid, _ in qids])
+    sections["qid.records"] = int_bytes("I", [record for _, record in qids])
+    sections["lemma.offsets"], sections["lemma.data"] = string_table(sorted_lemmas)
+    sections["lemma.lists"] = list_offsets(lemmas[lemma] for lemma in sorted_lemmas)
+    sections["lemma.records"] = int_bytes("I", [record for lemma in sorted_lemmas for record in lemmas[lemma]])
+    sections["prefix.offsets"], sections["prefix.data"] = string_table(key for key, _ in prefix_keys)
+    sections["prefix.lemmas"] = int_bytes("I", [i for _, i in prefix_keys])
+    write_sections(os.path.join(folder, INDEX_FILE), MAGIC, VERSION, files_fingerprint(folder, files), sections)
+
+
+class Namenet:
+    """
+    The generated synsets of an output folder, looked up through the index. Synsets
+    are returned as pairs of the synset ID and the entry, as read from the YAML.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        path = os.path.join(folder, INDEX_FILE)
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fingerprint, self.sections = read_sections(self.mmap, MAGIC, VERSION)
+        if fingerprint is None:
+            raise ValueError(f"{path} is not a Namenet index of version {VERSION}")
+        self.files = list(self.strings("file"))
+        if fingerprint != files_fingerprint(folder, output_files(folder)):
+            raise ValueError(f"{path} is out of date with the files in {folder}, rebuild it with namenet.py")
+        self.record_files = int_array("I", self.sections["record.file"])
+        self.starts = int_array("Q", self.sections["record.start"])
+        self.ends = int_array("Q", self.sections["record.end"])
+        self.record_ssids = int_array("I", self.sections["record.ssid"])
+        self.ssids = self.strings("ssid")
+        self.ssid_records = int_array("I", self.sections["ssid.records"])
+        self.qids = int_array("q", self.sections["qid.entities"])
+        self.qid_records = int_array("I", self.sections["qid.records"])
+        self.lemmas = self.strings("lemma")
+        self.lemma_lists = int_array("Q", self.sections["lemma.lists"])
+        self.lemma_records = int_array("I", self.sections["lemma.records"])
+        self.prefix_keys = self.strings("prefix")
+        self.prefix_lemmas = int_array("I", self.sections["prefix.lemmas"])
+        self.data = {}
+
+    def strings(self, name):
+        return StringTable(int_array("Q", self.sections[f"{name}.offsets"]), self.sections[f"{name}.data"])
+
+    def __reduce__(self):
+        # Worker processes open the files again rather than copying the index
+        return Namenet, (self.folder,)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def file_data(self, file_index):
+        """
+        The mmap of an indexed file, which is opened on first use.
+        """
+        if file_index not in self.data:
+            with open(os.path.join(self.folder, self.files[file_index]), "rb") as f:
+                self.data[file_index] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.data[file_index]
+
+    def text(self, record):
+        """
+        The YAML text of the block of a record.
+        """
+        data = self.file_data(self.record_files[record])
+        return data[self.starts[record]:self.ends[record]].decode("utf-8")
+
+    def record(self, record):
+        """
+        The synset of a record as a pair of the synset ID and the entry.
+        """
+        data = self.file_data(self.record_files[record])
+        for _, _, ssid, entry in parse_synset_blocks(data[self.starts[record]:self.ends[record]]):
+            return ssid, entry
+        raise ValueError(f"No synset at record {record} of the index")
+
+    def ssid(self, record):
+        """
+        The synset ID of a record, without decoding its block.
+        """
+        return self.ssids[self.record_ssids[record]]
+
+    def lexfile(self, record):
+        """
+        The name of the lexicographer file of a record.
+        """
+        return os.path.basename(self.files[self.record_files[record]]).replace(".yaml", "")
+
+    def find_synset(self, ssid):
+        """
+        The record of a synset, or -1 if it is not in the index.
+        """
+        i = bisect_left(self.ssids, ssid)
+        return self.ssid_records[i] if i < len(self.ssids) and self.ssids[i] == ssid else -1
+
+    def find_qid(self, qid):
+        """
+        The records of the synsets that are linked to a Wikidata ID.
+        """
+        entity = qid_to_int(qid)
+        i = bisect_left(self.qids, entity)
+        records = []
+        while i < len(self.qids) and self.qids[i] == entity:
+            records.append(self.qid_records[i])
+            i += 1
+        return records
+
+    def find_lemma(self, lemma):
+        """
+        The records of the synsets that have a lemma as a member.
+        """
+        i = bisect_left(self.lemmas, lemma)
+        if i < len(self.lemmas) and self.lemmas[i] == lemma:
+            return self.lemma_records[self.lemma_lists[i]:self.lemma_lists[i + 1]].tolist()
+        return []
+
+    def prefix_search(self, prefix, limit=20):
+        """
+        The member lemmas that start with a prefix, ignoring case, with the IDs of their
+        synsets, as at most `limit` pairs of the lemma and a synset ID. The pairs are
+        in the order of the case-folded lemmas, and the time taken is bounded by the
+        limit rather than by the number of lemmas with the prefix.
+        """
+        key = prefix.casefold()
+        i = bisect_left(self.prefix_keys, key)
+        results = []
+        while len(results) < limit and i < len(self.prefix_keys) and self.prefix_keys[i].startswith(key):
+            lemma = self.prefix_lemmas[i]
+            start, end = self.lemma_lists[lemma], self.lemma_lists[lemma + 1]
+            for record in self.lemma_records[start:min(end, start + limit - len(results))]:
+                results.append((self.lemmas[lemma], self.ssid(record)))
+            i += 1
+        return results
+
+    def by_synset(self, ssid):
+        """
+        The entry of a synset, or None if it is not in the index.
+        """
+        record = self.find_synset(ssid)
+        return self.record(record)[1] if record >= 0 else None
+
+    def by_qid(self, qid):
+        """
+        The synsets that are linked to a Wikidata ID.
+        """
+        return [self.record(record) for record in self.find_qid(qid)]
+
+    def by_lemma(self, lemma):
+        """
+        The synsets that have a lemma as a member.
+        """
+        return [self.record(record) for record in self.find_lemma(lemma)]
+
+    def close(self):
+        for data in self.data.values():
+            data.close()
+        self.data = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the index of the generated synsets or look synsets up with it.")
+    parser.add_argument("folder", type=str, help="Output folder of generate.py", nargs="?", default="data")
+    parser.add_argument("--synset", type=str, help="Look up a synset by its ID", action="append", default=[])
+    parser.add_argument("--qid", type=str, help="Look up the synsets of a Wikidata ID", action="append", default=[])
+    parser.add_argument("--lemma", type=str, help="Look up the synsets of a lemma", action="append", default=[])
+    parser.add_argument("--prefix", type=str, help="List the lemmas that start with a prefix, ignoring case", default=None)
+    parser.add_argument("--limit", type=int, help="Maximum number of results of a prefix query", default=20)
+    args = parser.parse_args()
+
+    if args.prefix is not None:
+        with Namenet(args.folder) as namenet:
+            for lemma, ssid in namenet.prefix_search(args.prefix, args.limit):
+                print(f"{lemma}\t{ssid}")
+    elif not (args.synset or args.qid or args.lemma):
+        build_index(args.folder)
+    else:
+        with Namenet(args.folder) as namenet:
+            records = [namenet.find_synset(ssid) for ssid in args.synset]
+            records += [record for qid in args.qid for record in namenet.find_qid(qid)]
+            records += [record for lemma in args.lemma for record in namenet.find_lemma(lemma)]
+            for record in records:
+                if record >= 0:
+                    print(namenet.text(record), end="")
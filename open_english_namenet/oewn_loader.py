@@ -0,0 +1,76 @@
+"""Parallel loading of the OEWN YAML source files.
+
+Each lexicographer file is parsed in a worker process with the LibYAML loader, and only
+the fields that the caller asks for are sent back, so the scripts that need different
+parts of OEWN can all read it with one pass over the files.
+"""
+import os
+import yaml
+from glob import glob
+from multiprocessing import Pool
+from tqdm import tqdm
+
+# The fields of a synset that can be loaded
+FIELDS = ("members", "definition", "hypernym", "instance_hypernym", "mero_member", "wikidata")
+
+
+def read_lexfile(task):
+    """
+    Parse one lexicographer file and keep the given fields of each synset.
+    """
+    file, fields = task
+    with open(file, "r") as f:
+        data = yaml.load(f, Loader=yaml.CSafeLoader)
+    return os.path.basename(file), {
+        ssid: {field: entry[field] for field in fields if field in entry}
+        for ssid, entry in data.items()
+    }
+
+
+def lexfile_paths(source, pattern="[nva]*.yaml"):
+    """
+    The lexicographer files of an OEWN checkout that match a pattern, in sorted order.
+    """
+    return sorted(glob(f"{source}/src/yaml/{pattern}"))
+
+
+def load_oewn(source, fields=FIELDS, pattern="[nva]*.yaml", files=None, workers=None):
+    """
+    Load the synsets of an OEWN checkout, as a mapping from the name of each
+    lexicographer file to its synsets, each a dictionary of the requested fields.
+    `files` overrides the pattern with a list of file names in src/yaml. The files are
+    parsed by `workers` processes (by default one per CPU) and returned in sorted order.
+    """
+    for field in fields:
+        if field not in FIELDS:
+            raise ValueError(f"Unknown OEWN field {field}")
+    if files is not None:
+        paths = [f"{source}/src/yaml/{file}" for file in files]
+    else:
+        paths = lexfile_paths(source, pattern)
+    tasks = [(path, tuple(fields)) for path in paths]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    lexfiles = {}
+    with tqdm(desc="Loading WordNet data", total=len(tasks)) as pbar:
+        if workers > 1:
+            with Pool(workers) as pool:
+                for lexfile, synsets in pool.imap(read_lexfile, tasks):
+                    lexfiles[lexfile] = synsets
+                    pbar.update(1)
+        else:
+            for task in tasks:
+                lexfile, synsets = read_lexfile(task)
+                lexfiles[lexfile] = synsets
+                pbar.update(1)
+    return lexfiles
+
+
+def iter_synsets(lexfiles):
+    """
+    Iterate over the loaded synsets as triples of the lexicographer file, synset ID
+    and fields.
+    """
+    for lexfile, synsets in lexfiles.items():
+        for ssid, entry in synsets.items():
+            yield lexfile, ssid, entry
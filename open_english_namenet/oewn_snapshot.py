@@ -0,0 +1,348 @@
+"""A versioned binary snapshot of the OEWN graph, opened with mmap.
+
+The snapshot is built once per OEWN checkout from the YAML source files and holds:
+
+* the synset IDs in sorted order, so that the integer ID of a synset is its position
+  and synsets are looked up by binary search,
+* the lexicographer file of each synset,
+* the members, definitions and Wikidata links of each synset as lists of strings,
+* the hypernym, instance hypernym and member meronym relations and the transitive
+  closure of the hypernyms (see HypernymClosure) as CSR arrays of synset IDs.
+
+The file starts with a header of the magic bytes, the format version, the fingerprint
+of the OEWN source files and a directory of named sections. Lists of strings are stored
+as a string table (offsets into UTF-8 data) and a CSR array of offsets into the table.
+All integers are little-endian. As the file is only ever read through a read-only
+mmap, opening it takes milliseconds and the pages are shared by all the processes of
+a parallel run.
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from cache import cache, oewn_files_stat, oewn_fingerprint
+from hypernym_closure import HypernymClosure
+from oewn_loader import load_oewn
+
+MAGIC = b"OEWNSNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sII64s")
+SECTION = struct.Struct("<32sQQ")
+
+# The relations between synsets that are held in the snapshot
+RELATIONS = ("hypernym", "instance_hypernym", "mero_member", "ancestors")
+# The fields of a synset that are held as lists of strings
+STRING_FIELDS = ("members", "definition", "wikidata")
+
+
+def int_array(typecode, data):
+    """
+    View little-endian bytes (or a slice of the mmap) as an array of integers, without
+    copying on little-endian machines.
+    """
+    if sys.byteorder == "little":
+        return memoryview(data).cast(typecode)
+    ints = array(typecode)
+    ints.frombytes(bytes(data))
+    ints.byteswap()
+    return ints
+
+
+def int_bytes(typecode, ints):
+    """
+    Write integers as little-endian bytes.
+    """
+    ints = array(typecode, ints)
+    if sys.byteorder != "little":
+        ints.byteswap()
+    return ints.tobytes()
+
+
+def string_table(strings):
+    """
+    Encode strings as two sections: their end offsets and their UTF-8 data.
+    """
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    return int_bytes("Q", offsets), b"".join(encoded)
+
+
+def list_offsets(lists):
+    """
+    Encode the end offsets of lists whose values are stored one after the other.
+    """
+    offsets = [0]
+    for values in lists:
+        offsets.append(offsets[-1] + len(values))
+    return int_bytes("Q", offsets)
+
+
+def csr(lists):
+    """
+    Encode lists of integers as two sections: their end offsets and the values.
+    """
+    lists = list(lists)
+    return list_offsets(lists), int_bytes("I", [value for values in lists for value in values])
+
+
+def build_snapshot(source, path, workers=None):
+    """
+    Build the snapshot of an OEWN checkout and write it atomically to `path`.
+    """
+    lexfiles = load_oewn(source, workers=workers)
+
+    synsets = {}
+    lexfile_of = {}
+    for lexfile, entries in lexfiles.items():
+        for ssid, entry in entries.items():
+            synsets[ssid] = entry
+            lexfile_of[ssid] = lexfile
+    # Synsets that are only the target of a relation still get an integer ID
+    targets = {target for entry in synsets.values()
+               for relation in ("hypernym", "instance_hypernym", "mero_member")
+               for target in entry.get(relation, [])}
+    ssids = sorted(synsets.keys() | targets)
+    index = {ssid: i for i, ssid in enumerate(ssids)}
+    lexfile_names = sorted(lexfiles)
+    lexfile_index = {lexfile: i for i, lexfile in enumerate(lexfile_names)}
+
+    def entry(ssid):
+        return synsets.get(ssid, {})
+
+    closure = HypernymClosure({ssid: entry(ssid).get("hypernym", []) + entry(ssid).get("instance_hypernym", [])
+                               for ssid in ssids})
+
+    sections = {}
+    sections["ssid.offsets"], sections["ssid.data"] = string_table(ssids)
+    sections["lexfile.offsets"], sections["lexfile.data"] = string_table(lexfile_names)
+    # Synsets without a lexicographer file get one past the last file
+    sections["lexfile"] = int_bytes("I", [lexfile_index.get(lexfile_of.get(ssid), len(lexfile_names))
+                                          for ssid in ssids])
+    for field in STRING_FIELDS:
+        values = []
+        for ssid in ssids:
+            value = entry(ssid).get(field, [])
+            values.append([value] if isinstance(value, str) else value)
+        sections[f"{field}.offsets"], sections[f"{field}.data"] = string_table(v for vs in values for v in vs)
+        sections[f"{field}.lists"] = list_offsets(values)
+    for relation in RELATIONS:
+        if relation == "ancestors":
+            lists = ([index[a] for a in closure.ancestors(ssid)] for ssid in ssids)
+        else:
+            lists = ([index[t] for t in entry(ssid).get(relation, [])] for ssid in ssids)
+        sections[f"{relation}.offsets"], sections[f"{relation}.targets"] = csr(lists)
+
+    write_sections(path, MAGIC, VERSION, oewn_fingerprint(source), sections)
+
+
+def write_sections(path, magic, version, fingerprint, sections):
+    """
+    Write a file of named sections with the header and directory of the snapshot
+    format atomically to `path`.
+    """
+    fingerprint = fingerprint.encode("ascii")
+    directory_size = HEADER.size + SECTION.size * len(sections)
+    layout = []
+    offset = directory_size
+    for name, data in sections.items():
+        # Align every section to 8 bytes so that it can be cast to integers
+        offset += -offset % 8
+        layout.append((name, offset, len(data)))
+        offset += len(data)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(magic, version, len(sections), fingerprint))
+            for name, offset, length in layout:
+                f.write(SECTION.pack(name.encode("ascii"), offset, length))
+            for (name, offset, length), data in zip(layout, sections.values()):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_sections(data, magic, version):
+    """
+    Read the fingerprint and the named sections of a file written by write_sections,
+    as views of `data`. The fingerprint is None if the file does not have the magic
+    bytes or the version.
+    """
+    file_magic, file_version, n_sections, fingerprint = HEADER.unpack_from(data, 0)
+    if file_magic != magic or file_version != version:
+        return None, {}
+    sections = {}
+    for i in range(n_sections):
+        name, offset, length = SECTION.unpack_from(data, HEADER.size + i * SECTION.size)
+        sections[name.rstrip(b"\0").decode("ascii")] = memoryview(data)[offset:offset + length]
+    return fingerprint.decode("ascii"), sections
+
+
+class StringTable(Sequence):
+    """
+    A read-only sequence of the strings of a string table in the snapshot.
+    """
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class OewnSnapshot:
+    """
+    A snapshot of OEWN opened with mmap. Synsets are referred to by their integer ID,
+    which is their position in `ssids`.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.fingerprint, self.sections = read_sections(self.mmap, MAGIC, VERSION)
+        if self.fingerprint is None:
+            raise ValueError(f"{path} is not an OEWN snapshot of version {VERSION}")
+
+        self.ssids = self.strings("ssid")
+        self.lexfile_names = self.strings("lexfile")
+        self.lexfiles = int_array("I", self.sections["lexfile"])
+        self.relations = {relation: (int_array("Q", self.sections[f"{relation}.offsets"]),
+                                     int_array("I", self.sections[f"{relation}.targets"]))
+                          for relation in RELATIONS}
+        self.fields = {field: (self.strings(field), int_array("Q", self.sections[f"{field}.lists"]))
+                       for field in STRING_FIELDS}
+
+    def strings(self, name):
+        return StringTable(int_array("Q", self.sections[f"{name}.offsets"]), self.sections[f"{name}.data"])
+
+    def __reduce__(self):
+        # Worker processes open the file again rather than copying the snapshot
+        return OewnSnapshot, (self.path,)
+
+    def __len__(self):
+        return len(self.ssids)
+
+    def index(self, ssid):
+        """
+        The integer ID of a synset, or -1 if it is not in the snapshot.
+        """
+        i = bisect_left(self.ssids, ssid)
+        return i if i < len(self.ssids) and self.ssids[i] == ssid else -1
+
+    def lexfile(self, i):
+        """
+        The lexicographer file of a synset, or None if it has none.
+        """
+        lexfile = self.lexfiles[i]
+        return self.lexfile_names[lexfile] if lexfile < len(self.lexfile_names) else None
+
+    def related(self, relation, i):
+        """
+        The integer IDs of the synsets related to a synset.
+        """
+        offsets, targets = self.relations[relation]
+        return targets[offsets[i]:offsets[i + 1]]
+
+    def values(self, field, i):
+        """
+        The values of a field of a synset as a list of strings.
+        """
+        table, lists = self.fields[field]
+        return [table[j] for j in range(lists[i], lists[i + 1])]
+
+    def synset(self, i, fields):
+        """
+        The fields of a synset as a dictionary in the form of the YAML source files.
+        Fields without values are left out, and Wikidata links are always a list.
+        """
+        entry = {}
+        for field in fields:
+            if field in STRING_FIELDS:
+                values = self.values(field, i)
+            else:
+                values = [self.ssids[j] for j in self.related(field, i)]
+            if values:
+                entry[field] = values
+        return entry
+
+    def synsets(self, fields):
+        """
+        Iterate over the synsets in the lexicographer files as triples of the file,
+        synset ID and fields, like oewn_loader.iter_synsets.
+        """
+        for i, ssid in enumerate(self.ssids):
+            lexfile = self.lexfile(i)
+            if lexfile is not None:
+                yield lexfile, ssid, self.synset(i, fields)
+
+    def closure(self):
+        """
+        The transitive closure of the hypernyms of the snapshot as a HypernymClosure,
+        without calculating it again.
+        """
+        return HypernymClosure.from_ancestors(
+            self.ssids, (self.related("ancestors", i).tolist() for i in range(len(self))),
+            (i for i in range(len(self)) if self.lexfile(i) is not None))
+
+    def relation_view(self, relation):
+        """
+        A read-only mapping from the synset IDs in the lexicographer files to the
+        lists of related synset IDs.
+        """
+        return RelationView(self, relation)
+
+
+class RelationView(Mapping):
+    """
+    A relation of the snapshot as a mapping from synset IDs to lists of synset IDs.
+    """
+    def __init__(self, snapshot, relation):
+        self.snapshot = snapshot
+        self.relation = relation
+
+    def __getitem__(self, ssid):
+        i = self.snapshot.index(ssid) if isinstance(ssid, str) else -1
+        if i < 0 or self.snapshot.lexfile(i) is None:
+            raise KeyError(ssid)
+        return [self.snapshot.ssids[j] for j in self.snapshot.related(self.relation, i)]
+
+    def __iter__(self):
+        return (ssid for i, ssid in enumerate(self.snapshot.ssids) if self.snapshot.lexfile(i) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def open_snapshot(source, workers=None):
+    """
+    Open the snapshot of an OEWN checkout from the cache directory, building it if
+    there is none for the current version of the source files. The hash of the source
+    files is cached by their sizes and modification times, so they are only read again
+    when they change.
+    """
+    fingerprint = cache.get("oewn_fingerprint", oewn_files_stat(source), lambda: oewn_fingerprint(source))
+    path = os.path.join(cache.directory, f"oewn-{fingerprint[:20]}.snapshot")
+    if os.path.exists(path):
+        # The modification time of the file records when it was last used
+        os.utime(path)
+    else:
+        build_snapshot(source, path, workers)
+        cache.evict(keep=(path,))
+    return OewnSnapshot(path)
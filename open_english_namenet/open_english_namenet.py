@@ -1,10 +1,13 @@
-import yaml
-from glob import glob
 from tqdm import tqdm
-import os
-import pickle
 import json
 from collections import defaultdict
+from itertools import islice
+from packed_properties import decode_properties, decode_data_properties
+from qid_map import QidListMap, qid_to_int
+from hypernym_closure import HypernymClosure
+from property_scan import PropertyScan, PropertiesConsumer, PropValsConsumer, ProjectionConsumer, database_path
+from cache import cache, database_fingerprint
+from oewn_snapshot import open_snapshot
 # Common utility code
 
 WORDNET_SOURCE = "/home/jmccrae/projects/globalwordnet/english-wordnet/"
@@ -14,71 +17,36 @@ def calculate_transitive_hyps(hyps):
     """
     Calculate the transitive closure of the hypernym graph.
     """
-    changes = len(hyps)
-    while changes > 0:
-        changes = 0
-        for h1 in list(hyps.keys()):
-            for h2 in hyps.get(h1, []):
-                for h3 in hyps.get(h2, []):
-                    if h3 not in hyps[h1]:
-                        hyps[h1].append(h3)
-                        changes += 1
-    return hyps
+    return HypernymClosure(hyps).as_dict()
 
 def load_wordnet_data(with_wd2data=False, with_lexfiles=False):
     """
-    Load WordNet data from YAML files and extract relevant information.
-    """
-    if os.path.exists("wordnet_data.pickle"):
-        with open("wordnet_data.pickle", "rb") as f:
-            wikidata_links, hyps, wn_lemmas, wd2data, lexfiles = pickle.load(f)
-        if with_wd2data and with_lexfiles:
-            return wikidata_links, hyps, wn_lemmas, wd2data, lexfiles
-        elif with_wd2data:
-            return wikidata_links, hyps, wn_lemmas, wd2data
-        elif with_lexfiles:
-            return wikidata_links, hyps, wn_lemmas, lexfiles
-        else:
-            return wikidata_links, hyps, wn_lemmas
+    Load WordNet data from the OEWN snapshot and extract relevant information. The
+    hypernyms are a read-only view of the transitive closure in the snapshot.
+    """
+    snapshot = open_snapshot(WORDNET_SOURCE)
+    wikidata_links = {}
+    hyps = snapshot.relation_view("ancestors")
+    wn_lemmas = {}
+    wd2data = {}
+    lexfiles = {}
+
+    for lexfile, ssid, entry in snapshot.synsets(["members", "wikidata"]):
+        wn_lemmas[ssid] = ", ".join(entry["members"])
+        lexfiles[ssid] = lexfile
+        if "wikidata" in entry:
+            wikidata_links[ssid] = entry["wikidata"]
+            for wd in wikidata_links[ssid]:
+                wd2data[wd] = (ssid, entry)
+
+    if with_wd2data and with_lexfiles:
+        return wikidata_links, hyps, wn_lemmas, wd2data, lexfiles
+    elif with_wd2data:
+        return wikidata_links, hyps, wn_lemmas, wd2data
+    elif with_lexfiles:
+        return wikidata_links, hyps, wn_lemmas, lexfiles
     else:
-        wikidata_links = {}
-        hyps = {}
-        wn_lemmas = {}
-        wd2data = {}
-        lexfiles = {}
-
-        for file in tqdm(glob(f"{WORDNET_SOURCE}/src/yaml/[nva]*.yaml"), desc="Loading WordNet data"):
-            lexfile = file.split("/")[-1]
-            data = yaml.safe_load(open(file, "r"))
-            for ssid, entry in data.items():
-                wn_lemmas[ssid] = ", ".join(entry["members"])
-                hyps[ssid] = []
-                lexfiles[ssid] = lexfile
-                if "hypernym" in entry:
-                    hyps[ssid] = entry["hypernym"]
-                if "instance_hypernym" in entry:
-                    hyps[ssid] += entry["instance_hypernym"]
-                if "wikidata" in entry:
-                    if isinstance(entry["wikidata"], str):
-                        wikidata_links[ssid] = [entry["wikidata"]]
-                    else:
-                        wikidata_links[ssid] = entry["wikidata"]
-                    for wd in wikidata_links[ssid]:
-                        wd2data[wd] = (ssid, entry)
-
-        hyps = calculate_transitive_hyps(hyps)
-
-        with open("wordnet_data.pickle", "wb") as f:
-            pickle.dump((wikidata_links, hyps, wn_lemmas, wd2data, lexfiles), f)
-
-        if with_wd2data and with_lexfiles:
-            return wikidata_links, hyps, wn_lemmas, wd2data, lexfiles
-        elif with_wd2data:
-            return wikidata_links, hyps, wn_lemmas, wd2data
-        elif with_lexfiles:
-            return wikidata_links, hyps, wn_lemmas, lexfiles
-        else:
-            return wikidata_links, hyps, wn_lemmas
+        return wikidata_links, hyps, wn_lemmas
 
 
 def fetch_in_chunks(cursor, size=1000):
@@ -92,54 +60,179 @@ def fetch_in_chunks(cursor, size=1000):
         for row in rows:
             yield row
 
-def read_wikidata_properties(cursor, props=["P31"]):
+def chunked(iterable, size):
+    """
+    Split an iterable into lists of at most `size` elements.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            break
+        yield chunk
+
+def read_wikidata_properties(cursor, props=["P31"], workers=1):
     """
     Read Wikidata properties from the database and return a mapping of property IDs to their details.
     """
-    if os.path.exists(f"wikidata_properties_{'_'.join(props)}.pickle"):
-        with open(f"wikidata_properties_{'_'.join(props)}.pickle", "rb") as f:
-            return pickle.load(f)
-    else:
-        cursor.execute("SELECT COUNT(*) FROM properties")
-        total = cursor.fetchone()[0]
+    def scan_properties():
+        scan = PropertyScan()
+        scan.register("properties", PropertiesConsumer(props))
+        return scan.run(cursor, desc="Reading Wikidata properties", workers=workers)["properties"]
 
-        cursor.execute("SELECT qid, properties FROM properties")
-        properties = {prop: {} for prop in props}
-        for row in tqdm(fetch_in_chunks(cursor), desc="Reading Wikidata properties", total=total):
-            qid, props_json = row
-            prop_dict = json.loads(props_json)
-            for prop in props:
-                if prop in prop_dict:
-                    properties[prop][qid] = prop_dict[prop]
+    inputs = {"wikidata": database_fingerprint(database_path(cursor)), "props": list(props)}
+    return cache.get(f"wikidata_properties_{'_'.join(props)}", inputs, scan_properties)
 
-        with open(f"wikidata_properties_{'_'.join(props)}.pickle", "wb") as f:
-            pickle.dump(properties, f)
-        return properties
+def has_property_values(cursor):
+    """
+    Check if the database has the property_values edge table (see wikidata_db/property_values.sql).
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'property_values'")
+    return cursor.fetchone() is not None
 
-def read_wikidata_with_prop_vals(cursor, prop, values, key=None):
+def find_wikidata_with_prop_val(cursor, prop, value, with_prop=None, workers=1):
     """
-    Read Wikidata entries that have a specific property with a given value.
+    Find all Wikidata entities that have a property with a given value. Yields pairs of
+    the entity and its values for `with_prop` (by default `prop` itself). Entities that
+    have no value for `with_prop` are skipped.
+
+    This uses the property_values index if present and falls back to a full scan with
+    `workers` processes otherwise. Both yield the entities in the order of the
+    properties table, from which the property_values table is built.
     """
-    if key is not None and os.path.exists(f"wikidata_with_{key}.pickle"):
-        with open(f"wikidata_with_{key}.pickle", "rb") as f:
-            return pickle.load(f)
+    if with_prop is None:
+        with_prop = prop
+    if has_property_values(cursor):
+        cursor.execute("""SELECT matched.qid, other.value FROM property_values AS matched
+            JOIN property_values AS other ON other.qid = matched.qid AND other.prop = ?
+            WHERE matched.prop = ? AND matched.value = ?
+            ORDER BY matched.rowid, other.rowid""", (with_prop, prop, value))
+        qid, vals = None, []
+        for entity, other_value in fetch_in_chunks(cursor):
+            if entity != qid:
+                if vals:
+                    yield qid, vals
+                qid, vals = entity, []
+            vals.append(other_value)
+        if vals:
+            yield qid, vals
     else:
-        cursor.execute("SELECT COUNT(*) FROM properties")
-        total = cursor.fetchone()[0]
-
-        cursor.execute("SELECT qid, properties FROM properties")
-        results = defaultdict(dict)
-        for row in tqdm(fetch_in_chunks(cursor), desc=f"Reading Wikidata with {key}", total=total):
-            qid, props_json = row
-            prop_dict = json.loads(props_json)
-            for v in prop_dict.get(prop, []):
-                if v in values:
-                    results[v][qid] = prop_dict[prop]
+        scan = PropertyScan()
+        scan.register("entities", ProjectionConsumer(prop, [value], [with_prop]))
+        entities = scan.run(cursor, desc=f"Reading Wikidata with {prop}={value}", workers=workers)["entities"]
+        for qid, data in entities.items():
+            if with_prop in data:
+                yield qid, data[with_prop]
+
+def find_wikidata_with_prop_val_projected(cursor, prop, value, project):
+    """
+    Find all Wikidata entities that have a property with a given value in the
+    property_values index. Yields pairs of the entity and a dictionary of its values for
+    the property and for each of the projected properties that it has.
+    """
+    props = [prop] + [p for p in project if p != prop]
+    cursor.execute(f"""SELECT matched.qid, other.prop, other.value FROM property_values AS matched
+        JOIN property_values AS other ON other.qid = matched.qid AND other.prop IN ({','.join('?' * len(props))})
+        WHERE matched.prop = ? AND matched.value = ?
+        ORDER BY matched.rowid, other.rowid""", (*props, prop, value))
+    qid, data = None, {}
+    for entity, other_prop, other_value in fetch_in_chunks(cursor):
+        if entity != qid:
+            if data:
+                yield qid, data
+            qid, data = entity, {}
+        data.setdefault(other_prop, []).append(other_value)
+    if data:
+        yield qid, data
 
+def project_data_properties(cursor, entities, batch_size=500):
+    """
+    Read the projected data properties of the entities of a ProjectedQidListMap, in the
+    order of the entities, `batch_size` entities at a time.
+    """
+    for batch in chunked(entities, batch_size):
+        cursor.execute(f"SELECT qid, data_properties FROM data_properties WHERE qid IN ({','.join('?' * len(batch))})", batch)
+        data = {qid: data_props for qid, data_props in cursor.fetchall()}
+        for qid in batch:
+            entities.append_data(decode_data_properties(data[qid]) if qid in data else {})
+
+def read_wikidata_with_prop_vals_many(cursor, queries, workers=1, consumers={}):
+    """
+    Read the Wikidata entries for several queries, each a tuple of a property, its values
+    and a cache key (or None), and return the results in the same order as the queries.
+    Each result maps a value to a QidListMap of the entities with that value to all
+    their values of the property.
+    A query may also give a list of properties and a list of data properties to
+    project, as `(prop, values, key, project, data_project)`. The values of these are
+    kept for each entity while it is read, in a ProjectedQidListMap, so that they need
+    not be looked up entity by entity afterwards.
+    Queries that are not cached are answered from the property_values index if it
+    exists, and otherwise all together from a single scan of the properties table with
+    `workers` processes. The data properties are in their own table, so they are read
+    after the entities are found.
+    `consumers` maps cache keys to other ScanConsumers whose results are read from the
+    same scan, if the properties table is scanned for the queries and they are not
+    cached. Their results are only cached, under their key with the identity of the
+    database as the inputs, for the functions that read them to load.
+    """
+    queries = [(query[0], list(query[1]), query[2],
+                tuple(query[3]) if len(query) > 3 else (), tuple(query[4]) if len(query) > 4 else ())
+               for query in queries]
+    results = [None] * len(queries)
+    cached = [False] * len(queries)
+    wikidata = database_fingerprint(database_path(cursor))
+    inputs = [{"wikidata": wikidata, "prop": prop, "values": sorted(values),
+               "project": list(project), "data_project": list(data_project)}
+              for prop, values, _, project, data_project in queries]
+    scan = PropertyScan()
+    for i, (prop, values, key, project, data_project) in enumerate(queries):
+        if key is not None:
+            cached[i], results[i] = cache.load(f"wikidata_with_{key}", inputs[i])
+        if cached[i]:
+            continue
+        elif has_property_values(cursor):
+            consumer = PropValsConsumer(prop, values, project, data_project)
+            for v in tqdm(values, desc=f"Reading Wikidata with {key}"):
+                if project:
+                    for qid, data in find_wikidata_with_prop_val_projected(cursor, prop, v, project):
+                        projected = {p: [qid_to_int(value) for value in data.get(p, [])] for p in project}
+                        consumer.entities(qid_to_int(v)).append_projected(
+                            qid_to_int(qid), [qid_to_int(value) for value in data[prop]], projected)
+                else:
+                    for qid, vals in find_wikidata_with_prop_val(cursor, prop, v):
+                        consumer.entities(qid_to_int(v)).append(qid, vals)
+            results[i] = consumer.result()
+        else:
+            scan.register(i, PropValsConsumer(prop, values, project, data_project))
+
+    if scan.consumers:
+        for key, consumer in consumers.items():
+            if not cache.load(key, {"wikidata": wikidata})[0]:
+                scan.register(key, consumer)
+        keys = ", ".join(i if i in consumers else str(queries[i][2]) for i in scan.consumers)
+        for i, result in scan.run(cursor, desc=f"Reading Wikidata with {keys}", workers=workers).items():
+            if i in consumers:
+                cache.store(i, {"wikidata": wikidata}, result)
+            else:
+                results[i] = result
+
+    for i, (prop, values, key, project, data_project) in enumerate(queries):
+        if cached[i]:
+            continue
+        if data_project:
+            for v, entities in results[i].items():
+                project_data_properties(cursor, entities)
         if key is not None:
-            with open(f"wikidata_with_{key}.pickle", "wb") as f:
-                pickle.dump(results, f)
-        return results
+            cache.store(f"wikidata_with_{key}", inputs[i], results[i])
+    return results
+
+def read_wikidata_with_prop_vals(cursor, prop, values, key=None, workers=1, project=(), data_project=()):
+    """
+    Read Wikidata entries that have a specific property with a given value, optionally
+    projecting other properties and data properties of the entries (see
+    read_wikidata_with_prop_vals_many).
+    """
+    return read_wikidata_with_prop_vals_many(cursor, [(prop, values, key, project, data_project)], workers)[0]
 
 
 def get_labels_and_defn(qid, cursor):
@@ -155,6 +248,32 @@ def get_labels_and_defn(qid, cursor):
     return labels, definition
 
 
+def get_labels_and_defn_many(qids, cursor, batch_size=10000):
+    """
+    Fetch the English labels and descriptions for many Wikidata QIDs. The QIDs are
+    resolved `batch_size` at a time by joining against a temporary table, and triples of
+    QID, labels and definition are yielded in the same order as `qids`.
+    """
+    batch_cursor = cursor.connection.cursor()
+    batch_cursor.execute("CREATE TEMP TABLE IF NOT EXISTS batch_qids (idx INTEGER PRIMARY KEY, qid TEXT)")
+    for batch in chunked(qids, batch_size):
+        batch_cursor.execute("DELETE FROM batch_qids")
+        batch_cursor.executemany("INSERT INTO batch_qids VALUES (?, ?)", enumerate(batch))
+        batch_cursor.execute("""SELECT batch_qids.idx, batch_qids.qid, labels_en.label, descriptions_en.description
+            FROM batch_qids
+            LEFT JOIN labels_en ON labels_en.qid = batch_qids.qid
+            LEFT JOIN descriptions_en ON descriptions_en.qid = batch_qids.qid
+            ORDER BY batch_qids.idx""")
+        last_idx = -1
+        for idx, qid, label, description in batch_cursor.fetchall():
+            # Only the first label and description of each QID is used, as in get_labels_and_defn
+            if idx == last_idx:
+                continue
+            last_idx = idx
+            yield qid, json.loads(label) if label else [], description if description else ""
+    batch_cursor.close()
+
+
 def oewn_extract(oewn):
     """
     Extract the OEWN ID from the given string.
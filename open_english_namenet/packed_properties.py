@@ -0,0 +1,268 @@
+"""Compact binary encoding of the properties and data_properties columns of wikidata.db.
+
+The columns are built as JSON text. This script re-encodes them in place as arrays of
+little-endian unsigned 32-bit integers:
+
+    properties:      [n, pid_1 .. pid_n, end_1 .. end_n, qid numbers ...]
+    data_properties: [n, pid_1 .. pid_n, int_end_1 .. int_end_n, byte_end_1 .. byte_end_n,
+                      (number of parts, byte length of each part) for each value ...]
+                     followed by the UTF-8 bytes of all the parts
+
+where `end_i` is the end of the values of the i-th property. Only the properties
+that are actually read are decoded, so scanning for one or two properties does not
+pay for parsing the whole row. Rows that cannot be packed are left as JSON text, and
+decode_properties and decode_data_properties accept either form, so the readers work
+with both packed and unpacked databases.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from array import array
+from collections.abc import Mapping
+from tqdm import tqdm
+
+PROPERTY_VALUES_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "wikidata_db", "property_values.sql")
+
+
+def to_ints(blob):
+    """
+    Read a packed column as an array of integers.
+    """
+    ints = array("I")
+    ints.frombytes(blob[:len(blob) - len(blob) % 4])
+    if sys.byteorder == "big":
+        ints.byteswap()
+    return ints
+
+
+def from_ints(ints):
+    """
+    Write an array of integers as little-endian bytes.
+    """
+    ints = array("I", ints)
+    if sys.byteorder == "big":
+        ints.byteswap()
+    return ints.tobytes()
+
+
+def entity_number(qid, prefix):
+    """
+    Convert an ID such as Q42 to its number, or None if it cannot be packed.
+    """
+    if qid.startswith(prefix) and qid[1:].isdigit() and qid[1] != "0":
+        number = int(qid[1:])
+        if number < 2 ** 32:
+            return number
+    return None
+
+
+class PackedProperties(Mapping):
+    """
+    A read-only view of a packed properties value, mapping properties to lists of QIDs.
+    """
+    __slots__ = ("ints", "pids", "n")
+
+    def __init__(self, blob):
+        self.ints = to_ints(blob)
+        self.n = self.ints[0]
+        self.pids = self.ints[1:1 + self.n]
+
+    def numbers(self, prop):
+        """
+        The values of a property as QID numbers, or None if the property is absent.
+        """
+        pid = entity_number(prop, "P")
+        if pid is None or pid not in self.pids:
+            return None
+        i = self.pids.index(pid)
+        # The values start after the header and the i-th property ends at ints[1 + n + i]
+        base = 1 + 2 * self.n
+        start = self.ints[self.n + i] if i > 0 else 0
+        end = self.ints[1 + self.n + i]
+        return self.ints[base + start:base + end]
+
+    def __getitem__(self, prop):
+        numbers = self.numbers(prop) if isinstance(prop, str) else None
+        if numbers is None:
+            raise KeyError(prop)
+        return [f"Q{q}" for q in numbers]
+
+    def __contains__(self, prop):
+        pid = entity_number(prop, "P") if isinstance(prop, str) else None
+        return pid is not None and pid in self.pids
+
+    def __iter__(self):
+        return (f"P{pid}" for pid in self.pids)
+
+    def __len__(self):
+        return self.n
+
+
+class PackedDataProperties(Mapping):
+    """
+    A read-only view of a packed data_properties value, mapping properties to lists of
+    values, each a list of strings.
+    """
+    __slots__ = ("blob", "header", "pids", "n")
+
+    def __init__(self, blob):
+        self.blob = blob
+        self.n = int.from_bytes(blob[:4], "little")
+        self.header = to_ints(blob[:4 * (1 + 3 * self.n)])
+        self.pids = self.header[1:1 + self.n]
+
+    def __getitem__(self, prop):
+        pid = entity_number(prop, "P") if isinstance(prop, str) else None
+        if pid is None or pid not in self.pids:
+            raise KeyError(prop)
+        i = self.pids.index(pid)
+        n = self.n
+        header = self.header
+        int_start = header[n + i] if i > 0 else 0
+        int_end = header[1 + n + i]
+        byte_start = header[2 * n + i] if i > 0 else 0
+        # The lengths follow the header, and the strings follow the lengths
+        lengths_base = 4 * (1 + 3 * n)
+        pos = lengths_base + 4 * header[2 * n] + byte_start
+        lengths = to_ints(self.blob[lengths_base + 4 * int_start:lengths_base + 4 * int_end])
+        values = []
+        j = 0
+        while j < len(lengths):
+            parts = []
+            for length in lengths[j + 1:j + 1 + lengths[j]]:
+                parts.append(self.blob[pos:pos + length].decode("utf-8", "surrogatepass"))
+                pos += length
+            values.append(parts)
+            j += 1 + lengths[j]
+        return values
+
+    def __contains__(self, prop):
+        pid = entity_number(prop, "P") if isinstance(prop, str) else None
+        return pid is not None and pid in self.pids
+
+    def __iter__(self):
+        return (f"P{pid}" for pid in self.pids)
+
+    def __len__(self):
+        return self.n
+
+
+def decode_properties(value):
+    """
+    Decode a value of the properties column, whether packed or JSON text.
+    """
+    if isinstance(value, bytes):
+        return PackedProperties(value)
+    return json.loads(value)
+
+
+def decode_data_properties(value):
+    """
+    Decode a value of the data_properties column, whether packed or JSON text.
+    """
+    if isinstance(value, bytes):
+        return PackedDataProperties(value)
+    return json.loads(value)
+
+
+def encode_properties(props):
+    """
+    Pack a properties dictionary, or return None if it contains IDs that cannot be packed.
+    """
+    pids, ends, values = [], [], []
+    for prop, qids in props.items():
+        pid = entity_number(prop, "P")
+        if pid is None:
+            return None
+        for qid in qids:
+            number = entity_number(qid, "Q") if isinstance(qid, str) else None
+            if number is None:
+                return None
+            values.append(number)
+        pids.append(pid)
+        ends.append(len(values))
+    return from_ints([len(pids)] + pids + ends + values)
+
+
+def encode_data_properties(data_props):
+    """
+    Pack a data properties dictionary, or return None if it cannot be packed.
+    """
+    pids, int_ends, byte_ends, lengths, parts = [], [], [], [], []
+    n_bytes = 0
+    for prop, values in data_props.items():
+        pid = entity_number(prop, "P")
+        if pid is None:
+            return None
+        for value in values:
+            lengths.append(len(value))
+            for part in value:
+                if not isinstance(part, str):
+                    return None
+                encoded = part.encode("utf-8", "surrogatepass")
+                lengths.append(len(encoded))
+                parts.append(encoded)
+                n_bytes += len(encoded)
+        pids.append(pid)
+        int_ends.append(len(lengths))
+        byte_ends.append(n_bytes)
+    return from_ints([len(pids)] + pids + int_ends + byte_ends + lengths) + b"".join(parts)
+
+
+def pack_column(db, table, column, encode, batch_size=10000):
+    """
+    Re-encode one column of the database in place, committing every batch of rows.
+    Rows that are already packed or cannot be packed are left as they are.
+    """
+    cursor = db.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    total = cursor.fetchone()[0]
+    last_rowid = -1
+    packed = 0
+    with tqdm(desc=f"Packing {table}", total=total) as pbar:
+        while True:
+            cursor.execute(f"SELECT rowid, {column} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                           (last_rowid, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = []
+            for rowid, value in rows:
+                if isinstance(value, str):
+                    encoded = encode(json.loads(value))
+                    if encoded is not None:
+                        updates.append((encoded, rowid))
+            cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", updates)
+            db.commit()
+            packed += len(updates)
+            last_rowid = rows[-1][0]
+            pbar.update(len(rows))
+    return packed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode the properties of the Wikidata database in a compact binary format.")
+    parser.add_argument("--wd", type=str, help="Path to Wikidata database", default="wikidata.db")
+    parser.add_argument("--no_vacuum", action="store_true", help="Do not vacuum the database after packing")
+    args = parser.parse_args()
+
+    db = sqlite3.connect(args.wd)
+    cursor = db.cursor()
+
+    # The property_values table is built with SQLite's JSON functions, so it must
+    # exist before the properties column is packed
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'property_values'")
+    if cursor.fetchone() is None:
+        print("Building the property_values table")
+        with open(PROPERTY_VALUES_SQL) as f:
+            db.executescript(f.read())
+
+    print(pack_column(db, "properties", "properties", encode_properties), "properties packed")
+    print(pack_column(db, "data_properties", "data_properties", encode_data_properties), "data properties packed")
+
+    if not args.no_vacuum:
+        print("Vacuuming")
+        db.execute("VACUUM")
+    db.close()
@@ -0,0 +1,244 @@
+"""A single-pass scan engine over the properties table of the Wikidata database.
+
+Several consumers can be registered on one scan, each with its own filter and
+projection, and all of them are fed from one read and decode of every row.
+The scan can also be split by rowid range across a pool of worker processes, in
+which case each worker feeds its own copy of the consumers and the partial results
+are merged in rowid order, so the result is the same as a serial scan.
+"""
+import pickle
+import sqlite3
+from multiprocessing import Pool
+from urllib.parse import quote
+from tqdm import tqdm
+from packed_properties import PackedProperties, decode_properties
+from qid_map import QidListMap, ProjectedQidListMap, int_to_qid, qid_to_int
+
+
+def property_numbers(props, prop):
+    """
+    The values of a property of decoded properties as interned integers.
+    """
+    if isinstance(props, PackedProperties):
+        numbers = props.numbers(prop)
+        return numbers.tolist() if numbers is not None else []
+    return [qid_to_int(v) for v in props.get(prop, [])]
+
+
+class ScanConsumer:
+    """
+    Base class of the consumers of a properties scan.
+    """
+    def accept(self, qid, props):
+        """
+        Called with the QID and decoded properties of every row in the table.
+        """
+        raise NotImplementedError
+
+    def result(self):
+        """
+        Return the result of the consumer once the scan has finished.
+        """
+        raise NotImplementedError
+
+    def merge(self, other):
+        """
+        Merge the partial results of another copy of this consumer, which scanned the
+        rows following those scanned by this consumer.
+        """
+        raise NotImplementedError
+
+
+class PropValsConsumer(ScanConsumer):
+    """
+    Collects the entities that have a property with one of the given values, as a
+    mapping from value to a QidListMap of entity to all the values of the property
+    for the entity. If properties to project are given, the maps are
+    ProjectedQidListMaps that also keep the values of those properties.
+    The projected data properties are not in the properties table, so they are only
+    declared here and read afterwards (see read_wikidata_with_prop_vals_many).
+    """
+    def __init__(self, prop, values, project=(), data_project=()):
+        self.prop = prop
+        self.values = set(qid_to_int(v) for v in values)
+        self.project = tuple(project)
+        self.data_project = tuple(data_project)
+        self.results = {}
+
+    def new_map(self):
+        if self.project or self.data_project:
+            return ProjectedQidListMap(self.project, self.data_project)
+        return QidListMap()
+
+    def entities(self, v):
+        if v not in self.results:
+            self.results[v] = self.new_map()
+        return self.results[v]
+
+    def accept(self, qid, props):
+        if isinstance(props, PackedProperties):
+            numbers = props.numbers(self.prop)
+            if numbers is None:
+                return
+            numbers = numbers.tolist()
+        elif self.prop in props:
+            numbers = [qid_to_int(v) for v in props[self.prop]]
+        else:
+            return
+        for v in numbers:
+            if v in self.values:
+                if self.project:
+                    projected = {p: property_numbers(props, p) for p in self.project}
+                    self.entities(v).append_projected(qid_to_int(qid), numbers, projected)
+                else:
+                    self.entities(v).append_ints(qid_to_int(qid), numbers)
+
+    def result(self):
+        return {int_to_qid(v): entities for v, entities in self.results.items()}
+
+    def merge(self, other):
+        for v, entities in other.results.items():
+            self.entities(v).extend(entities)
+
+
+class PropertiesConsumer(ScanConsumer):
+    """
+    Collects the values of the given properties, as a mapping from property to entity
+    to values.
+    """
+    def __init__(self, props):
+        self.props = props
+        self.results = {prop: {} for prop in props}
+
+    def accept(self, qid, props):
+        for prop in self.props:
+            if prop in props:
+                self.results[prop][qid] = props[prop]
+
+    def result(self):
+        return self.results
+
+    def merge(self, other):
+        for prop, entities in other.results.items():
+            self.results[prop].update(entities)
+
+
+class ProjectionConsumer(ScanConsumer):
+    """
+    Collects the entities that have a property (with one of the given values, if any
+    are given), as a mapping from entity to the values of the projected properties.
+    """
+    def __init__(self, prop, values=None, project=()):
+        self.prop = prop
+        self.values = set(values) if values is not None else None
+        self.project = project
+        self.results = {}
+
+    def accept(self, qid, props):
+        if self.prop not in props:
+            return
+        if self.values is not None and not any(v in self.values for v in props[self.prop]):
+            return
+        self.results[qid] = {p: props[p] for p in self.project if p in props}
+
+    def result(self):
+        return self.results
+
+    def merge(self, other):
+        self.results.update(other.results)
+
+
+def database_path(cursor):
+    """
+    Return the file of the main database of a cursor, or None for an in-memory database.
+    """
+    for _, name, file in cursor.execute("PRAGMA database_list").fetchall():
+        if name == "main":
+            return file or None
+    return None
+
+
+def scan_rows(rows, consumers):
+    """
+    Decode the properties of each row and feed them to all consumers.
+    """
+    for qid, props_json in rows:
+        prop_dict = decode_properties(props_json)
+        for consumer in consumers:
+            consumer.accept(qid, prop_dict)
+
+
+def scan_range(task):
+    """
+    Scan the rows of the properties table in a rowid range, in a worker process with
+    its own read-only connection. Returns the number of rows read and the consumers.
+    """
+    db_path, start, end, pickled_consumers = task
+    consumers = pickle.loads(pickled_consumers)
+    db = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+    cursor = db.cursor()
+    cursor.execute("SELECT qid, properties FROM properties WHERE rowid BETWEEN ? AND ?", (start, end))
+    count = 0
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        scan_rows(rows, consumers)
+        count += len(rows)
+    db.close()
+    return count, consumers
+
+
+class PropertyScan:
+    """
+    A scan of the properties table that feeds every registered consumer from one pass.
+    """
+    def __init__(self):
+        self.consumers = {}
+
+    def register(self, name, consumer):
+        """
+        Register a consumer, whose result will be returned under `name`.
+        """
+        self.consumers[name] = consumer
+        return consumer
+
+    def run(self, cursor, desc="Scanning Wikidata properties", workers=1):
+        """
+        Read and decode the properties table once, and return the results of all
+        consumers by name. With more than one worker, the table is split into rowid
+        ranges that are scanned by a pool of processes.
+        """
+        cursor.execute("SELECT COUNT(*) FROM properties")
+        total = cursor.fetchone()[0]
+
+        consumers = list(self.consumers.values())
+        db_path = database_path(cursor)
+        with tqdm(desc=desc, total=total) as pbar:
+            if workers > 1 and db_path is not None:
+                cursor.execute("SELECT MIN(rowid), MAX(rowid) FROM properties")
+                first, last = cursor.fetchone()
+                if first is None:
+                    first, last = 0, -1
+                # Use more ranges than workers so that the work is balanced
+                n_ranges = workers * 8
+                step = max(1, (last - first + n_ranges) // n_ranges)
+                # Every worker starts from a copy of the consumers before any merge
+                pickled_consumers = pickle.dumps(consumers)
+                tasks = [(db_path, start, min(start + step - 1, last), pickled_consumers)
+                         for start in range(first, last + 1, step)]
+                with Pool(workers) as pool:
+                    for count, partial in pool.imap(scan_range, tasks):
+                        for consumer, partial_consumer in zip(consumers, partial):
+                            consumer.merge(partial_consumer)
+                        pbar.update(count)
+            else:
+                cursor.execute("SELECT qid, properties FROM properties")
+                while True:
+                    rows = cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    scan_rows(rows, consumers)
+                    pbar.update(len(rows))
+
+        return {name: consumer.result() for name, consumer in self.consumers.items()}
@@ -0,0 +1,202 @@
+"""Compact, integer-interned mappings from Wikidata entities to lists of entities.
+
+Results for classes such as human (Q5) have millions of entities, so holding them
+as dictionaries of strings to lists of strings takes many gigabytes and is slow to
+pickle. Here the QIDs are stored as integers in parallel arrays instead and are
+only turned back into strings when they are read.
+"""
+import json
+from array import array
+from bisect import bisect_left
+from collections.abc import ItemsView, Mapping
+
+
+def qid_to_int(qid):
+    """
+    Intern a Wikidata ID as an integer. Items (Q42) are positive and properties (P31)
+    are negative.
+    """
+    if qid[0] == "Q":
+        return int(qid[1:])
+    elif qid[0] == "P":
+        return -int(qid[1:])
+    raise ValueError(f"Cannot intern Wikidata ID {qid}")
+
+
+def int_to_qid(n):
+    """
+    Convert an interned integer back to its Wikidata ID.
+    """
+    return f"Q{n}" if n >= 0 else f"P{-n}"
+
+
+class QidListMap(Mapping):
+    """
+    A mapping from QIDs to lists of QIDs, stored as three arrays: the entities, the
+    offsets of their values and the values. Entities are kept in the order they were
+    added, and lookups by QID use a sorted permutation that is built on first use.
+    """
+    def __init__(self):
+        self.entities = array("q")
+        self.offsets = array("Q", [0])
+        self.values = array("q")
+        self.order = None
+
+    def append(self, qid, values):
+        """
+        Add an entity with its values, given as QIDs.
+        """
+        self.append_ints(qid_to_int(qid), [qid_to_int(v) for v in values])
+
+    def append_ints(self, entity, values):
+        """
+        Add an entity with its values, given as interned integers.
+        """
+        self.entities.append(entity)
+        self.values.extend(values)
+        self.offsets.append(len(self.values))
+        self.order = None
+
+    def extend(self, other):
+        """
+        Add all the entities of another map after those of this map.
+        """
+        base = len(self.values)
+        self.entities.extend(other.entities)
+        self.values.extend(other.values)
+        self.offsets.extend(base + offset for offset in other.offsets[1:])
+        self.order = None
+
+    def values_at(self, i):
+        """
+        The values of the i-th entity as interned integers.
+        """
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def find(self, qid):
+        """
+        The position of an entity, or -1 if it is not in the map.
+        """
+        return self.find_int(qid_to_int(qid))
+
+    def find_int(self, entity):
+        """
+        The position of an entity given as an interned integer, or -1 if it is not in
+        the map.
+        """
+        if self.order is None:
+            self.order = array("q", sorted(range(len(self.entities)), key=self.entities.__getitem__))
+        i = bisect_left(self.order, entity, key=self.entities.__getitem__)
+        if i < len(self.order) and self.entities[self.order[i]] == entity:
+            return self.order[i]
+        return -1
+
+    def __getitem__(self, qid):
+        i = self.find(qid) if isinstance(qid, str) and qid else -1
+        if i < 0:
+            raise KeyError(qid)
+        return [int_to_qid(v) for v in self.values_at(i)]
+
+    def __contains__(self, qid):
+        return isinstance(qid, str) and bool(qid) and self.find(qid) >= 0
+
+    def __iter__(self):
+        return (int_to_qid(e) for e in self.entities)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def items(self):
+        return QidListItems(self)
+
+    def __getstate__(self):
+        # The lookup order is cheap to rebuild, so it is not pickled
+        return self.entities, self.offsets, self.values
+
+    def __setstate__(self, state):
+        self.entities, self.offsets, self.values = state
+        self.order = None
+
+
+class QidListItems(ItemsView):
+    """
+    The items of a QidListMap, iterated in the order they were added without lookups.
+    """
+    def __iter__(self):
+        qid_map = self._mapping
+        for i, entity in enumerate(qid_map.entities):
+            yield int_to_qid(entity), [int_to_qid(v) for v in qid_map.values_at(i)]
+
+
+class ProjectedQidListMap(QidListMap):
+    """
+    A QidListMap that also keeps the values of other properties of each entity, which
+    are projected while the map is built so that they need not be looked up again.
+    The values of the projected properties are held as integer arrays aligned with the
+    entities, and those of projected data properties as JSON text, which is only parsed
+    when an entity is read.
+    """
+    def __init__(self, project=(), data_project=()):
+        super().__init__()
+        self.project = tuple(project)
+        self.projected = {prop: (array("Q", [0]), array("q")) for prop in self.project}
+        self.data_project = tuple(data_project)
+        self.data_offsets = array("Q", [0])
+        self.data = bytearray()
+
+    def append_projected(self, entity, values, projected):
+        """
+        Add an entity with its values and a mapping from the projected properties to
+        their values, all given as interned integers.
+        """
+        self.append_ints(entity, values)
+        for prop, (offsets, prop_values) in self.projected.items():
+            prop_values.extend(projected.get(prop, ()))
+            offsets.append(len(prop_values))
+
+    def append_data(self, data_props):
+        """
+        Add the projected data properties of the next entity whose data properties
+        have not been added yet.
+        """
+        self.data.extend(json.dumps({p: data_props[p] for p in self.data_project if p in data_props}).encode("utf-8"))
+        self.data_offsets.append(len(self.data))
+
+    def extend(self, other):
+        super().extend(other)
+        for prop, (offsets, prop_values) in self.projected.items():
+            other_offsets, other_values = other.projected[prop]
+            base = len(prop_values)
+            prop_values.extend(other_values)
+            offsets.extend(base + offset for offset in other_offsets[1:])
+        base = len(self.data)
+        self.data.extend(other.data)
+        self.data_offsets.extend(base + offset for offset in other.data_offsets[1:])
+
+    def projection(self, i):
+        """
+        The projected properties and data properties of the i-th entity, as a
+        dictionary in the form of the properties and data_properties columns.
+        """
+        result = {}
+        for prop, (offsets, prop_values) in self.projected.items():
+            if offsets[i + 1] > offsets[i]:
+                result[prop] = [int_to_qid(v) for v in prop_values[offsets[i]:offsets[i + 1]]]
+        if self.data_project and i + 1 < len(self.data_offsets):
+            result.update(json.loads(self.data[self.data_offsets[i]:self.data_offsets[i + 1]]))
+        return result
+
+    def projected_items(self):
+        """
+        Iterate over the entities in the order they were added, as pairs of the QID and
+        its projected properties.
+        """
+        for i, entity in enumerate(self.entities):
+            yield int_to_qid(entity), self.projection(i)
+
+    def __getstate__(self):
+        return super().__getstate__(), self.project, self.projected, self.data_project, self.data_offsets, self.data
+
+    def __setstate__(self, state):
+        base, self.project, self.projected, self.data_project, self.data_offsets, self.data = state
+        super().__setstate__(base)
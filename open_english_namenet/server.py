@@ -0,0 +1,247 @@
+"""A local HTTP service for looking up Open English Namenet.
+
+The service holds one Namenet index (see namenet) for all its connections, so the
+resource is mapped into memory once instead of being loaded by every service that
+uses it. It is a single asyncio process that speaks a minimal HTTP/1.1 with keep-alive
+connections and answers with JSON:
+
+* `GET /synset/<id>`, `GET /qid/<qid>`, `GET /lemma/<lemma>` and `GET /hypernyms/<id>`
+  look up one key, and answer with an object from the key to its result,
+* `POST /batch/<kind>` with a JSON list of keys looks up all of them, and answers
+  with an object from each key to its result. Batches are looked up in a thread, so
+  a large batch does not hold up the other connections,
+* `GET /prefix/<prefix>?limit=<n>` lists the lemmas that start with a prefix.
+
+A synset is looked up as its entry (or null), a QID or lemma as an object from the
+IDs of its synsets to their entries, and the hypernyms of a synset as the list of
+its paths of hypernyms and instance hypernyms up to a root. The hypernyms of OEWN
+synsets are followed in the OEWN snapshot if a checkout of OEWN is given.
+"""
+import argparse
+import asyncio
+import json
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+from cache import CACHE_DIR, configure as cache_config
+from namenet import Namenet
+from oewn_snapshot import open_snapshot
+
+# The relations that are followed for the hypernym paths
+HYPERNYM_RELATIONS = ("hypernym", "instance_hypernym")
+# The most hypernym paths that are returned for a synset
+MAX_PATHS = 100
+# The largest request body that is read
+MAX_BODY = 64 << 20
+
+
+class Lookups:
+    """
+    The lookups of the service over an index and, optionally, an OEWN snapshot.
+    """
+    def __init__(self, namenet, snapshot=None):
+        self.namenet = namenet
+        self.snapshot = snapshot
+        # The hypernym paths of OEWN synsets, which are shared by many synsets
+        self.oewn_paths = {}
+        self.kinds = {
+            "synset": self.synset,
+            "qid": self.qid,
+            "lemma": self.lemma,
+            "hypernyms": self.hypernym_paths,
+        }
+
+    def synset(self, ssid):
+        return self.namenet.by_synset(ssid)
+
+    def qid(self, qid):
+        try:
+            return dict(self.namenet.by_qid(qid))
+        except (ValueError, IndexError):
+            # Keys that are not Wikidata IDs, including the empty key
+            return {}
+
+    def lemma(self, lemma):
+        return dict(self.namenet.by_lemma(lemma))
+
+    def oewn_index(self, ssid):
+        """
+        The integer ID of a synset in the OEWN snapshot, or -1 if it is not in OEWN.
+        """
+        if self.snapshot is None:
+            return -1
+        i = self.snapshot.index(ssid)
+        return i if i >= 0 and self.snapshot.lexfile(i) is not None else -1
+
+    def hypernyms(self, ssid):
+        """
+        The hypernyms and instance hypernyms of a synset.
+        """
+        i = self.oewn_index(ssid)
+        if i >= 0:
+            return [self.snapshot.ssids[j] for relation in HYPERNYM_RELATIONS
+                    for j in self.snapshot.related(relation, i)]
+        entry = self.namenet.by_synset(ssid) or {}
+        return [target for relation in HYPERNYM_RELATIONS for target in entry.get(relation, [])]
+
+    def hypernym_paths(self, ssid):
+        """
+        The paths from the hypernyms of a synset up to a root, as lists of synset IDs.
+        """
+        return self.paths_from(ssid, frozenset())[0]
+
+    def paths_from(self, ssid, seen):
+        """
+        The hypernym paths of a synset that do not pass through the synsets in `seen`,
+        and whether any hypernym was left out because it was seen. Only the paths of
+        OEWN synsets from which nothing was left out are memoized, as the others depend
+        on the path by which the synset was reached.
+        """
+        oewn = self.oewn_index(ssid) >= 0
+        if oewn and ssid in self.oewn_paths:
+            return self.oewn_paths[ssid], False
+        seen = seen | {ssid}
+        paths = []
+        pruned = False
+        for hypernym in self.hypernyms(ssid):
+            if hypernym in seen:
+                pruned = True
+                continue
+            hypernym_paths, hypernym_pruned = self.paths_from(hypernym, seen)
+            pruned = pruned or hypernym_pruned
+            for path in hypernym_paths or [[]]:
+                paths.append([hypernym] + path)
+                if len(paths) == MAX_PATHS:
+                    break
+            if len(paths) == MAX_PATHS:
+                break
+        if oewn and not pruned:
+            self.oewn_paths[ssid] = paths
+        return paths, pruned
+
+    def lookup(self, kind, keys):
+        """
+        Look up keys of a kind, as an object from each key to its result.
+        """
+        lookup = self.kinds[kind]
+        return {key: lookup(key) for key in keys}
+
+    def prefix(self, prefix, limit):
+        return self.namenet.prefix_search(prefix, limit)
+
+
+class Server:
+    """
+    The HTTP protocol of the service.
+    """
+    def __init__(self, lookups, max_batch=10000):
+        self.lookups = lookups
+        self.max_batch = max_batch
+
+    def route(self, method, target, body):
+        """
+        Answer a request as a pair of the status and the object of the response.
+        """
+        url = urlsplit(target)
+        kind, _, key = url.path[1:].partition("/")
+        if kind == "batch":
+            if method != "POST":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Batch lookups must be POSTed"}
+            if key not in self.lookups.kinds:
+                return HTTPStatus.NOT_FOUND, {"error": f"No lookup of kind {key}"}
+            try:
+                keys = json.loads(body)
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {"error": "The body is not JSON"}
+            if not isinstance(keys, list) or not all(isinstance(k, str) for k in keys):
+                return HTTPStatus.BAD_REQUEST, {"error": "The body must be a list of strings"}
+            if len(keys) > self.max_batch:
+                return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"At most {self.max_batch} keys per batch"}
+            return HTTPStatus.OK, self.lookups.lookup(key, keys)
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{method} is not supported"}
+        key = unquote(key)
+        if kind == "prefix":
+            try:
+                limit = int(parse_qs(url.query).get("limit", ["20"])[0])
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {"error": "The limit must be an integer"}
+            return HTTPStatus.OK, self.lookups.prefix(key, min(limit, self.max_batch))
+        if kind in self.lookups.kinds and key:
+            return HTTPStatus.OK, self.lookups.lookup(kind, [key])
+        return HTTPStatus.NOT_FOUND, {"error": f"No route for {url.path}"}
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests of a connection until it is closed.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                    headers = {name.strip().lower(): value.strip()
+                               for name, _, value in (line.partition(":") for line in lines[1:] if line)}
+                    length = int(headers.get("content-length", "0"))
+                except ValueError:
+                    self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    break
+                if length > MAX_BODY:
+                    self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "The body is too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    if target.startswith("/batch/"):
+                        # A batch may take long, so it is looked up in a thread rather
+                        # than blocking the other connections
+                        status, payload = await asyncio.get_running_loop().run_in_executor(
+                            None, self.route, method, target, body)
+                    else:
+                        status, payload = self.route(method, target, body)
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self.respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write((f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                      "Content-Type: application/json; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + body)
+
+
+async def serve(server, host, port):
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"Serving Open English Namenet on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve lookups of Open English Namenet over HTTP.")
+    parser.add_argument("folder", type=str, help="Output folder of generate.py, with the index", nargs="?", default="data")
+    parser.add_argument("--host", type=str, help="Host to listen on", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Port to listen on", default=8080)
+    parser.add_argument("--oewn", type=str, help="Path to OEWN data, to follow hypernym paths through OEWN", default=None)
+    parser.add_argument("--cache_dir", type=str, help="Directory of the cached OEWN snapshot", default=CACHE_DIR)
+    parser.add_argument("--max_batch", type=int, help="Maximum number of keys in a batch request", default=10000)
+    args = parser.parse_args()
+
+    cache_config(args.cache_dir)
+    snapshot = open_snapshot(args.oewn) if args.oewn else None
+    server = Server(Lookups(Namenet(args.folder), snapshot), args.max_batch)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
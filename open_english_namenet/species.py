@@ -1,12 +1,11 @@
 ### Link the species in WordNet to Wikidata using the taxonomy.
 import argparse
-from open_english_namenet import read_wikidata_with_prop_vals, WIKIDATA_DB, WORDNET_SOURCE, oewn_extract, wikidata_extract
+from open_english_namenet import read_wikidata_with_prop_vals, WIKIDATA_DB, WORDNET_SOURCE, oewn_extract, wikidata_extract, decode_properties, decode_data_properties
 import sqlite3
 import json
 from collections import defaultdict
 from tqdm import tqdm
-from glob import glob
-import yaml
+from oewn_loader import load_oewn, iter_synsets
 import csv
 import os
 
@@ -51,22 +50,22 @@ if __name__ == "__main__":
     defs = {}
     wikidata_inv = {}
 
-    for file in tqdm([f"{WORDNET_SOURCE}/src/yaml/noun.plant.yaml", f"{WORDNET_SOURCE}/src/yaml/noun.animal.yaml"], desc="Loading WordNet data"):
-        data = yaml.safe_load(open(file, "r"))
-        for ssid, entry in data.items():
-            defs[ssid] = entry.get("definition", [""])[0]
-            for lemma in entry.get("members", []):
-                lemma2ssid[lemma].append(ssid)
-            for mero_member in entry.get("mero_member", []):
-                meros[mero_member].append(ssid)
-            hyps[ssid] = entry.get("hypernym", [])
-            if "wikidata" in entry:
-                if isinstance(entry["wikidata"], str):
-                    wikidata[entry["wikidata"]] = ssid
-                elif isinstance(entry["wikidata"], list):
-                    for wd in entry["wikidata"]:
-                        wikidata[wd] = ssid
-                wikidata_inv[ssid] = entry["wikidata"]
+    oewn = load_oewn(WORDNET_SOURCE, fields=["members", "definition", "hypernym", "mero_member", "wikidata"],
+                     files=["noun.plant.yaml", "noun.animal.yaml"])
+    for _, ssid, entry in iter_synsets(oewn):
+        defs[ssid] = entry.get("definition", [""])[0]
+        for lemma in entry.get("members", []):
+            lemma2ssid[lemma].append(ssid)
+        for mero_member in entry.get("mero_member", []):
+            meros[mero_member].append(ssid)
+        hyps[ssid] = entry.get("hypernym", [])
+        if "wikidata" in entry:
+            if isinstance(entry["wikidata"], str):
+                wikidata[entry["wikidata"]] = ssid
+            elif isinstance(entry["wikidata"], list):
+                for wd in entry["wikidata"]:
+                    wikidata[wd] = ssid
+            wikidata_inv[ssid] = entry["wikidata"]
 
     for ssid, hyp_list in hyps.items():
         if len(meros[ssid]) == 0:
@@ -85,7 +84,7 @@ if __name__ == "__main__":
             print(f"No properties for {entity}")
             continue
 
-        data = json.loads(result[0])
+        data = decode_properties(result[0])
 
         if "P105" not in data:
             continue
@@ -114,7 +113,7 @@ if __name__ == "__main__":
         if not result:
             continue
 
-        data_props = json.loads(result[0])
+        data_props = decode_data_properties(result[0])
 
         if "P225" not in data_props:
             continue
@@ -1,16 +1,15 @@
 ## Find all the links between taxons in Wikidata and OEWN
-from open_english_namenet import WORDNET_SOURCE, WIKIDATA_DB
-from glob import glob
-import yaml
+from open_english_namenet import WORDNET_SOURCE, WIKIDATA_DB, decode_data_properties
+from oewn_snapshot import open_snapshot
 from tqdm import tqdm
 from collections import defaultdict
 import sqlite3
 import json
-from open_english_namenet import fetch_in_chunks
+from property_scan import PropertyScan, ProjectionConsumer
 import csv
 import editdistance
-import os
-import pickle
+from cache import cache, database_fingerprint
+import argparse
 
 
 taxon_names = ["genus", "family", "order", "class", "phylum", "kingdom"]
@@ -31,23 +30,22 @@ def get_taxon_names_from_oewn():
     oewn_taxon_names = {}
     defns = {}
 
-    for file in tqdm(glob(f"{WORDNET_SOURCE}/src/yaml/[nva]*.yaml"), desc="Loading WordNet data"):
-        data = yaml.safe_load(open(file, "r"))
-        for ssid, entry in data.items():
-            # Find any lemmas of the form "<taxon> <Taxonname>"
-            for lemma in entry.get("members", []):
-                for taxon_name in taxon_names:
-                    if lemma.startswith(taxon_name + " "):
-                        name = lemma[len(taxon_name) + 1:]
-                        # Name must be a single word starting with a capital letter
-                        if name and name[0].isupper() and " " not in name:
-                            oewn_taxon_names[(taxon_name, name)] = ssid
-                        elif name in name_exceptions:
-                            oewn_taxon_names[(taxon_name, name_exceptions[name])] = ssid
-                        #else:
-                        #    print(f"Invalid taxon name: {name} in lemma {lemma} from entry {ssid}")
-            if "definition" in entry:
-                defns[ssid] = entry["definition"][0]
+    snapshot = open_snapshot(WORDNET_SOURCE)
+    for _, ssid, entry in snapshot.synsets(["members", "definition"]):
+        # Find any lemmas of the form "<taxon> <Taxonname>"
+        for lemma in entry.get("members", []):
+            for taxon_name in taxon_names:
+                if lemma.startswith(taxon_name + " "):
+                    name = lemma[len(taxon_name) + 1:]
+                    # Name must be a single word starting with a capital letter
+                    if name and name[0].isupper() and " " not in name:
+                        oewn_taxon_names[(taxon_name, name)] = ssid
+                    elif name in name_exceptions:
+                        oewn_taxon_names[(taxon_name, name_exceptions[name])] = ssid
+                    #else:
+                    #    print(f"Invalid taxon name: {name} in lemma {lemma} from entry {ssid}")
+        if "definition" in entry:
+            defns[ssid] = entry["definition"][0]
     return oewn_taxon_names, defns
 
 
@@ -75,9 +73,9 @@ wd_taxon_qid_to_name = {
         "Q279749": "form"
         }
 
-def get_taxon_names_from_wikidata():
+def get_taxon_names_from_wikidata(workers=1):
     """
-    Load taxon names from Wikidata.
+    Load taxon names from Wikidata, scanning the properties with `workers` processes.
     """
     wd_taxon_names = defaultdict(list)
 
@@ -85,25 +83,21 @@ def get_taxon_names_from_wikidata():
 
     db = sqlite3.connect(WIKIDATA_DB)
     cursor = db.cursor()
-    cursor.execute("SELECT COUNT(*) FROM properties")
-    total_count = cursor.fetchone()[0]
-
-    cursor.execute("SELECT qid, properties FROM properties")
-    for row in tqdm(fetch_in_chunks(cursor), desc="Processing Wikidata properties", total=total_count):
-        qid = row[0]
-        data = json.loads(row[1])
-        if "P105" in data:
-            cursor2 = db.cursor()
-            cursor2.execute("SELECT data_properties FROM data_properties WHERE qid = ?", (qid,))
-            pdata_row = cursor2.fetchone()
-            pdata = json.loads(pdata_row[0]) if pdata_row else {}
-            cursor2.close()
-            taxon_class = data["P105"][0]
-            if taxon_class not in wd_taxon_qid_to_name:
-                missed_taxons.add(taxon_class)
-            elif "P225" in pdata:
-                for name in pdata["P225"]:
-                    wd_taxon_names[(wd_taxon_qid_to_name.get(taxon_class, "unknown"), name[0])] += [qid]
+
+    scan = PropertyScan()
+    scan.register("ranked", ProjectionConsumer("P105", project=["P105"]))
+    ranked = scan.run(cursor, desc="Processing Wikidata properties", workers=workers)["ranked"]
+
+    for qid, data in tqdm(ranked.items(), desc="Processing taxon ranks"):
+        cursor.execute("SELECT data_properties FROM data_properties WHERE qid = ?", (qid,))
+        pdata_row = cursor.fetchone()
+        pdata = decode_data_properties(pdata_row[0]) if pdata_row else {}
+        taxon_class = data["P105"][0]
+        if taxon_class not in wd_taxon_qid_to_name:
+            missed_taxons.add(taxon_class)
+        elif "P225" in pdata:
+            for name in pdata["P225"]:
+                wd_taxon_names[(wd_taxon_qid_to_name.get(taxon_class, "unknown"), name[0])] += [qid]
 
     db.close()
     print(f"Missed taxons: {missed_taxons}")
@@ -159,18 +153,13 @@ def get_wd_definition(qid, cursor):
         return result[0]
 
 if __name__ == "__main__":
-    if os.path.exists("oewn_taxon_names.pickle"):
-        with open("oewn_taxon_names.pickle", "rb") as f:
-            oewn_taxon_names, oewn_defns = pickle.load(f)
-    else:
-        oewn_taxon_names, oewn_defns = get_taxon_names_from_oewn()
-        pickle.dump((oewn_taxon_names, oewn_defns), open("oewn_taxon_names.pickle", "wb"))
-    if os.path.exists("wd_taxon_names.pickle"):
-        with open("wd_taxon_names.pickle", "rb") as f:
-            wd_taxon_names = pickle.load(f)
-    else:
-        wd_taxon_names = get_taxon_names_from_wikidata()
-        pickle.dump(wd_taxon_names, open("wd_taxon_names.pickle", "wb"))
+    parser = argparse.ArgumentParser(description="Find links between taxons in Wikidata and OEWN.")
+    parser.add_argument("--workers", type=int, help="Number of processes to scan Wikidata with", default=1)
+    args = parser.parse_args()
+
+    oewn_taxon_names, oewn_defns = get_taxon_names_from_oewn()
+    wd_taxon_names = cache.get("wd_taxon_names", {"wikidata": database_fingerprint(WIKIDATA_DB)},
+                               lambda: get_taxon_names_from_wikidata(args.workers))
 
     wd2taxon = {
             wd: taxon
@@ -10,8 +10,7 @@ import argparse
 from open_english_namenet import load_wordnet_data, WORDNET_SOURCE
 from collections import defaultdict
 from tqdm import tqdm
-from glob import glob
-import yaml
+from oewn_snapshot import open_snapshot
 
 taxon_names = ["genus", "family", "order", "class", "phylum", "kingdom", "suborder", "subfamily", "subclass", "superfamily", "division", "subgenus", "subdivision", "superorder", "tribe", "subphylum", "superclass"]
 
@@ -52,11 +51,10 @@ if __name__ == "__main__":
 
     mero_member = defaultdict(list)
 
-    for file in tqdm(glob(f"{WORDNET_SOURCE}/src/yaml/[nva]*.yaml"), desc="Loading WordNet data"):
-        data = yaml.safe_load(open(file, "r"))
-        for ssid, entry in data.items():
-            if "mero_member" in entry:
-                mero_member[ssid] = entry["mero_member"]
+    snapshot = open_snapshot(WORDNET_SOURCE)
+    for _, ssid, entry in snapshot.synsets(["mero_member"]):
+        if "mero_member" in entry:
+            mero_member[ssid] = entry["mero_member"]
             
  
 
@@ -1,11 +1,9 @@
 import argparse
 import csv
-import os
-import pickle
-import yaml
 from collections import defaultdict
-from glob import glob
 from open_english_namenet import WIKIDATA_DB, WORDNET_SOURCE
+from taxon_tree import LazyTaxonTree
+from oewn_snapshot import open_snapshot
 import sqlite3
 import json
 from tqdm import tqdm
@@ -21,18 +19,30 @@ def find_holos(ssid, oewn2wd, mero_graph):
         else:
             yield from find_holos(mero, oewn2wd, mero_graph)
 
-def validate_holo(holo, mero, cursor, wd2oewn, max_depth=5):
+def read_mero_graph():
+    """
+    Read the member holonyms of all OEWN synsets.
+    """
+    mero_graph = defaultdict(list)
+
+    snapshot = open_snapshot(WORDNET_SOURCE)
+    for _, ssid, entry in snapshot.synsets(["mero_member"]):
+        if "mero_member" in entry:
+            for ssid2 in entry["mero_member"]:
+                mero_graph[ssid2].append(ssid)
+
+    return mero_graph
+
+def validate_holo(holo, mero, taxon_tree, wd2oewn, max_depth=5):
     if max_depth <= 0:
         return []
-    cursor.execute("SELECT properties FROM properties WHERE qid = ?", (mero,))
-    result = json.loads(cursor.fetchone()[0])
-    parents = result.get("P171", [])
+    parents = taxon_tree.parents(mero)
     if any(parent == holo for parent in parents):
         return []
     for parent in parents:
         if parent in wd2oewn:
             return [(holo, parent)]
-    return [x for parent in parents for x in validate_holo(parent, mero, cursor, wd2oewn, max_depth-1)]
+    return [x for parent in parents for x in validate_holo(parent, mero, taxon_tree, wd2oewn, max_depth-1)]
 
 def get_name_and_defn(wd, cursor):
     cursor.execute("SELECT label FROM labels_en WHERE qid = ?", (wd,))
@@ -64,26 +74,13 @@ if __name__ == "__main__":
                 oewn2wd[oewn] = wd
                 wd2oewn[wd] = oewn
 
-    if os.path.exists("mero_graph.pickle"):
-        with open("mero_graph.pickle", "rb") as f:
-            mero_graph = pickle.load(f)
-    else:
-        mero_graph = defaultdict(list)
-
-        for file in tqdm(glob(f"{WORDNET_SOURCE}/src/yaml/[nva]*.yaml"), desc="Loading WordNet data"):
-            data = yaml.safe_load(open(file, "r"))
-            for ssid, entry in data.items():
-                if "mero_member" in entry:
-                    for ssid2 in entry["mero_member"]:
-                        mero_graph[ssid2].append(ssid)
-
-        with open("mero_graph.pickle", "wb") as f:
-            pickle.dump(mero_graph, f)
+    mero_graph = read_mero_graph()
 
     print(len(mero_graph), "mero relations found")
 
     db = sqlite3.connect(WIKIDATA_DB)
     cursor = db.cursor()
+    taxon_tree = LazyTaxonTree(cursor)
 
     with open("parent_taxon_disagreements.csv", "w") as f:
         writer = csv.writer(f)
@@ -91,7 +88,7 @@ if __name__ == "__main__":
         for oewn in tqdm(oewn2wd.keys(), desc="Validating holonyms"):
             wd_mero = oewn2wd[oewn]
             for wd_holo in find_holos(oewn, oewn2wd, mero_graph):
-                for holo1, holo2 in validate_holo(wd_holo, wd_mero, cursor, wd2oewn):
+                for holo1, holo2 in validate_holo(wd_holo, wd_mero, taxon_tree, wd2oewn):
                     mero_label, mero_defn = get_name_and_defn(wd_mero, cursor)
                     holo1_label, holo1_defn = get_name_and_defn(holo1, cursor)
                     holo2_label, holo2_defn = get_name_and_defn(holo2, cursor)
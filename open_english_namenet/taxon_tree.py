@@ -0,0 +1,218 @@
+"""The Wikidata taxonomy as a compact in-memory tree.
+
+Following the parent taxon (P171) of a taxon up to a taxon that is linked to OEWN used
+to take one query and one decode of the properties for every step. Here the parent
+taxa and the taxon rank (P105) of every entity are read once, from the property_values
+table if the database has it and by one scan of the properties table otherwise, and
+are held as integer arrays keyed by the interned QID. The tree is cached, and the scan
+can be shared with the other results of generate.py.
+"""
+import json
+from array import array
+from tqdm import tqdm
+from cache import cache, database_fingerprint
+from open_english_namenet import has_property_values
+from packed_properties import decode_properties
+from property_scan import PropertyScan, ScanConsumer, database_path, property_numbers
+from qid_map import QidListMap, int_to_qid, qid_to_int
+
+
+class TaxonTreeConsumer(ScanConsumer):
+    """
+    Collects the parent taxa and the rank of every entity that has either.
+    """
+    def __init__(self):
+        self.parents = QidListMap()
+        self.ranks = array("q")
+
+    def accept(self, qid, props):
+        parents = property_numbers(props, "P171")
+        ranks = property_numbers(props, "P105")
+        if parents or ranks:
+            self.parents.append_ints(qid_to_int(qid), parents)
+            self.ranks.append(ranks[0] if ranks else 0)
+
+    def result(self):
+        return TaxonTree(self.parents, self.ranks)
+
+    def merge(self, other):
+        self.parents.extend(other.parents)
+        self.ranks.extend(other.ranks)
+
+
+class TaxonTree:
+    """
+    The parent taxa and ranks of all taxa in Wikidata. An entity with several parent
+    taxa has all of them, so strictly this is a graph rather than a tree.
+    """
+    def __init__(self, parents, ranks):
+        self.parents_map = parents
+        self.ranks = ranks
+
+    @staticmethod
+    def load(cursor, workers=1):
+        """
+        Read the whole taxonomy from the database, or the cache. This is one pass over
+        all the taxa, so scripts that only need a few of them should use LazyTaxonTree.
+        Scripts that scan the properties table for other results as well can read it
+        in the same scan, by passing a TaxonTreeConsumer to
+        read_wikidata_with_prop_vals_many as "taxon_tree".
+        """
+        inputs = {"wikidata": database_fingerprint(database_path(cursor))}
+        return cache.get("taxon_tree", inputs, lambda: TaxonTree.read(cursor, workers))
+
+    @staticmethod
+    def read(cursor, workers=1):
+        """
+        Read the whole taxonomy from the database.
+        """
+        if not has_property_values(cursor):
+            scan = PropertyScan()
+            scan.register("taxon_tree", TaxonTreeConsumer())
+            return scan.run(cursor, desc="Reading taxon tree", workers=workers)["taxon_tree"]
+
+        consumer = TaxonTreeConsumer()
+        cursor.execute("SELECT qid, prop, value FROM property_values WHERE prop IN ('P171', 'P105') ORDER BY rowid")
+        # The rows of an entity are adjacent in rowid order, so group them as they come
+        current, parents, ranks = None, [], []
+        for qid, prop, value in tqdm(cursor, desc="Reading taxon tree"):
+            if qid != current:
+                if current is not None:
+                    consumer.accept(current, {"P171": parents, "P105": ranks})
+                current, parents, ranks = qid, [], []
+            (parents if prop == "P171" else ranks).append(value)
+        if current is not None:
+            consumer.accept(current, {"P171": parents, "P105": ranks})
+        return consumer.result()
+
+    def find(self, qid):
+        """
+        The position of a taxon given as an interned integer, or -1 if it has no parent
+        taxon or rank.
+        """
+        return self.parents_map.find_int(qid)
+
+    def __contains__(self, qid):
+        return self.find(qid_to_int(qid)) >= 0
+
+    def parents(self, qid):
+        """
+        The parent taxa of a taxon.
+        """
+        i = self.find(qid_to_int(qid))
+        return [int_to_qid(p) for p in self.parents_map.values_at(i)] if i >= 0 else []
+
+    def rank(self, qid):
+        """
+        The QID of the rank of a taxon, or None if it has no rank.
+        """
+        i = self.find(qid_to_int(qid))
+        return int_to_qid(self.ranks[i]) if i >= 0 and self.ranks[i] else None
+
+    def rank_labels(self, cursor):
+        """
+        The English labels of all the ranks in the tree, by QID.
+        """
+        labels = {}
+        for rank in sorted(set(self.ranks) - {0}):
+            cursor.execute("SELECT label FROM labels_en WHERE qid = ?", (int_to_qid(rank),))
+            result = cursor.fetchone()
+            if result:
+                labels[int_to_qid(rank)] = json.loads(result[0])[0]
+        return labels
+
+
+class LazyTaxonTree:
+    """
+    The parent taxa and ranks of taxa, looked up entity by entity as they are needed.
+    Loading the whole TaxonTree reads every taxon in Wikidata, which only pays off when
+    most of them are walked, as in generate.py. Scripts that follow the parents of a
+    few thousand taxa use this instead.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.taxa = {}
+
+    def lookup(self, qid):
+        """
+        The parent taxa and the rank of a taxon as interned integers.
+        """
+        if qid not in self.taxa:
+            self.cursor.execute("SELECT properties FROM properties WHERE qid = ?", (qid,))
+            row = self.cursor.fetchone()
+            props = decode_properties(row[0]) if row else {}
+            ranks = property_numbers(props, "P105")
+            self.taxa[qid] = (property_numbers(props, "P171"), ranks[0] if ranks else 0)
+        return self.taxa[qid]
+
+    def __contains__(self, qid):
+        parents, rank = self.lookup(qid)
+        return bool(parents or rank)
+
+    def parents(self, qid):
+        """
+        The parent taxa of a taxon.
+        """
+        return [int_to_qid(p) for p in self.lookup(qid)[0]]
+
+    def rank(self, qid):
+        """
+        The QID of the rank of a taxon, or None if it has no rank.
+        """
+        rank = self.lookup(qid)[1]
+        return int_to_qid(rank) if rank else None
+
+
+class MappedAncestors:
+    """
+    Finds the nearest ancestors of taxa that are in a mapping, following every parent
+    taxon until a mapped taxon is reached. `select` converts the value of the mapping
+    for a taxon and a rank to a list of synsets. The results are memoized for each
+    taxon and rank, so taxa that share ancestors are only walked once.
+    """
+    def __init__(self, tree, mapping, select):
+        self.tree = tree
+        self.mapping = mapping
+        self.select = select
+        self.memo = {}
+
+    def find(self, qid, rank=""):
+        """
+        The synsets of the nearest mapped ancestors of a taxon (or the taxon itself).
+        """
+        return list(self.find_int(qid_to_int(qid), rank, {})[0])
+
+    def find_int(self, entity, rank, visiting):
+        """
+        The synsets of the nearest mapped ancestors of a taxon, with the depth in the
+        walk of the highest taxon that was skipped because it was already being walked
+        (or the depth of this taxon if none was). A result that skipped a taxon above
+        this one is missing what lies beyond the cycle, so it is not memoized.
+        """
+        key = (entity, rank)
+        depth = len(visiting)
+        result = self.memo.get(key)
+        if result is not None:
+            return result, depth
+        cycle = depth
+        qid = int_to_qid(entity)
+        if qid in self.mapping:
+            result = tuple(self.select(self.mapping[qid], rank))
+        else:
+            visiting[entity] = depth
+            i = self.tree.find(entity)
+            parents = self.tree.parents_map.values_at(i) if i >= 0 else []
+            found = {}
+            for parent in parents:
+                if parent in visiting:
+                    # A taxon that is already being walked is part of a cycle
+                    cycle = min(cycle, visiting[parent])
+                else:
+                    parent_result, parent_cycle = self.find_int(parent, rank, visiting)
+                    found.update(dict.fromkeys(parent_result))
+                    cycle = min(cycle, parent_cycle)
+            del visiting[entity]
+            result = tuple(found)
+        if cycle >= depth:
+            self.memo[key] = result
+        return result, cycle
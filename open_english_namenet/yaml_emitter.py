@@ -0,0 +1,64 @@
+"""A fast YAML emitter for the synsets written by generate.py.
+
+The synsets all have the same simple schema: a mapping from the synset ID to a mapping
+of fields, each a string or a list of strings. This writes them in the block style of
+yaml.dump, without its representer and emitter passes. Strings are written as plain
+scalars when they are unambiguously strings, and otherwise double-quoted with every
+non-ASCII or special character escaped, so the output always loads back to the same
+data (see tests/test_yaml_emitter.py).
+"""
+import re
+
+# Plain scalars must start with a letter, so that they are never read as a number,
+# date or null, and may not contain the indicators of comments or mappings
+PLAIN = re.compile(r"[A-Za-z](?:[A-Za-z0-9 ._,'()/+&;=-]*[A-Za-z0-9._,'()/+&;=-])?\Z")
+# OEWN synset IDs start with a digit but cannot be read as anything but a string
+SYNSET_ID = re.compile(r"[0-9]+-[a-z]\Z")
+# Words that YAML 1.1 reads as booleans or null
+RESERVED = {"yes", "no", "true", "false", "on", "off", "null"}
+ESCAPE = re.compile(r'[^\x20-\x7e]|["\\]')
+ESCAPES = {
+    "\0": "\\0", "\x07": "\\a", "\b": "\\b", "\t": "\\t", "\n": "\\n", "\x0b": "\\v",
+    "\x0c": "\\f", "\r": "\\r", "\x1b": "\\e", '"': '\\"', "\\": "\\\\", "\x85": "\\N",
+    "\xa0": "\\_", "\u2028": "\\L", "\u2029": "\\P",
+}
+
+# The size of the output buffers of the synset files
+WRITE_BUFFER = 1 << 20
+
+
+def escape_char(match):
+    c = match.group()
+    if c in ESCAPES:
+        return ESCAPES[c]
+    code = ord(c)
+    if code <= 0xff:
+        return f"\\x{code:02X}"
+    elif code <= 0xffff:
+        return f"\\u{code:04X}"
+    return f"\\U{code:08X}"
+
+
+def scalar(value):
+    """
+    Write a string as a YAML scalar, plain if that is safe and double-quoted otherwise.
+    """
+    if PLAIN.match(value) and value.lower() not in RESERVED or SYNSET_ID.match(value):
+        return value
+    return '"' + ESCAPE.sub(escape_char, value) + '"'
+
+
+def synset_yaml(ssid, entry):
+    """
+    Write a synset as YAML, in the same layout as yaml.dump({ssid: entry}, sort_keys=False).
+    """
+    lines = [f"{scalar(ssid)}:\n"]
+    for key, value in entry.items():
+        if isinstance(value, str):
+            lines.append(f"  {scalar(key)}: {scalar(value)}\n")
+        elif value:
+            lines.append(f"  {scalar(key)}:\n")
+            lines.extend(f"  - {scalar(v)}\n" for v in value)
+        else:
+            lines.append(f"  {scalar(key)}: []\n")
+    return "".join(lines)
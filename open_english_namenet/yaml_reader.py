@@ -0,0 +1,180 @@
+"""A fast streaming reader for the synset files written by generate.py.
+
+This is the counterpart of yaml_emitter: the files are read with mmap, split into the
+blocks of the top-level synsets, and each block is parsed directly when it has the
+layout that yaml_emitter writes (which is also that of yaml.dump for short values). A
+block with anything else, such as single-quoted, wrapped or flow-style values, is
+parsed with the LibYAML loader instead, so the result is always the same as that of
+yaml.load on the whole file.
+"""
+import mmap
+import os
+import re
+import yaml
+from yaml_emitter import scalar
+
+# The start of a top-level line, which starts a block
+BLOCK_START = re.compile(rb"^[^ \t\r\n]", re.M)
+# A double-quoted scalar with only the escapes that yaml_emitter writes
+QUOTED = re.compile(r'"((?:[^"\\\x00-\x1f]|\\(?:x[0-9A-Fa-f]{2}|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|[0abtnvfre"\\N_LP]))*)"\Z')
+UNESCAPE = re.compile(r"\\(x[0-9A-Fa-f]{2}|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+UNESCAPES = {
+    "0": "\0", "a": "\x07", "b": "\b", "t": "\t", "n": "\n", "v": "\x0b", "f": "\x0c",
+    "r": "\r", "e": "\x1b", '"': '"', "\\": "\\", "N": "\x85", "_": "\xa0",
+    "L": "\u2028", "P": "\u2029",
+}
+
+
+class Unusual(Exception):
+    """
+    A block that is not in the layout of yaml_emitter.
+    """
+
+
+def unescape_char(match):
+    escape = match.group(1)
+    if len(escape) > 1:
+        return chr(int(escape[1:], 16))
+    return UNESCAPES[escape]
+
+
+def parse_scalar(token):
+    """
+    Parse a plain or double-quoted scalar that is certainly a string.
+    """
+    match = QUOTED.match(token)
+    if match:
+        return UNESCAPE.sub(unescape_char, match.group(1))
+    # A plain scalar is only certainly a string if the emitter would write it as is
+    if token and scalar(token) == token:
+        return token
+    raise Unusual(token)
+
+
+def parse_block(text):
+    """
+    Parse the block of a synset in the layout of yaml_emitter, as a pair of the synset
+    ID and the entry. Raises Unusual if the block has any other layout.
+    """
+    lines = text.split("\n")
+    head = lines[0]
+    if not head.endswith(":"):
+        raise Unusual(head)
+    ssid = parse_scalar(head[:-1])
+    entry = {}
+    values = None
+    for line in lines[1:]:
+        if not line.strip():
+            continue
+        if line.startswith("  - "):
+            if values is None:
+                raise Unusual(line)
+            values.append(parse_scalar(line[4:]))
+        elif line.startswith("  ") and line[2] not in " -#":
+            if values == []:
+                raise Unusual(line)
+            if line.endswith(":"):
+                key, value = line[2:-1], None
+            else:
+                key, sep, value = line[2:].partition(": ")
+                if not sep:
+                    raise Unusual(line)
+            key = parse_scalar(key)
+            if key in entry:
+                raise Unusual(line)
+            if value is None:
+                values = entry[key] = []
+            elif value == "[]":
+                entry[key] = []
+                values = None
+            else:
+                entry[key] = parse_scalar(value)
+                values = None
+        else:
+            raise Unusual(line)
+    if values == []:
+        raise Unusual(text)
+    return ssid, entry
+
+
+def iter_blocks(data):
+    """
+    Iterate over the byte offsets of the start and end of the top-level blocks.
+    """
+    start = None
+    for match in BLOCK_START.finditer(data):
+        if start is not None:
+            yield start, match.start()
+        start = match.start()
+    if start is not None:
+        yield start, len(data)
+
+
+def parse_synset_blocks(data):
+    """
+    Iterate over the synsets in YAML text (as bytes or mmap) as tuples of the byte
+    offsets of the start and end of their block, the synset ID and the entry.
+    """
+    for start, end in iter_blocks(data):
+        text = data[start:end].decode("utf-8")
+        try:
+            ssid, entry = parse_block(text.rstrip("\n"))
+            yield start, end, ssid, entry
+        except Unusual:
+            for ssid, entry in (yaml.load(text, Loader=yaml.CLoader) or {}).items():
+                yield start, end, ssid, entry
+
+
+def parse_synsets(data):
+    """
+    Iterate over the synsets in YAML text (as bytes or mmap) as pairs of the synset ID
+    and entry, in the order of the text.
+    """
+    for _, _, ssid, entry in parse_synset_blocks(data):
+        yield ssid, entry
+
+
+def read_synsets(path):
+    """
+    Iterate over the synsets in a YAML file as pairs of the synset ID and entry.
+    """
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            return
+        with data:
+            yield from parse_synsets(data)
+
+
+def file_ranges(path, chunk_size):
+    """
+    Split a file into byte ranges of about `chunk_size` bytes that start at the start
+    of a synset, as tuples of the path and the offsets of the start and end.
+    """
+    size = os.path.getsize(path)
+    if not size:
+        # An empty file cannot be mapped, but is still listed
+        return [(path, 0, 0)]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        ranges = []
+        start = 0
+        while start < size:
+            match = BLOCK_START.search(data, start + chunk_size) if start + chunk_size < size else None
+            end = match.start() if match else size
+            ranges.append((path, start, end))
+            start = end
+        return ranges
+
+
+def read_range(path, start, end):
+    """
+    Iterate over the synsets in a byte range of a YAML file, as split by file_ranges,
+    as pairs of the synset ID and entry.
+    """
+    if end <= start:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end]
+    yield from parse_synsets(text)
@@ -0,0 +1,40 @@
+import os
+from cache import Cache
+
+
+def test_get_computes_once(tmp_path):
+    cache = Cache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"Q42": ["Q5"]}
+
+    assert cache.get("result", {"wikidata": 1}, compute) == {"Q42": ["Q5"]}
+    assert cache.get("result", {"wikidata": 1}, compute) == {"Q42": ["Q5"]}
+    assert len(calls) == 1
+    assert cache.get("result", {"wikidata": 2}, compute) == {"Q42": ["Q5"]}
+    assert len(calls) == 2
+
+
+def test_stale_class_is_a_miss(tmp_path):
+    cache = Cache(str(tmp_path))
+    # Pickles of a class in a module that no longer exists and of a class that is no
+    # longer in its module
+    for data in (b"\x80\x04cno_such_module\nNoSuchClass\n)\x81.", b"\x80\x04cbuiltins\nNoSuchClass\n)\x81."):
+        with open(cache.path("result", {}), "wb") as f:
+            f.write(data)
+        assert cache.load("result", {}) == (False, None)
+    assert cache.get("result", {}, lambda: 42) == 42
+    assert cache.load("result", {}) == (True, 42)
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = Cache(str(tmp_path), max_bytes=2500)
+    for i, name in enumerate(["a-1.pickle", "oewn-1.snapshot", "b-1.pickle", "oewn-2.snapshot"]):
+        path = tmp_path / name
+        path.write_bytes(b"\0" * 1000)
+        os.utime(path, ns=(i * 10 ** 9, i * 10 ** 9))
+    cache.evict(keep=(str(tmp_path / "a-1.pickle"),))
+    assert sorted(os.listdir(tmp_path)) == ["a-1.pickle", "oewn-2.snapshot"]
+    assert cache.evictions == 2
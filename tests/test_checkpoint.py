@@ -0,0 +1,88 @@
+import os
+import pytest
+from checkpoint import Checkpoint
+
+INPUTS = {"wikidata": "abc", "phases": [True, True]}
+
+
+def jobs(qids):
+    return [(qid, [], {}) for qid in qids]
+
+
+def run(directory, output_folder, resume, crash=False, crash_after_addendums=False):
+    """
+    A run with two outputs of two chunks each, which crashes in the middle of the
+    second chunk of the second output if `crash` is set, or after the addendums are
+    written if `crash_after_addendums` is set.
+    """
+    checkpoint = Checkpoint(directory, INPUTS, resume)
+    replayed = list(checkpoint.deltas())
+    for name, qids in (("a.yaml", ["Q1", "Q2", "Q3", "Q4"]), ("b.yaml", ["Q5", "Q6", "Q7", "Q8"])):
+        with checkpoint.output(os.path.join(output_folder, name)) as output:
+            remaining = list(output.skip_committed(jobs(qids)))
+            for i in range(0, len(remaining), 2):
+                chunk = remaining[i:i + 2]
+                if crash and chunk[0][0] == "Q7":
+                    # Written but never committed to the journal
+                    output.f.write(b"Q7-n: {}\n")
+                    output.deltas.write(b'[["Q7"]]\n')
+                    raise RuntimeError("interrupted")
+                text = "".join(f"{qid}-n: {{}}\n" for qid, _, _ in chunk)
+                output.commit(text, [[qid] for qid, _, _ in chunk if qid in ("Q2", "Q6", "Q8")], len(chunk), chunk[-1][0])
+    checkpoint.mark_addendums_written()
+    if crash_after_addendums:
+        raise RuntimeError("interrupted")
+    checkpoint.clear()
+    return replayed
+
+
+def test_resume_after_partial_chunk(tmp_path):
+    directory = str(tmp_path / ".checkpoint")
+    with pytest.raises(RuntimeError):
+        run(directory, str(tmp_path), False, crash=True)
+    assert (tmp_path / "a.yaml").exists() and not (tmp_path / "b.yaml").exists()
+    # Only the deltas of the committed chunks are replayed, one per chunk
+    assert run(directory, str(tmp_path), True) == [[["Q2"]], [], [["Q6"]]]
+    assert (tmp_path / "a.yaml").read_text() == "Q1-n: {}\nQ2-n: {}\nQ3-n: {}\nQ4-n: {}\n"
+    assert (tmp_path / "b.yaml").read_text() == "Q5-n: {}\nQ6-n: {}\nQ7-n: {}\nQ8-n: {}\n"
+    assert not os.path.exists(directory)
+
+
+def test_resume_after_addendums_written(tmp_path):
+    directory = str(tmp_path / ".checkpoint")
+    with pytest.raises(RuntimeError):
+        run(directory, str(tmp_path), False, crash_after_addendums=True)
+    # The addendums already contain the deltas, so they are not replayed
+    assert Checkpoint(directory, INPUTS, resume=True).addendums_written
+    assert run(directory, str(tmp_path), True) == []
+    assert (tmp_path / "b.yaml").read_text() == "Q5-n: {}\nQ6-n: {}\nQ7-n: {}\nQ8-n: {}\n"
+    assert not os.path.exists(directory)
+    # A new run starts without the record
+    with pytest.raises(RuntimeError):
+        run(directory, str(tmp_path), False, crash=True)
+    assert run(directory, str(tmp_path), True) == [[["Q2"]], [], [["Q6"]]]
+
+
+def test_resume_without_checkpoint(tmp_path):
+    assert run(str(tmp_path / ".checkpoint"), str(tmp_path), True) == []
+    assert (tmp_path / "b.yaml").read_text() == "Q5-n: {}\nQ6-n: {}\nQ7-n: {}\nQ8-n: {}\n"
+
+
+def test_resume_with_other_inputs(tmp_path):
+    directory = str(tmp_path / ".checkpoint")
+    with pytest.raises(RuntimeError):
+        run(directory, str(tmp_path), False, crash=True)
+    with pytest.raises(ValueError, match="other inputs"):
+        Checkpoint(directory, dict(INPUTS, wikidata="def"), resume=True)
+
+
+def test_resume_with_other_jobs(tmp_path):
+    directory = str(tmp_path / ".checkpoint")
+    with pytest.raises(RuntimeError):
+        run(directory, str(tmp_path), False, crash=True)
+    checkpoint = Checkpoint(directory, INPUTS, resume=True)
+    with checkpoint.output(str(tmp_path / "a.yaml")) as output:
+        list(output.skip_committed(jobs(["Q1", "Q2", "Q3", "Q4"])))
+    with checkpoint.output(str(tmp_path / "b.yaml")) as output:
+        with pytest.raises(ValueError, match="do not match"):
+            output.skip_committed(jobs(["Q5", "Q9", "Q7", "Q8"]))
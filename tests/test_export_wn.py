@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import wn
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "open_english_namenet", "export_wn.py")
+
+FILES = {
+    "curated/noun.person.yaml": """Q42-n:
+  definition:
+  - English writer
+  hypernym:
+  - Q43-n
+  members:
+  - Douglas Adams
+  - Adams
+  partOfSpeech: n
+  wikidata: Q42
+""",
+    "addendum/noun.person.yaml": """10817337-n:
+  definition:
+  - English writer and humorist
+  members:
+  - Douglas Noel Adams
+  partOfSpeech: n
+""",
+    "addendum/entries-a.yaml": """Adams:
+  n:
+    sense:
+    - id: adams%1:18:00::
+      synset: 10817337-n
+""",
+    "automatic/noun.human.yaml": """Q43-n:
+  definition:
+  - a writer
+  instance_hypernym:
+  - 00007846-n
+  members:
+  - writer
+  partOfSpeech: n
+""",
+}
+
+
+def test_export(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    for name, text in FILES.items():
+        (data / name).parent.mkdir(parents=True, exist_ok=True)
+        (data / name).write_text(text, encoding="utf-8")
+    database = tmp_path / "wn" / "wn.db"
+    database.parent.mkdir()
+    result = subprocess.run([sys.executable, SCRIPT, str(data), str(database), "--year", "2025"],
+                            cwd=os.path.dirname(SCRIPT), capture_output=True, text=True, check=True)
+    assert "Exported 3 synsets and 4 entries" in result.stdout
+    assert "Skipped 1 relations" in result.stdout
+
+    # wn checks the schema of the database, which the export rewrites
+    monkeypatch.setattr(wn.config, "data_directory", str(tmp_path / "wn"))
+    lexicon, = wn.lexicons()
+    assert (lexicon.id, lexicon.label, lexicon.version) == ("oenn", "Open English Namenet", "2025")
+    oenn = wn.Wordnet("oenn")
+    assert sorted(synset.id for synset in oenn.synsets()) == ["oenn-10817337-n", "oenn-Q42-n", "oenn-Q43-n"]
+    adams = oenn.synset("oenn-Q42-n")
+    assert adams.lemmas() == ["Douglas Adams", "Adams"]
+    assert adams.definition() == "English writer"
+    assert adams.lexfile() == "noun.person"
+    assert [synset.id for synset in adams.hypernyms()] == ["oenn-Q43-n"]
+    assert oenn.synset("oenn-10817337-n").lexfile() == "noun.person"
+    assert [sense.synset().id for sense in oenn.senses("Adams")] == ["oenn-Q42-n"]
@@ -0,0 +1,44 @@
+import random
+import external_sort
+from external_sort import ExternalSorter
+
+
+def records(n, seed=0):
+    rng = random.Random(seed)
+    return [(f"lemma{rng.randrange(n // 2)}", f"Q{rng.randrange(n)}") for _ in range(n)]
+
+
+def test_in_memory(tmp_path):
+    data = records(100)
+    with ExternalSorter(directory=str(tmp_path)) as sorter:
+        for record in data:
+            sorter.add(record)
+        assert not sorter.runs
+        assert list(sorter) == sorted(data)
+
+
+def test_spilled_runs(tmp_path, monkeypatch):
+    # Every few records are spilled to a run of several blocks, and there are more
+    # runs than are merged at once
+    monkeypatch.setattr(external_sort, "BLOCK_SIZE", 3)
+    data = records(1000)
+    with ExternalSorter(memory_bytes=1000, directory=str(tmp_path)) as sorter:
+        for record in data:
+            sorter.add(record)
+        assert len(sorter.runs) > external_sort.MAX_MERGE
+        assert list(sorter) == sorted(data)
+
+
+def test_saved_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(external_sort, "BLOCK_SIZE", 7)
+    parts = [records(200, seed) for seed in range(3)]
+    merged = ExternalSorter(memory_bytes=1000, directory=str(tmp_path))
+    for i, part in enumerate(parts):
+        with ExternalSorter(memory_bytes=1000, directory=str(tmp_path)) as sorter:
+            for record in part:
+                sorter.add(record)
+            sorter.save(str(tmp_path / f"{i}.run"))
+        merged.add_run(str(tmp_path / f"{i}.run"))
+    merged.add(("a", "Q0"))
+    with merged:
+        assert list(merged) == sorted([record for part in parts for record in part] + [("a", "Q0")])
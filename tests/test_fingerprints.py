@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import generate
+from checkpoint import Checkpoint
+from fingerprints import PreviousOutput, SUFFIX, entry_fingerprint, pack_fingerprints
+from generate import render_entries
+
+JOBS = [("Q1", ["00007846-n"], {}), ("Q2", ["00007846-n"], {"inst": False, "mero": ["Q3-n", "Q4-n"]}),
+        ("Q3", ["00007846-n"], {}), ("Q4", ["00007846-n"], {})]
+
+
+def database(path, labels):
+    db = sqlite3.connect(str(path))
+    db.execute("CREATE TABLE labels_en (qid TEXT, label TEXT)")
+    db.execute("CREATE TABLE descriptions_en (qid TEXT, description TEXT)")
+    for qid, label in labels.items():
+        db.execute("INSERT INTO labels_en VALUES (?, ?)", (qid, json.dumps([label])))
+        db.execute("INSERT INTO descriptions_en VALUES (?, ?)", (qid, f"description of {qid}"))
+    db.commit()
+    return db.cursor()
+
+
+def write(folder, cursor, jobs, previous=None):
+    """
+    Render the jobs in chunks of two to an output with its sidecar.
+    """
+    checkpoint = Checkpoint(str(folder / ".checkpoint"), {})
+    with checkpoint.output(str(folder / "noun.test.yaml")) as output:
+        for i in range(0, len(jobs), 2):
+            text, _, fingerprints = render_entries(jobs[i:i + 2], cursor, {}, {}, previous)
+            output.commit(text, [], 2, jobs[i + 1][0], pack_fingerprints(fingerprints, output.size))
+    checkpoint.clear()
+    return (folder / "noun.test.yaml").read_text(encoding="utf-8")
+
+
+def test_fingerprint():
+    fingerprint = entry_fingerprint("Q2", ["00007846-n"], {"mero": ["Q3-n", "Q4-n"]}, ["a"], "b")
+    assert fingerprint == entry_fingerprint("Q2", ["00007846-n"], {"mero": ["Q4-n", "Q3-n"]}, ["a"], "b")
+    assert fingerprint != entry_fingerprint("Q2", ["00007846-n"], {"mero": ["Q3-n"]}, ["a"], "b")
+    assert fingerprint != entry_fingerprint("Q2", ["00007846-n"], {"mero": ["Q3-n", "Q4-n"]}, ["a"], "c")
+
+
+def test_reuse_previous_output(tmp_path, monkeypatch):
+    cursor = database(tmp_path / "old.db", {"Q1": "one", "Q2": "two", "Q3": "three", "Q4": "four"})
+    first = write(tmp_path, cursor, JOBS)
+    assert os.path.getsize(tmp_path / ("noun.test.yaml" + SUFFIX)) == 4 * 32
+
+    rendered = []
+    process_entry = generate.process_entry
+
+    def render(qid, *args, **kwargs):
+        rendered.append(qid)
+        return process_entry(qid, *args, **kwargs)
+
+    monkeypatch.setattr(generate, "process_entry", render)
+    # Q1 is renamed, Q3 has lost its label and Q4 has another hypernym
+    cursor = database(tmp_path / "new.db", {"Q1": "uno", "Q2": "two", "Q4": "four"})
+    jobs = JOBS[:3] + [("Q4", ["00001740-n"], {})]
+    with PreviousOutput(str(tmp_path)) as previous:
+        second = write(tmp_path, cursor, jobs, previous)
+    assert rendered == ["Q1", "Q3", "Q4"]
+    # The unchanged synset is copied from the previous file
+    assert "Q2-n:" in second and second[second.index("Q2-n:"):second.index("Q4-n:")] == \
+        first[first.index("Q2-n:"):first.index("Q3-n:")]
+    # The output is the same as without the previous output
+    monkeypatch.setattr(generate, "process_entry", process_entry)
+    (tmp_path / "full").mkdir()
+    assert write(tmp_path / "full", cursor, jobs) == second
+
+
+def test_changed_previous_file(tmp_path):
+    cursor = database(tmp_path / "old.db", {"Q1": "one", "Q2": "two", "Q3": "three", "Q4": "four"})
+    text = write(tmp_path, cursor, JOBS)
+    fingerprint = entry_fingerprint("Q1", ["00007846-n"], {}, ["one"], "description of Q1")
+    with PreviousOutput(str(tmp_path)) as previous:
+        assert previous.text("Q1", fingerprint) == text[:text.index("Q2-n:")]
+        assert previous.text("Q1", fingerprint + 1) is None
+        assert previous.text("Q5", fingerprint) is None
+    # A file that no longer matches its sidecar is not read
+    (tmp_path / "noun.test.yaml").write_text(text.replace("Q1-n:", "Q5-n:"), encoding="utf-8")
+    with PreviousOutput(str(tmp_path)) as previous:
+        assert previous.text("Q1", fingerprint) is None
@@ -0,0 +1,68 @@
+import random
+import pytest
+from hypernym_closure import HypernymClosure
+
+
+def fixed_point_closure(hyps):
+    """
+    The transitive closure by the fixed-point loop that HypernymClosure replaced.
+    """
+    hyps = {ssid: list(parents) for ssid, parents in hyps.items()}
+    changes = len(hyps)
+    while changes > 0:
+        changes = 0
+        for h1 in list(hyps.keys()):
+            for h2 in hyps.get(h1, []):
+                for h3 in hyps.get(h2, []):
+                    if h3 not in hyps[h1]:
+                        hyps[h1].append(h3)
+                        changes += 1
+    return hyps
+
+
+def fixed_point_dedupe(wn_hyps, closure):
+    """
+    The dedupe of hypernyms that HypernymClosure.most_specific replaced.
+    """
+    wn_hyps = sorted(set(wn_hyps))
+    return [wh for wh in wn_hyps if not any(wh in closure.get(wh2, []) for wh2 in wn_hyps if wh2 != wh)]
+
+
+def random_graph(rng, cyclic):
+    n = rng.randrange(1, 12)
+    ssids = [f"{i:08d}-n" for i in range(n)]
+    hyps = {}
+    for i, ssid in enumerate(ssids):
+        # Some synsets are only the target of a relation
+        if rng.random() < 0.2:
+            continue
+        # Without cycles, hypernyms only point to earlier synsets
+        targets = ssids if cyclic else ssids[:i]
+        hyps[ssid] = rng.sample(targets, rng.randrange(min(3, len(targets)) + 1))
+    return ssids, hyps
+
+
+@pytest.mark.parametrize("cyclic", [False, True])
+def test_against_fixed_point(cyclic):
+    rng = random.Random(cyclic)
+    for _ in range(300):
+        ssids, hyps = random_graph(rng, cyclic)
+        expected = fixed_point_closure(hyps)
+        closure = HypernymClosure(hyps)
+        assert {ssid: set(ancestors) for ssid, ancestors in closure.as_dict().items()} == \
+            {ssid: set(ancestors) for ssid, ancestors in expected.items()}
+        for ssid in ssids + ["99999999-n"]:
+            assert set(closure.ancestors(ssid)) == set(expected.get(ssid, []))
+            for other in ssids:
+                assert closure.is_ancestor(other, ssid) == (other in expected.get(ssid, []))
+        for _ in range(10):
+            candidates = rng.choices(ssids, k=rng.randrange(1, 5))
+            assert closure.most_specific(candidates) == fixed_point_dedupe(candidates, expected)
+
+
+def test_order():
+    closure = HypernymClosure({"c": ["b", "x"], "b": ["a"], "a": [], "x": []})
+    # Direct hypernyms first, then the ancestors of each in order
+    assert closure.ancestors("c") == ["b", "x", "a"]
+    assert closure.most_specific(["a", "c", "x", "c"]) == ["c"]
+    assert closure.most_specific(["x", "b"]) == ["b", "x"]
@@ -0,0 +1,89 @@
+import os
+import pytest
+from namenet import Namenet, build_index
+
+FILES = {
+    "curated/noun.person.yaml": """09509769-n:
+  definition:
+  - (Greek mythology) a woman who was turned into a kingfisher
+  members:
+  - Alcyone
+  - Halcyon
+  partOfSpeech: n
+  wikidata: Q912904
+""",
+    "addendum/entries-a.yaml": """Aberdonian:
+  n:
+    sense:
+    - id: aberdonian%1:18:00::
+      synset: 09712476-n
+""",
+    "automatic/noun.human.yaml": """Q42-n:
+  definition:
+  - English writer and humorist
+  members:
+  - Douglas Adams
+  partOfSpeech: n
+  wikidata: Q42
+Q43-n:
+  members:
+  - Douglas
+  partOfSpeech: n
+  wikidata:
+  - Q43
+  - Q912904
+""",
+}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for file, text in FILES.items():
+        os.makedirs(tmp_path / os.path.dirname(file), exist_ok=True)
+        (tmp_path / file).write_text(text, encoding="utf-8")
+    build_index(str(tmp_path))
+    return tmp_path
+
+
+def test_lookups(folder):
+    with Namenet(str(folder)) as namenet:
+        assert len(namenet) == 3
+        assert namenet.by_synset("Q42-n")["members"] == ["Douglas Adams"]
+        assert namenet.by_synset("Aberdonian") is None
+        assert [ssid for ssid, _ in namenet.by_qid("Q912904")] == ["09509769-n", "Q43-n"]
+        assert namenet.by_qid("Q44") == []
+        assert [ssid for ssid, _ in namenet.by_lemma("Halcyon")] == ["09509769-n"]
+        assert namenet.by_lemma("Aberdonian") == []
+        assert namenet.lexfile(namenet.find_synset("Q42-n")) == "noun.human"
+
+
+def test_prefix_search(folder):
+    with Namenet(str(folder)) as namenet:
+        assert namenet.prefix_search("douglas") == [("Douglas", "Q43-n"), ("Douglas Adams", "Q42-n")]
+        assert namenet.prefix_search("DOUGLAS", limit=1) == [("Douglas", "Q43-n")]
+        assert namenet.prefix_search("ab") == []
+
+
+@pytest.mark.parametrize("change", ["modified", "added", "removed"])
+def test_stale_index(folder, change):
+    if change == "modified":
+        with open(folder / "automatic/noun.human.yaml", "a", encoding="utf-8") as f:
+            f.write("Q44-n:\n  members:\n  - Zaphod\n")
+    elif change == "added":
+        (folder / "addendum/noun.group.yaml").write_text("", encoding="utf-8")
+    else:
+        os.remove(folder / "curated/noun.person.yaml")
+    with pytest.raises(ValueError, match="out of date"):
+        Namenet(str(folder))
+
+
+def test_prefix_search_curated(tmp_path):
+    # The members of the curated synsets of the repository are found by prefix
+    data = os.path.join(os.path.dirname(__file__), "..", "data", "curated", "noun.person.yaml")
+    os.makedirs(tmp_path / "curated")
+    with open(data, "rb") as f:
+        (tmp_path / "curated" / "noun.person.yaml").write_bytes(f.read())
+    build_index(str(tmp_path))
+    with Namenet(str(tmp_path)) as namenet:
+        assert ("Augeas", "09509554-n") in namenet.prefix_search("augea")
+        assert ("Alcyone", "09509769-n") in namenet.prefix_search("ALCY")
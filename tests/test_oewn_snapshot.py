@@ -0,0 +1,113 @@
+import os
+import pickle
+import oewn_snapshot
+from cache import cache
+from oewn_snapshot import (OewnSnapshot, StringTable, build_snapshot, int_array, int_bytes, open_snapshot,
+                           read_sections, string_table, write_sections)
+
+LEXFILES = {
+    "noun.Tops.yaml": """00001740-n:
+  definition:
+  - that which is perceived or known or inferred to have its own distinct existence
+  members:
+  - entity
+  partOfSpeech: n
+""",
+    "noun.person.yaml": """00007846-n:
+  definition:
+  - a human being
+  hypernym:
+  - 00001740-n
+  members:
+  - person
+  - individual
+  partOfSpeech: n
+  wikidata: Q215627
+10817337-n:
+  definition:
+  - English writer
+  instance_hypernym:
+  - 00007846-n
+  members:
+  - Adams
+  - Douglas Adams
+  mero_member:
+  - 99999999-n
+  partOfSpeech: n
+  wikidata:
+  - Q42
+""",
+}
+
+
+def test_sections_round_trip(tmp_path):
+    path = tmp_path / "test.snapshot"
+    offsets, data = string_table(["", "entity", "Дуглас"])
+    sections = {"ints": int_bytes("q", [-1, 2 ** 40]), "strings.offsets": offsets, "strings.data": data}
+    write_sections(str(path), b"TESTSNAP", 3, "ab" * 32, sections)
+    contents = path.read_bytes()
+    fingerprint, sections = read_sections(contents, b"TESTSNAP", 3)
+    assert fingerprint == "ab" * 32
+    assert int_array("q", sections["ints"]).tolist() == [-1, 2 ** 40]
+    assert list(StringTable(int_array("Q", sections["strings.offsets"]), sections["strings.data"])) == \
+        ["", "entity", "Дуглас"]
+    assert read_sections(contents, b"TESTSNAP", 2) == (None, {})
+    assert read_sections(contents, b"OTHERSNP", 3) == (None, {})
+
+
+def write_checkout(folder):
+    (folder / "src" / "yaml").mkdir(parents=True)
+    for name, text in LEXFILES.items():
+        (folder / "src" / "yaml" / name).write_text(text, encoding="utf-8")
+
+
+def test_snapshot(tmp_path):
+    write_checkout(tmp_path)
+    path = tmp_path / "oewn.snapshot"
+    build_snapshot(str(tmp_path), str(path), workers=1)
+    snapshot = OewnSnapshot(str(path))
+
+    assert list(snapshot.ssids) == ["00001740-n", "00007846-n", "10817337-n", "99999999-n"]
+    adams = snapshot.index("10817337-n")
+    assert snapshot.index("00000000-n") == -1
+    assert snapshot.lexfile(adams) == "noun.person.yaml"
+    # A synset that is only the target of a relation has no lexicographer file
+    assert snapshot.lexfile(snapshot.index("99999999-n")) is None
+    assert snapshot.values("members", adams) == ["Adams", "Douglas Adams"]
+    assert snapshot.synset(snapshot.index("00007846-n"), ["wikidata", "hypernym", "instance_hypernym"]) == \
+        {"wikidata": ["Q215627"], "hypernym": ["00001740-n"]}
+    assert [snapshot.ssids[j] for j in snapshot.related("ancestors", adams)] == ["00007846-n", "00001740-n"]
+    assert [snapshot.ssids[j] for j in snapshot.related("mero_member", adams)] == ["99999999-n"]
+    assert dict(snapshot.relation_view("instance_hypernym")) == \
+        {"00001740-n": [], "00007846-n": [], "10817337-n": ["00007846-n"]}
+    assert [(lexfile, ssid) for lexfile, ssid, _ in snapshot.synsets(["members"])] == \
+        [("noun.Tops.yaml", "00001740-n"), ("noun.person.yaml", "00007846-n"), ("noun.person.yaml", "10817337-n")]
+    assert snapshot.closure().ancestors("10817337-n") == ["00007846-n", "00001740-n"]
+    assert list(pickle.loads(pickle.dumps(snapshot)).ssids) == list(snapshot.ssids)
+
+
+def test_open_snapshot(tmp_path, monkeypatch):
+    source = tmp_path / "oewn"
+    write_checkout(source)
+    monkeypatch.setattr(cache, "directory", str(tmp_path / "cache"))
+    original_fingerprint = oewn_snapshot.oewn_fingerprint
+    hashed = []
+
+    def fingerprint(source):
+        hashed.append(source)
+        return original_fingerprint(source)
+
+    monkeypatch.setattr(oewn_snapshot, "oewn_fingerprint", fingerprint)
+    path = open_snapshot(str(source), workers=1).path
+    assert hashed
+    # The source files are not hashed again while their sizes and times are the same
+    hashed.clear()
+    assert open_snapshot(str(source), workers=1).path == path
+    assert not hashed
+    with open(source / "src" / "yaml" / "noun.person.yaml", "a", encoding="utf-8") as f:
+        f.write("10817338-n:\n  members:\n  - Arthur Dent\n")
+    snapshot = open_snapshot(str(source), workers=1)
+    assert hashed and snapshot.path != path
+    assert snapshot.index("10817338-n") >= 0
+    assert sorted(name for name in os.listdir(tmp_path / "cache") if name.endswith(".snapshot")) == \
+        sorted(os.path.basename(p) for p in (path, snapshot.path))
@@ -0,0 +1,45 @@
+import json
+from packed_properties import (decode_data_properties, decode_properties, encode_data_properties,
+                               encode_properties, entity_number)
+
+
+def test_properties_round_trip():
+    props = {"P31": ["Q5"], "P106": ["Q36180", "Q214917", "Q4294967295"], "P21": []}
+    packed = encode_properties(props)
+    assert isinstance(packed, bytes)
+    decoded = decode_properties(packed)
+    assert dict(decoded) == props
+    assert list(decoded) == ["P31", "P106", "P21"]
+    assert decoded.numbers("P106").tolist() == [36180, 214917, 4294967295]
+    assert decoded.numbers("P27") is None
+    assert "P31" in decoded and "P27" not in decoded and 31 not in decoded
+    assert dict(decode_properties(encode_properties({}))) == {}
+
+
+def test_properties_not_packed():
+    # IDs that do not fit a uint32 or are not plain QIDs are left as JSON
+    for props in ({"P31": ["Q4294967296"]}, {"P31": ["L1"]}, {"P31": ["Q01"]}, {"X1": ["Q5"]}, {"P31": [5]}):
+        assert encode_properties(props) is None
+    assert decode_properties(json.dumps({"P31": ["L1"]})) == {"P31": ["L1"]}
+
+
+def test_data_properties_round_trip():
+    data_props = {
+        "P225": [["Homo sapiens"]],
+        "P1448": [["Douglas Adams", "en"], ["Дуглас Адамс", "ru"]],
+        "P18": [],
+        "P2561": [["", "\ud800 surrogate"]],
+    }
+    packed = encode_data_properties(data_props)
+    decoded = decode_data_properties(packed)
+    assert dict(decoded) == data_props
+    assert decoded["P1448"] == [["Douglas Adams", "en"], ["Дуглас Адамс", "ru"]]
+    assert "P225" in decoded and "P31" not in decoded
+    assert encode_data_properties({"P225": [[5]]}) is None
+    assert decode_data_properties('{"P225": [["Homo"]]}') == {"P225": [["Homo"]]}
+
+
+def test_entity_number():
+    assert entity_number("Q42", "Q") == 42
+    assert entity_number("P42", "Q") is None
+    assert entity_number("Q", "Q") is None
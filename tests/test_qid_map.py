@@ -0,0 +1,45 @@
+import pickle
+from qid_map import ProjectedQidListMap, QidListMap, int_to_qid, qid_to_int
+
+
+def test_interning():
+    for qid in ("Q1", "Q42", "Q123456789012", "P31", "P1"):
+        assert int_to_qid(qid_to_int(qid)) == qid
+    assert qid_to_int("Q42") == 42
+    assert qid_to_int("P31") == -31
+
+
+def test_list_map():
+    qid_map = QidListMap()
+    qid_map.append("Q3", ["Q5", "P31"])
+    qid_map.append("Q1", [])
+    other = QidListMap()
+    other.append("Q2", ["Q1"])
+    qid_map.extend(other)
+    assert list(qid_map) == ["Q3", "Q1", "Q2"]
+    assert len(qid_map) == 3
+    assert qid_map["Q3"] == ["Q5", "P31"]
+    assert qid_map["Q1"] == []
+    assert qid_map["Q2"] == ["Q1"]
+    assert "Q2" in qid_map and "Q4" not in qid_map and "" not in qid_map
+    assert qid_map.get("Q4") is None
+    assert list(qid_map.items()) == [("Q3", ["Q5", "P31"]), ("Q1", []), ("Q2", ["Q1"])]
+    # Adding after a lookup updates the lookup order
+    qid_map.append("Q0", ["Q9"])
+    assert qid_map["Q0"] == ["Q9"]
+    assert dict(pickle.loads(pickle.dumps(qid_map))) == dict(qid_map)
+
+
+def test_projected_map():
+    qid_map = ProjectedQidListMap(project=["P21"], data_project=["P225"])
+    qid_map.append_projected(1, [5], {"P21": [6581097]})
+    qid_map.append_data({"P225": [["Homo sapiens"]], "P18": [["a.jpg"]]})
+    other = ProjectedQidListMap(project=["P21"], data_project=["P225"])
+    other.append_projected(2, [5], {})
+    other.append_data({})
+    qid_map.extend(other)
+    assert qid_map["Q2"] == ["Q5"]
+    assert list(qid_map.projected_items()) == [("Q1", {"P21": ["Q6581097"], "P225": [["Homo sapiens"]]}),
+                                               ("Q2", {})]
+    copy = pickle.loads(pickle.dumps(qid_map))
+    assert list(copy.projected_items()) == list(qid_map.projected_items())
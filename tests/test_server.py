@@ -0,0 +1,114 @@
+import asyncio
+import json
+from http import HTTPStatus
+import pytest
+from namenet import Namenet, build_index
+from oewn_snapshot import OewnSnapshot, build_snapshot
+from server import Lookups, Server
+
+SYNSETS = """Q42-n:
+  hypernym:
+  - Q43-n
+  members:
+  - Douglas Adams
+  partOfSpeech: n
+  wikidata: Q42
+Q43-n:
+  members:
+  - writer
+  partOfSpeech: n
+  wikidata: Q43
+"""
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "automatic").mkdir()
+    (tmp_path / "automatic" / "noun.human.yaml").write_text(SYNSETS, encoding="utf-8")
+    build_index(str(tmp_path))
+    with Namenet(str(tmp_path)) as namenet:
+        yield Server(Lookups(namenet), max_batch=4)
+
+
+def test_lookups(server):
+    status, payload = server.route("GET", "/synset/Q42-n", b"")
+    assert status == HTTPStatus.OK and payload["Q42-n"]["members"] == ["Douglas Adams"]
+    assert server.route("GET", "/synset/Q44-n", b"") == (HTTPStatus.OK, {"Q44-n": None})
+    status, payload = server.route("GET", "/lemma/Douglas%20Adams", b"")
+    assert list(payload["Douglas Adams"]) == ["Q42-n"]
+    assert server.route("GET", "/hypernyms/Q42-n", b"") == (HTTPStatus.OK, {"Q42-n": [["Q43-n"]]})
+    assert server.route("GET", "/prefix/doug?limit=5", b"") == (HTTPStatus.OK, [("Douglas Adams", "Q42-n")])
+
+
+def test_batch(server):
+    status, payload = server.route("POST", "/batch/qid", json.dumps(["Q43", "", "Q", "x"]).encode())
+    assert status == HTTPStatus.OK
+    assert list(payload["Q43"]) == ["Q43-n"]
+    assert payload[""] == payload["Q"] == payload["x"] == {}
+    assert server.route("GET", "/batch/qid", b"")[0] == HTTPStatus.METHOD_NOT_ALLOWED
+    assert server.route("POST", "/batch/nothing", b"[]")[0] == HTTPStatus.NOT_FOUND
+    assert server.route("POST", "/batch/qid", b"{")[0] == HTTPStatus.BAD_REQUEST
+    assert server.route("POST", "/batch/qid", b"[1]")[0] == HTTPStatus.BAD_REQUEST
+    assert server.route("POST", "/batch/qid", b'["Q1", "Q2", "Q3", "Q4", "Q5"]')[0] == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+def test_errors(server):
+    assert server.route("GET", "/nothing/Q42", b"")[0] == HTTPStatus.NOT_FOUND
+    assert server.route("GET", "/synset/", b"")[0] == HTTPStatus.NOT_FOUND
+    assert server.route("PUT", "/synset/Q42-n", b"")[0] == HTTPStatus.METHOD_NOT_ALLOWED
+    assert server.route("GET", "/prefix/a?limit=x", b"")[0] == HTTPStatus.BAD_REQUEST
+
+
+async def request(server, request):
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    async with listener:
+        reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+        writer.write(request)
+        response = await reader.read()
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return head.split(b"\r\n")[0].decode("latin-1"), json.loads(body)
+
+
+def test_handle(server):
+    body = b'["Q42"]'
+    status, payload = asyncio.run(request(server, b"POST /batch/qid HTTP/1.1\r\nConnection: close\r\n"
+                                                  b"Content-Length: %d\r\n\r\n" % len(body) + body))
+    assert status == "HTTP/1.1 200 OK" and list(payload["Q42"]) == ["Q42-n"]
+
+
+def test_handle_internal_error(server, monkeypatch):
+    def fail(ssid):
+        raise RuntimeError("broken")
+    monkeypatch.setitem(server.lookups.kinds, "synset", fail)
+    status, payload = asyncio.run(request(server, b"GET /synset/Q42-n HTTP/1.0\r\n\r\n"))
+    assert status == "HTTP/1.1 500 Internal Server Error"
+    assert payload == {"error": "RuntimeError: broken"}
+
+
+def test_hypernym_paths_through_cycle(tmp_path):
+    # 00000003-n is first reached from 00000001-n through 00000002-n, which cuts its
+    # path back through 00000002-n, so its paths from there must not be memoized
+    (tmp_path / "src" / "yaml").mkdir(parents=True)
+    (tmp_path / "src" / "yaml" / "noun.Tops.yaml").write_text("""00000001-n:
+  hypernym:
+  - 00000002-n
+00000002-n:
+  hypernym:
+  - 00000003-n
+00000003-n:
+  hypernym:
+  - 00000002-n
+  - 00000004-n
+00000004-n:
+  members:
+  - root
+""", encoding="utf-8")
+    build_snapshot(str(tmp_path), str(tmp_path / "oewn.snapshot"), workers=1)
+    (tmp_path / "automatic").mkdir()
+    build_index(str(tmp_path))
+    with Namenet(str(tmp_path)) as namenet:
+        lookups = Lookups(namenet, OewnSnapshot(str(tmp_path / "oewn.snapshot")))
+        assert lookups.hypernym_paths("00000001-n") == [["00000002-n", "00000003-n", "00000004-n"]]
+        assert lookups.hypernym_paths("00000003-n") == [["00000002-n"], ["00000004-n"]]
+        assert lookups.hypernym_paths("00000004-n") == []
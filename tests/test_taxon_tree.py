@@ -0,0 +1,57 @@
+import json
+import sqlite3
+from array import array
+from cache import cache
+from open_english_namenet import read_wikidata_with_prop_vals_many
+from packed_properties import encode_properties
+from property_scan import PropertyScan
+from qid_map import QidListMap
+from taxon_tree import MappedAncestors, TaxonTree, TaxonTreeConsumer
+
+
+def tree(parents):
+    parents_map = QidListMap()
+    for qid, values in parents.items():
+        parents_map.append(qid, values)
+    return TaxonTree(parents_map, array("q", [0] * len(parents)))
+
+
+def test_mapped_ancestors():
+    ancestors = MappedAncestors(tree({"Q1": ["Q2", "Q3"], "Q2": ["Q4"], "Q3": ["Q4", "Q5"]}),
+                                {"Q4": "a", "Q5": "b"}, lambda value, rank: [value])
+    assert ancestors.find("Q1") == ["a", "b"]
+    assert ancestors.find("Q2") == ["a"]
+    assert ancestors.find("Q6") == []
+
+
+def test_mapped_ancestors_cycle():
+    # Q2 is only reached from Q1 through the cycle, so its result while walking Q1
+    # lacks the ancestors of Q1 and must not be reused
+    ancestors = MappedAncestors(tree({"Q1": ["Q2", "Q3"], "Q2": ["Q1"]}),
+                                {"Q3": "a"}, lambda value, rank: [value])
+    assert ancestors.find("Q1") == ["a"]
+    assert ancestors.find("Q2") == ["a"]
+
+
+def test_load_with_shared_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "directory", str(tmp_path / "cache"))
+    db = sqlite3.connect(str(tmp_path / "wikidata.db"))
+    db.execute("CREATE TABLE properties (qid TEXT PRIMARY KEY, properties BLOB)")
+    for qid, props in (("Q1", {"P31": ["Q16521"], "P171": ["Q2"], "P105": ["Q7432"]}),
+                       ("Q2", {"P31": ["Q16521"], "P171": ["Q3"]}), ("Q3", {"P31": ["Q5"]})):
+        db.execute("INSERT INTO properties VALUES (?, ?)", (qid, encode_properties(props) or json.dumps(props)))
+    db.commit()
+    cursor = db.cursor()
+    scans = []
+    run = PropertyScan.run
+    monkeypatch.setattr(PropertyScan, "run", lambda self, *args, **kwargs: scans.append(1) or run(self, *args, **kwargs))
+
+    instances, = read_wikidata_with_prop_vals_many(cursor, [("P31", ["Q16521"], None)],
+                                                   consumers={"taxon_tree": TaxonTreeConsumer()})
+    assert sorted(instances["Q16521"].keys()) == ["Q1", "Q2"]
+    # The taxon tree was read in the same scan and is loaded from the cache
+    taxon_tree = TaxonTree.load(cursor)
+    assert len(scans) == 1
+    assert taxon_tree.parents("Q1") == ["Q2"] and taxon_tree.rank("Q1") == "Q7432"
+    assert taxon_tree.parents("Q2") == ["Q3"] and taxon_tree.rank("Q2") is None
+    assert "Q3" not in taxon_tree
@@ -0,0 +1,66 @@
+import yaml
+import pytest
+from yaml_emitter import scalar, synset_yaml
+
+
+STRINGS = [
+    "Douglas Adams",
+    "n",
+    "Q42",
+    "00001740-n",
+    "O'Brien",
+    "yes", "No", "TRUE", "off", "null", "~", "",
+    "1990", "3.14", "1e5", "0x1F", "1_000", "12:30", "2001-01-01", ".inf", "-1",
+    "- dash", "? question", ": colon", "a: b", "a #b", "#comment", "&anchor", "*alias",
+    "!tag", "|literal", ">folded", "%directive", "@at", "`backtick", "[list]", "{map}",
+    "trailing space ", " leading space", "two  spaces",
+    '"double"', "'single'", "back\\slash",
+    "tab\there", "new\nline", "carriage\rreturn", "nul\0byte", "bell\x07", "esc\x1b",
+    "Zoë Saldaña", "Москва", "東京", "emoji 😀", "\x85next line", "non\xa0breaking",
+    "line\u2028separator", "paragraph\u2029separator", "\ufeffbom",
+]
+
+
+@pytest.mark.parametrize("value", STRINGS)
+def test_scalar_round_trip(value):
+    assert yaml.load(f"key: {scalar(value)}\n", Loader=yaml.CLoader) == {"key": value}
+
+
+def test_scalar_is_ascii():
+    for value in STRINGS:
+        assert scalar(value).isascii()
+
+
+def test_synset_round_trip():
+    entry = {
+        "definition": ["a city in Japan: the capital, 東京 \"Tokyo\""],
+        "instance_hypernym": ["08524735-n", "08691133-n"],
+        "members": ["Tokyo", "Tōkyō", "yes"],
+        "partOfSpeech": "n",
+        "wikidata": "Q1490",
+        "mero_member": ["Q30010-n"],
+    }
+    assert yaml.load(synset_yaml("Q1490-n", entry), Loader=yaml.CLoader) == {"Q1490-n": entry}
+
+
+def test_synset_empty_list():
+    entry = {"definition": ["a taxon"], "hypernym": [], "members": ["Foo"], "partOfSpeech": "n", "wikidata": "Q1"}
+    assert yaml.load(synset_yaml("Q1-n", entry), Loader=yaml.CLoader) == {"Q1-n": entry}
+
+
+def test_synset_matches_yaml_dump():
+    entry = {
+        "definition": ["English writer and humorist"],
+        "instance_hypernym": ["10794014-n"],
+        "members": ["Douglas Adams"],
+        "partOfSpeech": "n",
+        "wikidata": "Q42",
+    }
+    assert synset_yaml("Q42-n", entry) == yaml.dump({"Q42-n": entry}, sort_keys=False)
+
+
+def test_concatenated_synsets():
+    entries = {f"Q{i}-n": {"definition": [f"entity {i}"], "members": [f"Entity {i}"], "partOfSpeech": "n",
+                           "wikidata": f"Q{i}"} for i in range(100)}
+    text = "".join(synset_yaml(ssid, entry) for ssid, entry in entries.items())
+    assert yaml.load(text, Loader=yaml.CLoader) == entries
@@ -0,0 +1,67 @@
+import os
+from glob import glob
+import yaml
+import pytest
+from yaml_emitter import synset_yaml
+from yaml_reader import file_ranges, parse_synset_blocks, parse_synsets, read_range, read_synsets
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+
+# Blocks in layouts that yaml_emitter does not write, which are parsed by LibYAML
+UNUSUAL = """00001740-n:
+  definition: ['that which is perceived', "or known"]
+  members: [entity]
+00002137-n:
+  definition:
+  - a general concept formed by extracting common features from specific
+    examples
+  members:
+  - 'abstraction'
+  - "abstract\\u0020entity"
+00002452-n: {members: [thing]}
+'00002684-n':
+  members:
+  - object # a comment
+  wikidata: 42
+00003553-n:
+  members:
+  - 'yes'
+  - 1990
+  partOfSpeech: n
+"""
+
+
+def test_emitted_round_trip():
+    entries = {
+        "Q1490-n": {"definition": ["a city: the capital, 東京 \"Tokyo\""], "instance_hypernym": ["08524735-n"],
+                    "members": ["Tokyo", "yes", "1990", "- dash", "tab\there"], "partOfSpeech": "n",
+                    "wikidata": "Q1490"},
+        "Q42-n": {"hypernym": [], "members": ["Douglas Adams"], "wikidata": ["Q42", "Q43"]},
+    }
+    text = "".join(synset_yaml(ssid, entry) for ssid, entry in entries.items()).encode("utf-8")
+    assert dict(parse_synsets(text)) == entries
+
+
+def test_unusual_blocks():
+    text = UNUSUAL.encode("utf-8")
+    assert list(parse_synsets(text)) == list(yaml.load(text, Loader=yaml.CLoader).items())
+    # The offsets of each block span its text
+    for start, end, ssid, _ in parse_synset_blocks(text):
+        assert text[start:end].decode("utf-8").lstrip("'").startswith(ssid)
+
+
+@pytest.mark.parametrize("path", sorted(glob(os.path.join(DATA, "*", "[nva]*.yaml"))))
+def test_data_files(path):
+    with open(path, "rb") as f:
+        expected = list((yaml.load(f, Loader=yaml.CLoader) or {}).items())
+    assert list(read_synsets(path)) == expected
+    synsets = [synset for task in file_ranges(path, 4096) for synset in read_range(*task)]
+    assert synsets == expected
+
+
+def test_empty_file(tmp_path):
+    path = str(tmp_path / "noun.empty.yaml")
+    open(path, "w").close()
+    assert list(read_synsets(path)) == []
+    assert file_ranges(path, 4096) == [(path, 0, 0)]
+    assert list(read_range(path, 0, 0)) == []
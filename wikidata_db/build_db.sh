@@ -22,6 +22,7 @@ create index descriptions_en_index on descriptions_en(qid);
 .import wiki_en.csv wiki_en --csv
 create index wiki_en_index on wiki_en(qid);
 create index wiki_en_wiki on wiki_en(wiki);
+.read property_values.sql
 END_SCRIPT
 
 #rm *.csv
@@ -0,0 +1,10 @@
+-- Normalized (prop, value, qid) edges of the properties table, so that
+-- lookups such as "all instances of Q5" are index seeks rather than a scan.
+-- Can also be run against an existing database:
+--   sqlite3 wikidata.db < wikidata_db/property_values.sql
+drop table if exists property_values;
+create table property_values as
+    select properties.qid as qid, claims.key as prop, vals.value as value
+    from properties, json_each(properties.properties) as claims, json_each(claims.value) as vals;
+create index property_values_index on property_values(prop, value, qid);
+create index property_values_qid_index on property_values(qid, prop);